@@ -0,0 +1,174 @@
+"""Multi-core tournament and benchmark harness for the battleships Ai
+
+This module plays every Ai algorithm offered by 'mp_game_engine.generate_attack'
+against the same fixed, seeded fleets, spreading the games over a pool of worker
+processes. For each algorithm it reports how strong the Ai is (the mean and the
+percentiles of the shots it needs to sink a fleet) and how fast it is (the time each
+decision of 'generate_attack' takes and the games played per second on each core),
+and writes the results as json so that they can be compared between versions.
+
+Attributes
+----------
+PERCENTILES : tuple(int)
+    The percentiles reported for the shots to win and the decision latency
+"""
+
+
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import sys
+import time
+from components import create_battleships, seeded_fleet
+from mp_game_engine import ALGORITHMS, headless_ai_game
+from zobrist import TranspositionCache
+
+PERCENTILES = (50, 90, 95, 99)
+
+def play_games(task):
+    """Plays one algorithm against a range of seeded fleets in a worker process
+
+    Args:
+        task (tuple(str, list[int], dict[str:int], int)): The algorithm, the seeds of the
+            fleets, the ships that make up each fleet and the size of the board
+    Returns:
+        dict: The algorithm, the shots taken in each game, the time of every decision and
+            the seconds that the worker spent playing
+    """
+
+    algorithm, seeds, battleships, board_size = task
+    shots, decisions = [], []
+    cache = TranspositionCache()
+    # A cache of the task's own, so the moves reused only come from the games of this task
+    start = time.perf_counter()
+    for seed in seeds:
+        board, ships = seeded_fleet(seed, battleships, board_size)
+        random.seed(seed ^ 0x5EED)
+        # The Ai's own random choices are seeded too, so every run is repeatable
+        game_shots, decision_times = headless_ai_game(algorithm, board, ships, board_size,
+                                                      cache=cache)
+        shots.append(game_shots)
+        decisions.extend(decision_times)
+    return {'algorithm': algorithm, 'shots': shots, 'decisions': decisions,
+            'busy': time.perf_counter() - start}
+
+def percentile(values, percent):
+    """Finds a percentile of a list of values by linear interpolation
+
+    Args:
+        values (list[float]): The sorted values
+        percent (float): The percentile to find, from 0 to 100
+    Returns:
+        float: The value at the percentile, or 0.0 if there are no values
+    """
+
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def summarise(results, wall_time):
+    """Combines the results of the workers into the report for one algorithm
+
+    Args:
+        results (list[dict]): The results returned by 'play_games' for the algorithm
+        wall_time (float): The seconds the whole tournament took
+    Returns:
+        dict: The strength and speed of the algorithm
+    """
+
+    shots = sorted(shot for result in results for shot in result['shots'])
+    decisions = sorted(decision for result in results for decision in result['decisions'])
+    busy = sum(result['busy'] for result in results)
+    return {
+        'games': len(shots),
+        'shots_to_win': {
+            'mean': sum(shots) / len(shots) if shots else 0.0,
+            'min': shots[0] if shots else 0,
+            'max': shots[-1] if shots else 0,
+            **{f'p{percent}': percentile(shots, percent) for percent in PERCENTILES},
+        },
+        'decision_latency_us': {
+            'mean': 1e6 * sum(decisions) / len(decisions) if decisions else 0.0,
+            'max': 1e6 * decisions[-1] if decisions else 0.0,
+            **{f'p{percent}': 1e6 * percentile(decisions, percent)
+               for percent in PERCENTILES},
+        },
+        'games_per_core_second': len(shots) / busy if busy > 0 else 0.0,
+        'core_seconds': busy,
+        'wall_seconds': wall_time,
+    }
+
+def run_tournament(algorithms = ALGORITHMS, games = 1000, board_size = 10,
+                   battleships = None, seed = 0, workers = None, chunk = 50):
+    """Plays every algorithm against the same seeded fleets over a pool of processes
+
+    Args:
+        algorithms (tuple(str)): The algorithms that take part in the tournament
+        games (int): The number of fleets that each algorithm plays against
+        board_size (int): The size of the board
+        battleships (dict[str:int]): The ships that make up each fleet, read from
+            'battleships.txt' if not given
+        seed (int): The seed of the first fleet; the following fleets use the next seeds
+        workers (int): The number of worker processes, one per core if not given
+        chunk (int): The number of games handed to a worker at a time
+    Returns:
+        dict: The settings of the tournament and the report for each algorithm
+    """
+
+    if battleships is None:
+        battleships = create_battleships('battleships.txt')
+    workers = workers or multiprocessing.cpu_count()
+    seeds = list(range(seed, seed + games))
+    tasks = [(algorithm, seeds[start:start + chunk], battleships, board_size)
+             for algorithm in algorithms for start in range(0, games, chunk)]
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.map(play_games, tasks, chunksize=1)
+    wall_time = time.perf_counter() - start
+
+    return {
+        'settings': {'games': games, 'board_size': board_size, 'seed': seed,
+                     'workers': workers, 'battleships': battleships,
+                     'python': platform.python_version(), 'time': time.time()},
+        'algorithms': {algorithm: summarise([result for result in results
+                                             if result['algorithm'] == algorithm], wall_time)
+                       for algorithm in algorithms},
+    }
+
+def main(argv = None):
+    """Runs the tournament from the command line
+
+    Args:
+        argv (list[str]): The command line arguments, taken from sys.argv if not given
+    Returns:
+        Returns nothing
+    """
+
+    parser = argparse.ArgumentParser(description='Tournament and benchmark of the battleships Ai')
+    parser.add_argument('--algorithm', choices=ALGORITHMS, action='append',
+                        help='algorithm to play (repeatable, defaults to all)')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--size', type=int, default=10)
+    parser.add_argument('--ships', default='battleships.txt')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=None, help='json file for the results (stdout if not given)')
+    args = parser.parse_args(argv)
+
+    report = run_tournament(tuple(args.algorithm or ALGORITHMS), args.games, args.size,
+                            create_battleships(args.ships), args.seed, args.workers)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+
+if __name__ == '__main__':
+    main()
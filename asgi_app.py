@@ -0,0 +1,252 @@
+"""Asyncio (ASGI) serving mode for the Battleships game
+
+This module serves the same routes as 'main' from an asyncio event loop, through any
+ASGI server such as uvicorn. The routes that play the game, '/', '/attack',
+'/attack/salvo', '/placement' and the '/difficulty:*' routes, are handed to the Flask
+application on a small pool of worker threads, so a slow Ai move never stalls the
+event loop and the sessions, templates and responses are exactly those of 'main'.
+
+The '/events' stream is served on the event loop itself: a subscriber is an asyncio
+task that is woken by its game's channel whenever an event is published, so open
+streams and waiting clients do not hold a thread each.
+
+Run with:
+    uvicorn asgi_app:app
+or 'python asgi_app.py', which uses uvicorn when it is installed.
+
+Attributes
+----------
+WORKERS : int
+    The number of threads that play the turns handed over from the event loop
+app : Application
+    The ASGI application
+"""
+
+
+import asyncio
+import io
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+from flask import session
+import main
+from game_events import KEEP_ALIVE
+
+WORKERS = int(os.environ.get('BATTLESHIPS_ASGI_WORKERS', 4))
+
+def wsgi_environ(scope, body):
+    """Builds the WSGI environment of an ASGI http request
+
+    Args:
+        scope (dict): The ASGI scope of the request
+        body (bytes): The whole body of the request
+    Returns:
+        dict: The WSGI environment of the request
+    """
+
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+def call_flask(environ):
+    """Runs a request through the Flask application on a worker thread
+
+    Args:
+        environ (dict): The WSGI environment of the request
+    Returns:
+        int: The status code of the response
+        list[tuple(bytes, bytes)]: The headers of the response
+        bytes: The body of the response
+    """
+
+    started = {}
+    def start_response(status, headers, exc_info = None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                              for name, value in headers]
+
+    chunks = main.app.wsgi_app(environ, start_response)
+    try:
+        body = b''.join(chunks)
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+    return started['status'], started['headers'], body
+
+def subscribed_game(environ):
+    """Finds the game that an '/events' request subscribes to
+
+    Args:
+        environ (dict): The WSGI environment of the request
+    Returns:
+        GameState: The game given by the 'game' argument or the player's session, or None
+    """
+
+    game_id = parse_qs(environ['QUERY_STRING']).get('game', [None])[0]
+    if not game_id:
+        with main.app.request_context(environ):
+            game_id = session.get('game_id')
+            # Reads the game id from the same signed session cookie as 'main'
+    return main.games.get(game_id)
+
+class Application:
+    """The ASGI application serving the game
+
+    Attributes:
+        executor (ThreadPoolExecutor): The threads that run the Flask routes
+    """
+
+    def __init__(self, workers = WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix='battleships')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+        environ = wsgi_environ(scope, body)
+
+        if scope['path'] == '/events' and scope['method'] == 'GET':
+            await self.events(environ, receive, send)
+            return
+
+        loop = asyncio.get_running_loop()
+        status, headers, body = await loop.run_in_executor(self.executor,
+                                                           call_flask, environ)
+        # The turn is played on a worker thread, so the Ai move never blocks the loop
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def lifespan(self, receive, send):
+        """Answers the start-up and shut-down messages of the ASGI server
+
+        Args:
+            receive (function): The ASGI receive channel
+            send (function): The ASGI send channel
+        Returns:
+            Returns nothing
+        """
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def events(self, environ, receive, send):
+        """Streams the events of a game as Server-Sent Events without holding a thread
+
+        Args:
+            environ (dict): The WSGI environment of the request
+            receive (function): The ASGI receive channel
+            send (function): The ASGI send channel
+        Returns:
+            Returns nothing
+        Responses:
+            200: The client has subscribed to the game's events
+            404: There is no game in progress to subscribe to
+        """
+
+        game = subscribed_game(environ)
+        if game is None:
+            await send({'type': 'http.response.start', 'status': 404,
+                        'headers': [(b'content-type', b'application/json')]})
+            await send({'type': 'http.response.body',
+                        'body': b'{"message":"No game in progress"}\n'})
+            return
+        try:
+            last_id = int(environ.get('HTTP_LAST_EVENT_ID', 0))
+        except ValueError:
+            last_id = 0
+
+        loop = asyncio.get_running_loop()
+        published = asyncio.Event()
+        def listener():
+            loop.call_soon_threadsafe(published.set)
+            # Called on the thread that played the turn, so the wake-up is handed over
+        disconnected = asyncio.ensure_future(receive())
+        # The only message left to receive is the client disconnecting
+        game.events.add_listener(listener)
+        try:
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'content-type', b'text/event-stream'),
+                                    (b'cache-control', b'no-cache'),
+                                    (b'x-accel-buffering', b'no')]})
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n',
+                        'more_body': True})
+            while True:
+                published.clear()
+                chunks, last_id = game.events.events_after(last_id)
+                # Cleared before reading, so an event published in between is not missed
+                if chunks:
+                    await send({'type': 'http.response.body', 'body': b''.join(chunks),
+                                'more_body': True})
+                    continue
+                if game.events.closed:
+                    break
+                woken = asyncio.ensure_future(published.wait())
+                done, _ = await asyncio.wait((woken, disconnected), timeout=KEEP_ALIVE,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                woken.cancel()
+                if disconnected in done:
+                    return
+                if not done:
+                    await send({'type': 'http.response.body', 'body': b': keep-alive\n\n',
+                                'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            game.events.remove_listener(listener)
+            disconnected.cancel()
+
+app = Application()
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit('uvicorn is needed to serve the game this way: pip install uvicorn')
+    logging.info('Serving the game over ASGI')
+    uvicorn.run(app, host=os.environ.get('BATTLESHIPS_HOST', '127.0.0.1'),
+                port=int(os.environ.get('BATTLESHIPS_PORT', 8000)))
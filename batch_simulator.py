@@ -0,0 +1,258 @@
+"""Headless batch self-play simulator for the battleships Ai
+
+This module evaluates the Ai attack strategies over very large numbers of games
+without any display or input. Rather than playing one game at a time as in
+'mp_game_engine.ai_opponent_game_loop', it holds a whole batch of games as stacked
+NumPy arrays and advances the shot of every unfinished game in one vectorised step,
+reporting how many shots each strategy needs to sink a fleet and how many games it
+can simulate per second.
+
+The strategies mirror the ones offered by 'mp_game_engine.generate_attack':
+    'simple': Shoots a random cell that has not been shot yet
+    'hunt&target': Shoots the cells next to an unsunk hit, otherwise a random cell
+    'parity': As 'hunt&target', but only hunts on the checkerboard cells
+
+Attributes
+----------
+STRATEGIES : tuple(str)
+    The strategies that the simulator can play
+BATCH_SIZE : int
+    The default number of games that are held in memory at once
+SHIP_DRAWS : int
+    The number of random positions a ship is given for each cell of the board before
+    the earlier ships are taken to have left no room for it
+"""
+
+
+import argparse
+import json
+import time
+import numpy as np
+from components import PLACEMENT_ATTEMPTS, create_battleships
+
+STRATEGIES = ('simple', 'hunt&target', 'parity')
+BATCH_SIZE = 100000
+SHIP_DRAWS = 4
+
+def random_fleets(n_games, battleships, board_size, rng):
+    """Places a fleet randomly on each board of a batch of games
+
+    Description:
+        Follows the semantics of 'components.random_placement': each ship in turn is given
+        a random coordinate and orientation, and the games where the ship would go beyond
+        the border or overlap another ship draw again until every game has placed it. A
+        ship is given SHIP_DRAWS draws for each cell of the board, after which the earlier
+        ships are taken to have left no room for it, and the games where it was not placed
+        clear their board and place the whole fleet again, up to PLACEMENT_ATTEMPTS times.
+
+    Args:
+        n_games (int): The number of boards in the batch
+        battleships (dict[str:int]): The ships that are placed on every board
+        board_size (int): The width and height of the boards
+        rng (numpy.random.Generator): The random number generator used for placement
+    Returns:
+        ship_ids (numpy.ndarray): An (n_games, board_size * board_size) array where each
+            cell holds 0 if it is empty, or the 1-based index of the ship covering it
+    Raises:
+        ValueError: The fleet cannot be placed on the boards
+    """
+
+    cells = board_size * board_size
+    lengths = [int(value) for value in battleships.values()]
+    if sum(lengths) > cells or max(lengths, default=0) > board_size:
+    # Checks whether the fleet could ever fit on the board
+        raise ValueError(f'The fleet does not fit on a {board_size} by {board_size} board')
+    ship_ids = np.zeros((n_games, cells), dtype=np.int16)
+    unplaced = np.arange(n_games)
+    for _ in range(PLACEMENT_ATTEMPTS):
+        if not unplaced.size:
+            break
+        games = unplaced
+        stuck = []
+        for ship_index, length in enumerate(lengths, start=1):
+            offsets = np.arange(length)
+            pending = games
+            for _ in range(SHIP_DRAWS * cells):
+            # Repeats for the games where the ship has not been placed yet
+                if not pending.size:
+                    break
+                x = rng.integers(0, board_size, pending.size)
+                y = rng.integers(0, board_size, pending.size)
+                vertical = rng.integers(0, 2, pending.size).astype(bool)
+
+                xs = x[:, None] + np.where(vertical[:, None], 0, offsets)
+                ys = y[:, None] + np.where(vertical[:, None], offsets, 0)
+                inside = (xs < board_size).all(axis=1) & (ys < board_size).all(axis=1)
+                # Checks that the ship is within the periphery of the board
+                flat = np.where(inside[:, None], ys * board_size + xs, 0)
+                free = (ship_ids[pending[:, None], flat] == 0).all(axis=1)
+                valid = inside & free
+                # Checks that the ship does not overlap another ship
+
+                placed = pending[valid]
+                ship_ids[placed[:, None], flat[valid]] = ship_index
+                pending = pending[~valid]
+            if pending.size:
+                stuck.append(pending)
+                games = np.setdiff1d(games, pending, assume_unique=True)
+                # The later ships are not placed in the games that are started again
+        unplaced = np.concatenate(stuck) if stuck else unplaced[:0]
+        ship_ids[unplaced] = 0
+        # Clears the boards where a ship found no room, to place the whole fleet again
+    if unplaced.size:
+        raise ValueError(f'No placement of the fleet was found in {unplaced.size} games '
+                         f'after {PLACEMENT_ATTEMPTS} attempts')
+    return ship_ids
+
+def simulate_batch(strategy, n_games, battleships, board_size, rng):
+    """Plays a batch of games with one strategy until every fleet has sunk
+
+    Args:
+        strategy (str): The Ai strategy that is played
+        n_games (int): The number of games in the batch
+        battleships (dict[str:int]): The ships that make up each fleet
+        board_size (int): The width and height of the boards
+        rng (numpy.random.Generator): The random number generator used for the games
+    Returns:
+        shots_to_win (numpy.ndarray): The number of shots that each game took to sink the fleet
+    Raises:
+        ValueError: The strategy is not one of the strategies the simulator can play
+    """
+
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown strategy: {strategy}')
+
+    cells = board_size * board_size
+    ship_ids = random_fleets(n_games, battleships, board_size, rng)
+    lengths = np.array([0] + [int(value) for value in battleships.values()], dtype=np.int32)
+    hitpoints = np.tile(lengths, (n_games, 1))
+    # Column 0 stands for the empty cells so that misses can be indexed like hits
+    shots = np.zeros((n_games, cells), dtype=bool)
+    shots_to_win = np.zeros(n_games, dtype=np.int32)
+
+    coords = np.arange(cells)
+    parity = ((coords % board_size + coords // board_size) % 2 == 1)
+    # The checkerboard cells that the parity strategy hunts on
+    active = np.arange(n_games)
+    turn = 0
+
+    while active.size:
+        turn += 1
+        unshot = ~shots[active]
+        score = rng.random((active.size, cells))
+        # Random keys break the ties between the cells with the same priority
+
+        if strategy != 'simple':
+            ids = ship_ids[active]
+            unsunk_hits = (shots[active] & (ids > 0)
+                           & (np.take_along_axis(hitpoints[active], ids, axis=1) > 0))
+            # Hits on the ships that have not sunk yet are the ones worth targeting
+            grid = unsunk_hits.reshape(-1, board_size, board_size)
+            targets = np.zeros_like(grid)
+            targets[:, 1:, :] |= grid[:, :-1, :]
+            targets[:, :-1, :] |= grid[:, 1:, :]
+            targets[:, :, 1:] |= grid[:, :, :-1]
+            targets[:, :, :-1] |= grid[:, :, 1:]
+            # Marks every cell adjacent to an unsunk hit
+            score += 4 * targets.reshape(-1, cells)
+            if strategy == 'parity':
+                score += 2 * parity
+
+        score[~unshot] = -1
+        # Cells that have already been shot can never be chosen
+        choice = score.argmax(axis=1)
+        shots[active, choice] = True
+        hit_ids = ship_ids[active, choice]
+        hitpoints[active, hit_ids] -= 1
+
+        finished = hitpoints[active, 1:].sum(axis=1) == 0
+        shots_to_win[active[finished]] = turn
+        active = active[~finished]
+    return shots_to_win
+
+def simulate(strategy, n_games, battleships = None, board_size = 10, seed = None,
+             batch_size = BATCH_SIZE):
+    """Plays any number of games with one strategy, a batch at a time
+
+    Args:
+        strategy (str): The Ai strategy that is played
+        n_games (int): The total number of games that are played
+        battleships (dict[str:int]): The ships that make up each fleet, read from
+            'battleships.txt' if not given
+        board_size (int): The width and height of the boards
+        seed (int): The seed for the random number generator
+        batch_size (int): The number of games held in memory at once
+    Returns:
+        dict: The summary of the games returned by 'summarise'
+    """
+
+    if battleships is None:
+        battleships = create_battleships('battleships.txt')
+    rng = np.random.default_rng(seed)
+    results = []
+    start = time.perf_counter()
+    remaining = n_games
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        results.append(simulate_batch(strategy, size, battleships, board_size, rng))
+        remaining -= size
+    elapsed = time.perf_counter() - start
+    summary = summarise(np.concatenate(results), elapsed)
+    summary['strategy'] = strategy
+    summary['board_size'] = board_size
+    return summary
+
+def summarise(shots_to_win, elapsed):
+    """Summarises the distribution of the shots that the games took to win
+
+    Args:
+        shots_to_win (numpy.ndarray): The number of shots that each game took to win
+        elapsed (float): The number of seconds that the games took to simulate
+    Returns:
+        dict: The number of games, games per second, mean, standard deviation, minimum,
+            maximum and percentiles of the shots to win, as well as a histogram mapping
+            each number of shots to the number of games that took it
+    """
+
+    counts = np.bincount(shots_to_win)
+    percentiles = np.percentile(shots_to_win, [50, 90, 95, 99])
+    return {
+        'games': int(shots_to_win.size),
+        'games_per_second': shots_to_win.size / elapsed if elapsed > 0 else float('inf'),
+        'mean': float(shots_to_win.mean()),
+        'std': float(shots_to_win.std()),
+        'min': int(shots_to_win.min()),
+        'max': int(shots_to_win.max()),
+        'p50': float(percentiles[0]),
+        'p90': float(percentiles[1]),
+        'p95': float(percentiles[2]),
+        'p99': float(percentiles[3]),
+        'histogram': {int(shots): int(count) for shots, count in enumerate(counts) if count},
+    }
+
+def main(argv = None):
+    """Runs the simulator from the command line and prints the summaries as json
+
+    Args:
+        argv (list[str]): The command line arguments, taken from sys.argv if not given
+    Returns:
+        Returns nothing
+    """
+
+    parser = argparse.ArgumentParser(description='Batch self-play simulator for the battleships Ai')
+    parser.add_argument('--strategy', choices=STRATEGIES, action='append',
+                        help='strategy to simulate (repeatable, defaults to all)')
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--size', type=int, default=10)
+    parser.add_argument('--ships', default='battleships.txt')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    battleships = create_battleships(args.ships)
+    summaries = [simulate(strategy, args.games, battleships, args.size, args.seed, args.batch)
+                 for strategy in args.strategy or STRATEGIES]
+    print(json.dumps(summaries, indent=4))
+
+if __name__ == '__main__':
+    main()
@@ -4,10 +4,43 @@ This module expands on strengthening the Ai to make it harder
 for the player to overcome the challenge and as it employs more
 strategies and tactics to increase the change of the Ai winning
 the game.
+
+Attributes
+----------
+HIT_WEIGHT : int
+    How much more heavily the probability density Ai weights a placement for each
+    unresolved hit that it covers
+MONTE_CARLO_DEADLINE : float
+    The default number of seconds the Monte Carlo Ai spends sampling for each move
+MONTE_CARLO_SAMPLES : int
+    The default largest number of fleet layouts the Monte Carlo Ai samples for each move
+MONTE_CARLO_WORKERS : int
+    The default number of processes that the Monte Carlo Ai samples across
+MONTE_CARLO_CACHE_SHARE : float
+    The share of its largest number of layouts that a move must have been sampled from
+    to be stored in the cache of moves
+ENDGAME_ESTIMATE : int
+    The largest estimate of the layouts of the surviving ships for which the endgame Ai
+    tries to solve the position exactly
+ENDGAME_NODES : int
+    The default number of search nodes the endgame Ai spends on each move
+ENDGAME_LAYOUTS : int
+    The most layouts for which the endgame Ai searches for the fewest expected shots
+AI_STATES : dict{str : type}
+    The class of the state kept for each game by the algorithms that have one
 """
 
 
+import atexit
+import concurrent.futures
+import heapq
+import multiprocessing
+import os
 import random
+import threading
+import time
+from bitboard import INDEX_MAX_SIZE, segment_index
+from zobrist import ShotHash, transpositions
 
 def hunt_and_target_ai(ship_detection, ai_hitlog, board_size):
     """Advanced version of the battleships Ai
@@ -133,11 +166,1066 @@ def parity_ai(ship_detection, ai_hitlog, board_size):
         y = random.randrange(0, board_size)
         # Generates a random coordinate
 
-        if x + (y * 10) > 9:
+        if (x + y) % 2 == 1:
             # Determines whether the Ai is shooting a 'black square'
-            if (x + (y * 10)) % 2 == 1 and y % 2 == 0:
-                return (x, y), stackco_ords
-            if (x + (y * 10)) % 2 == 0 and y % 2 == 1:
-                return(x, y), stackco_ords
+            return (x, y), stackco_ords
         if x % 2 == 1:
             return (x, y), stackco_ords
+
+HIT_WEIGHT = 50
+UNKNOWN, MISS, HIT, SUNK = 0, 1, 2, 3
+# The states of the cells kept by the probability density Ai
+
+def line_coverage(cells, start, stride, length_of_line, lo, hi, ship_lengths):
+    """Counts the legal ship placements covering each cell of a section of a line
+
+    Description:
+        A line is either a row or a column of the board, read from the flat list of cell
+        states. For every surviving ship length, the number of misses and unresolved hits
+        inside every window of that length is found from a running (prefix) sum, so that
+        each window is checked in constant time. A window containing a miss or a sunk ship
+        is not a legal placement; every other window is weighted by the number of unresolved
+        hits it covers. The coverage of a cell is then the sliding sum of the weights of the
+        windows that cover it.
+
+    Args:
+        cells (list[int]): The flat list of cell states of the board
+        start (int): The index of the first cell of the line in the flat list
+        stride (int): The distance between neighbouring cells of the line in the flat list
+        length_of_line (int): The number of cells in the line
+        lo (int): The first cell of the line whose coverage is counted
+        hi (int): One past the last cell of the line whose coverage is counted
+        ship_lengths (dict{int : int}): The number of surviving ships of each length
+    Returns:
+        list[int]: The coverage of each cell from lo up to hi
+    """
+
+    coverage = [0] * (hi - lo)
+    for length, count in ship_lengths.items():
+        first = max(0, lo - length + 1)
+        last = min(hi - 1, length_of_line - length)
+        # The windows that start from first up to last are the ones covering [lo, hi)
+        if last < first:
+            continue
+        span_end = last + length
+
+        blocked = [0]
+        hits = [0]
+        for k in range(first, span_end):
+            state = cells[start + k * stride]
+            blocked.append(blocked[-1] + (state == MISS or state == SUNK))
+            hits.append(hits[-1] + (state == HIT))
+        # Running sums of the blocked cells and unresolved hits across the section
+
+        weights = [0]
+        for window in range(first, last + 1):
+            offset = window - first
+            weight = 0
+            if blocked[offset + length] == blocked[offset]:
+                weight = count * (1 + HIT_WEIGHT * (hits[offset + length] - hits[offset]))
+            weights.append(weights[-1] + weight)
+        # Running sum of the weight of each legal window
+
+        for cell in range(lo, hi):
+            window_lo = max(first, cell - length + 1)
+            window_hi = min(last, cell)
+            if window_hi >= window_lo:
+                coverage[cell - lo] += weights[window_hi - first + 1] - weights[window_lo - first]
+    return coverage
+
+
+class ProbabilityDensity:
+    """The state of the probability density Ai for a single game
+
+    Description:
+        Keeps, for every cell of the board and every surviving ship length, the number of
+        legal placements of a ship of that length that cover it, given all the hits and
+        misses so far, and the total of those counts. After each shot only the cells within
+        one ship length of the shot, along its row and its column, can change, so only
+        those are recounted. When a ship sinks, only the lines through its cells are
+        recounted, and the coverage of its length is subtracted from the totals rather than
+        counted again. The best cell is kept at the top of a heap, where the entries that
+        have gone stale are skipped when they reach the top.
+
+    Attributes:
+        board_size (int): The width and height of the board
+        ships (dict{str : int}): The surviving ships and their lengths
+        cells (list[int]): The state of every cell of the board, stored row by row
+        zobrist (ShotHash): The hash of the cell states, or None on a board too large
+            to index
+    """
+
+    def __init__(self, board_size, battleships):
+        self.board_size = board_size
+        self.ships = {name: int(length) for name, length in battleships.items()}
+        self.cells = [UNKNOWN] * (board_size * board_size)
+        self.zobrist = ShotHash(board_size) if board_size <= INDEX_MAX_SIZE else None
+        self._lengths = self._ship_lengths()
+        self._horizontal = {}
+        self._vertical = {}
+        for length in self._lengths:
+            line = line_coverage(self.cells, 0, 1, board_size, 0, board_size, {length: 1})
+            self._horizontal[length] = line * board_size
+            self._vertical[length] = [coverage for coverage in line for _ in range(board_size)]
+            # Every row and every column of an empty board has the same coverage
+        self._total = [0] * (board_size * board_size)
+        for length, count in self._lengths.items():
+            self._total = [total + count * (horizontal + vertical) for total, horizontal, vertical
+                           in zip(self._total, self._horizontal[length], self._vertical[length])]
+        self._rebuild_heap()
+
+    def _ship_lengths(self):
+        """Counts the surviving ships of each length
+
+        Args:
+            No arguments
+        Returns:
+            dict{int : int}: The number of surviving ships of each length
+        """
+
+        lengths = {}
+        for length in self.ships.values():
+            lengths[length] = lengths.get(length, 0) + 1
+        return lengths
+
+    def _score(self, index):
+        if self.cells[index] != UNKNOWN:
+            return -1
+        return self._total[index]
+
+    def _rebuild_heap(self):
+        """Rebuilds the heap from the total coverage of every cell
+
+        Args:
+            No arguments
+        Returns:
+            Returns nothing
+        """
+
+        self._heap = [(-total, index) for index, (total, state)
+                      in enumerate(zip(self._total, self.cells)) if state == UNKNOWN]
+        heapq.heapify(self._heap)
+
+    def _remove_length(self, length):
+        """Subtracts the coverage of one ship of a length that has sunk from every cell
+
+        Args:
+            length (int): The length of the ship that has sunk
+        Returns:
+            Returns nothing
+        """
+
+        self._total = [total - horizontal - vertical for total, horizontal, vertical
+                       in zip(self._total, self._horizontal[length], self._vertical[length])]
+        self._lengths[length] -= 1
+        if not self._lengths[length]:
+            del self._lengths[length], self._horizontal[length], self._vertical[length]
+
+    def _update(self, x, y, push = True):
+        """Recounts the coverage of the cells whose placements include the cell (x, y)
+
+        Args:
+            x (int): The column of the cell that has changed
+            y (int): The row of the cell that has changed
+            push (bool): Whether the recounted cells are pushed onto the heap; when a ship
+                sinks the heap is rebuilt instead
+        Returns:
+            Returns nothing
+        """
+
+        size = self.board_size
+        changed = set()
+        for length in self._lengths:
+            reach = length - 1
+            lo, hi = max(0, x - reach), min(size, x + reach + 1)
+            self._horizontal[length][y * size + lo:y * size + hi] = line_coverage(
+                self.cells, y * size, 1, size, lo, hi, {length: 1})
+            changed.update(y * size + column for column in range(lo, hi))
+
+            lo, hi = max(0, y - reach), min(size, y + reach + 1)
+            self._vertical[length][lo * size + x:hi * size + x:size] = line_coverage(
+                self.cells, x, size, size, lo, hi, {length: 1})
+            changed.update(row * size + x for row in range(lo, hi))
+
+        for index in changed:
+            self._total[index] = sum(
+                count * (self._horizontal[length][index] + self._vertical[length][index])
+                for length, count in self._lengths.items())
+        if not push:
+            return
+        if len(self._heap) > 4 * size * size:
+        # Rebuilds the heap once the stale entries outnumber the live ones
+            self._rebuild_heap()
+        else:
+            for index in changed:
+                heapq.heappush(self._heap, (-self._score(index), index))
+
+    def _set_cell(self, x, y, state):
+        index = y * self.board_size + x
+        if self.zobrist is not None:
+            self.zobrist.update(x, y, self.cells[index], state)
+        self.cells[index] = state
+
+    def can_shoot(self, co_ord):
+        """Checks whether a cell is on the board and has not been shot
+
+        Args:
+            co_ord (tuple(int, int)): The cell
+        Returns:
+            bool: True if the Ai can shoot the cell
+        """
+
+        x, y = co_ord
+        return (0 <= x < self.board_size and 0 <= y < self.board_size and
+                self.cells[y * self.board_size + x] == UNKNOWN)
+
+    def record_shot(self, coordinates, hit, sunk = None, sunk_cells = None):
+        """Updates the density after one of the Ai's shots
+
+        Args:
+            coordinates (tuple(int, int)): The coordinates of the shot
+            hit (bool): Whether the shot hit one of the player's ships
+            sunk (str): The name of the ship that the shot sank, if any
+            sunk_cells (list[tuple(int, int)]): The cells of the sunk ship, if they are known;
+                otherwise the hits on the sunk ship stay as targets for the Ai
+        Returns:
+            Returns nothing
+        """
+
+        x, y = int(coordinates[0]), int(coordinates[1])
+        self._set_cell(x, y, HIT if hit else MISS)
+        if sunk is None:
+            self._update(x, y)
+            return
+        length = self.ships.pop(sunk, None)
+        if length is not None:
+            self._remove_length(length)
+        self._update(x, y, push=False)
+        for cell_x, cell_y in sunk_cells or ():
+            self._set_cell(int(cell_x), int(cell_y), SUNK)
+            self._update(int(cell_x), int(cell_y), push=False)
+        self._rebuild_heap()
+        # Every score has changed with the surviving lengths, so the heap is built again
+
+    def best_shot(self):
+        """Finds the cell covered by the most legal placements
+
+        Args:
+            No arguments
+        Returns:
+            tuple(int, int): The coordinate for the Ai's next attack, or None if every
+                cell has been shot
+        """
+
+        heap = self._heap
+        while heap:
+            score, index = heap[0]
+            if self.cells[index] == UNKNOWN and -score == self._score(index):
+                return index % self.board_size, index // self.board_size
+            heapq.heappop(heap)
+            # Discards the entry as it is out of date
+        return None
+
+def probability_density_ai(ai_state, ai_hitlog, board_size, battleships = None):
+    """Ai that shoots the cell most likely to contain one of the player's ships
+
+    Description:
+        The 'Probability Density Ai' counts, for every cell of the player's board, how
+        many ways the surviving ships could be placed over it given all of its hits and
+        misses so far, and then shoots the cell with the highest count. When a ship has
+        been hit, the placements covering the hit are weighted far more heavily, so the
+        Ai naturally finishes off the ship before hunting again.
+
+    Args:
+        ai_state (ProbabilityDensity): The density kept for the game, which must be told
+            the result of every shot through its 'record_shot' method
+        ai_hitlog (list[tuple(int, int)]): A log of all the coordinates that the Ai has hit 
+            on the player's board, used when the game does not have a density yet
+        board_size (int): The size of the player's board
+        battleships (dict[str:int]): The player's ships and their lengths, used when the game
+            does not have a density yet
+
+    Returns:
+        tuple(int, int): The coordinate for the Ai's next attack
+    Raises:
+        ValueError: The game does not have a density and the player's ships are not given
+    """
+
+    if ai_state is None:
+        if not battleships:
+            raise ValueError('The surviving ships are needed to attack without a density')
+        ai_state = ProbabilityDensity(board_size, battleships)
+        for co_ord in ai_hitlog or ():
+            ai_state.record_shot(co_ord, False)
+            # Without a density the results are unknown, so the shots are treated as misses
+    return ai_state.best_shot()
+
+class CellPool:
+    """The cells of a board that the Ai has not shot yet
+
+    Description:
+        The cells are split into the checkerboard cells, where (x + y) is odd, and the
+        rest, and each half is kept as a virtual list that starts with its cells in row
+        order. A random cell is drawn by picking a random position in a list, and a cell
+        is removed by moving the last cell of its list into its place, so both take the
+        same time however full the board is, and the parity Ai draws from the
+        checkerboard list until it is empty. Only the cells that have been moved or
+        removed are stored, so the pool of a huge board grows with the shots taken rather
+        than with the area of the board.
+    """
+
+    __slots__ = ('_size', '_counts', '_cells', '_positions')
+
+    def __init__(self, board_size):
+        self._size = board_size
+        cells = board_size * board_size
+        self._counts = [cells - cells // 2, cells // 2]
+        # The number of cells left off and on the checkerboard
+        self._cells = ({}, {})
+        # The cell at each position of a list that no longer holds its own number
+        self._positions = ({}, {})
+        # The position of each cell that has been moved, or -1 once it has been removed
+
+    def __len__(self):
+        return self._counts[0] + self._counts[1]
+
+    def __contains__(self, co_ord):
+        cell = self._cell(co_ord)
+        if cell is None:
+            return False
+        parity, number = cell
+        return 0 <= self._positions[parity].get(number, number) < self._counts[parity]
+
+    def _cell(self, co_ord):
+        if not isinstance(co_ord, tuple) or len(co_ord) != 2:
+            return None
+        x, y = co_ord
+        if not (0 <= x < self._size and 0 <= y < self._size):
+            return None
+        parity = (x + y) % 2
+        first = self._size // 2 if parity else (self._size + 1) // 2
+        # Every pair of rows holds 'size' cells of each list, 'first' of them in its first row
+        return parity, (y // 2) * self._size + x // 2 + (y % 2) * first
+
+    def _co_ord(self, parity, number):
+        first = self._size // 2 if parity else (self._size + 1) // 2
+        pair, rest = divmod(number, self._size)
+        if rest < first:
+            return (2 * rest + parity, 2 * pair)
+        return (2 * (rest - first) + 1 - parity, 2 * pair + 1)
+
+    def _draw(self, parity, position):
+        return self._co_ord(parity, self._cells[parity].get(position, position))
+
+    def sample(self):
+        """Draws a random cell that has not been shot, without removing it
+
+        Args:
+            No arguments
+        Returns:
+            tuple(int, int): A random cell from the pool, or None if the pool is empty
+        """
+
+        if not len(self):
+            return None
+        position = random.randrange(len(self))
+        if position < self._counts[1]:
+            return self._draw(1, position)
+        return self._draw(0, position - self._counts[1])
+
+    def sample_checkerboard(self):
+        """Draws a random checkerboard cell that has not been shot, without removing it
+
+        Description:
+            Once no checkerboard cell is left any cell is drawn instead.
+
+        Args:
+            No arguments
+        Returns:
+            tuple(int, int): A random cell from the pool, or None if the pool is empty
+        """
+
+        if not self._counts[1]:
+            return self.sample()
+        return self._draw(1, random.randrange(self._counts[1]))
+
+    def remove(self, co_ord):
+        """Removes a cell from the pool once it has been shot
+
+        Args:
+            co_ord (tuple(int, int)): The cell that has been shot
+        Returns:
+            bool: True if the cell was in the pool
+        """
+
+        if co_ord not in self:
+            return False
+        parity, number = self._cell(co_ord)
+        cells, positions = self._cells[parity], self._positions[parity]
+        position = positions.get(number, number)
+        self._counts[parity] -= 1
+        count = self._counts[parity]
+        last = cells.pop(count, count)
+        if position < count:
+            cells[position] = last
+            positions[last] = position
+            # Moves the last cell of the list into the gap left by the removed cell
+        positions[number] = -1
+        return True
+
+MONTE_CARLO_DEADLINE = 0.05
+MONTE_CARLO_SAMPLES = 4000
+MONTE_CARLO_WORKERS = os.cpu_count() or 1
+MONTE_CARLO_CACHE_SHARE = 0.5
+MONTE_CARLO_GRACE = 0.01
+# The extra time given to the worker processes to send back their counts
+MONTE_CARLO_RETRIES = 20
+# The random positions tried for a ship before a sampled layout is thrown away
+
+_monte_carlo_pool = None
+_monte_carlo_workers = 0
+
+def sample_layouts(board_size, lengths, blocked, hits, seed, stop, max_samples):
+    """Samples random fleet layouts that agree with every shot so far
+
+    Description:
+        Each layout places every surviving ship at a legal position, where no ship covers
+        a miss, a sunk ship or another ship, and every unresolved hit is covered by a
+        ship. The ships that cover the hits are placed first, each over the lowest hit
+        that is still uncovered, and then the remaining ships are placed at random; a
+        layout that cannot be completed is thrown away. The positions are the masks of
+        'bitboard.segment_index', so the whole layout is checked with a few integer ANDs.
+        This runs inside the worker processes, so it only takes and returns plain values.
+
+    Args:
+        board_size (int): The width and height of the board
+        lengths (list[int]): The lengths of the surviving ships
+        blocked (int): The mask of the cells that no ship can cover
+        hits (int): The mask of the hits that must be covered by a ship
+        seed (int): The seed of the random layouts
+        stop (float): The monotonic time at which the sampling stops
+        max_samples (int): The largest number of layouts that are sampled
+    Returns:
+        list[int]: The number of layouts covering each cell, stored row by row
+        int: The number of layouts sampled
+    """
+
+    rng = random.Random(seed)
+    legal = {length: [mask for mask in segment_index(board_size, length).masks
+                      if not mask & blocked] for length in set(lengths)}
+    covering = {}
+    # The legal masks of each length covering each hit, built the first time they are needed
+    tally = {}
+    samples = 0
+    attempts = 0
+    while samples < max_samples:
+        if attempts % 32 == 0 and time.monotonic() >= stop:
+            break
+        attempts += 1
+        order = list(lengths)
+        rng.shuffle(order)
+        occupied = 0
+        uncovered = hits
+        placed = []
+        while order:
+            if uncovered:
+                target = uncovered & -uncovered
+                options = []
+                for position, length in enumerate(order):
+                    masks = covering.get((length, target))
+                    if masks is None:
+                        masks = covering[(length, target)] = [mask for mask in legal[length]
+                                                              if mask & target]
+                    options.extend((position, mask) for mask in masks if not mask & occupied)
+                if not options:
+                    break
+                position, mask = rng.choice(options)
+                order.pop(position)
+            else:
+                masks = legal[order.pop()]
+                mask = 0
+                for _ in range(MONTE_CARLO_RETRIES if masks else 0):
+                    mask = rng.choice(masks)
+                    if not mask & occupied:
+                        break
+                else:
+                    break
+            occupied |= mask
+            uncovered &= ~mask
+            placed.append(mask)
+        else:
+            if not uncovered:
+                samples += 1
+                for mask in placed:
+                    tally[mask] = tally.get(mask, 0) + 1
+                # Counting each position once per layout is far cheaper than each cell
+
+    counts = [0] * (board_size * board_size)
+    for mask, count in tally.items():
+        while mask:
+            low = mask & -mask
+            counts[low.bit_length() - 1] += count
+            mask ^= low
+    return counts, samples
+
+def monte_carlo_pool(workers):
+    """Gets the pool of processes shared by every Monte Carlo Ai in this process
+
+    Description:
+        The workers are forked, so they start at once and share the pages of this
+        process, but forking a process that is running other threads can copy a lock
+        that one of them holds into every worker. The pool is therefore only started
+        while this process has a single thread, and every worker is forked straight
+        away rather than on demand. The web server starts it before any other thread
+        when BATTLESHIPS_MONTE_CARLO_POOL is set; otherwise it samples in the request's
+        own thread.
+
+    Args:
+        workers (int): The number of processes in the pool
+    Returns:
+        concurrent.futures.ProcessPoolExecutor: The pool, or None if it has not been
+            started and can no longer be started safely
+    """
+
+    global _monte_carlo_pool, _monte_carlo_workers
+    if _monte_carlo_pool is not None and _monte_carlo_workers == workers:
+        return _monte_carlo_pool
+    if threading.active_count() > 1:
+        return None
+    if _monte_carlo_pool is not None:
+        _monte_carlo_pool.shutdown(wait=False, cancel_futures=True)
+    context = None
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    _monte_carlo_pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                               mp_context=context)
+    _monte_carlo_workers = workers
+    _monte_carlo_pool.submit(os.getpid).result()
+    # Forks every worker now, before the pool's own manager thread is running
+    return _monte_carlo_pool
+
+@atexit.register
+def _shutdown_monte_carlo_pool():
+    if _monte_carlo_pool is not None:
+        _monte_carlo_pool.shutdown(wait=False, cancel_futures=True)
+
+class MonteCarloTargeting:
+    """The state of the Monte Carlo Ai for a single game
+
+    Description:
+        Keeps the misses, the unresolved hits and the cells of the sunk ships as masks
+        of the board. For each move it samples as many fleet layouts that agree with them
+        as it can until the deadline, spread over a pool of processes when one has been
+        started (see 'monte_carlo_pool'), and shoots the cell covered by the most layouts.
+        The workers stop by themselves at the deadline, and any worker that is late is
+        left out, so a move never waits much longer than the deadline. The state is also
+        kept as a Zobrist hash, and each move is stored in a cache shared by every game,
+        so a position that has been seen before, such as the empty board, is answered
+        without sampling. A move is only stored once it has been sampled from at least
+        MONTE_CARLO_CACHE_SHARE of the layouts it could have been, and the key holds the
+        sampling budget, so a move rushed by a short deadline is never reused by a game
+        with a larger budget. Boards larger than the segment index, and positions where
+        no layout agrees with the shots, fall back to shooting next to a hit or at random.
+
+    Attributes:
+        board_size (int): The width and height of the board
+        ships (dict{str : int}): The surviving ships and their lengths
+        deadline (float): The number of seconds spent sampling for each move
+        max_samples (int): The largest number of layouts sampled for each move
+        workers (int): The number of processes the layouts are sampled across
+        on_move (function): When given, called after each move with the number of
+            layouts sampled and the seconds taken, so the Ai can be benchmarked
+        cache (TranspositionCache): The cache of the moves chosen for each hashed state
+        samples (int): The number of layouts sampled for the last move, 0 when the move
+            came from the cache
+        latency (float): The seconds taken to choose the last move
+        shots (set[tuple]): The cells that the Ai has shot
+        zobrist (ShotHash): The hash of the shots, or None on a board too large to sample
+    """
+
+    def __init__(self, board_size, battleships, deadline = None, max_samples = None,
+                 workers = None, on_move = None, cache = transpositions):
+        self.board_size = board_size
+        self.ships = {name: int(length) for name, length in battleships.items()}
+        self.deadline = MONTE_CARLO_DEADLINE if deadline is None else deadline
+        self.max_samples = MONTE_CARLO_SAMPLES if max_samples is None else max_samples
+        self.workers = MONTE_CARLO_WORKERS if workers is None else workers
+        self.on_move = on_move
+        self.cache = cache
+        self.samples = 0
+        self.latency = 0.0
+        self.shots = set()
+        self.zobrist = ShotHash(board_size) if board_size <= INDEX_MAX_SIZE else None
+        self._misses = 0
+        self._hits = 0
+        self._sunk = 0
+
+    def record_shot(self, coordinates, hit, sunk = None, sunk_cells = None):
+        """Updates the known cells after one of the Ai's shots
+
+        Args:
+            coordinates (tuple(int, int)): The coordinates of the shot
+            hit (bool): Whether the shot hit one of the player's ships
+            sunk (str): The name of the ship that the shot sank, if any
+            sunk_cells (list[tuple(int, int)]): The cells of the sunk ship, if they are known;
+                otherwise the hits on the sunk ship stay as targets for the Ai
+        Returns:
+            Returns nothing
+        """
+
+        x, y = int(coordinates[0]), int(coordinates[1])
+        self.shots.add((x, y))
+        bit = 1 << (y * self.board_size + x)
+        if hit:
+            self._hits |= bit
+        else:
+            self._misses |= bit
+        if self.zobrist is not None:
+            self.zobrist.update(x, y, UNKNOWN, HIT if hit else MISS)
+        if sunk is None:
+            return
+        self.ships.pop(sunk, None)
+        for cell_x, cell_y in sunk_cells or ():
+            cell_x, cell_y = int(cell_x), int(cell_y)
+            bit = 1 << (cell_y * self.board_size + cell_x)
+            if self.zobrist is not None and self._hits & bit:
+                self.zobrist.update(cell_x, cell_y, HIT, SUNK)
+            self._hits &= ~bit
+            self._sunk |= bit
+
+    def can_shoot(self, co_ord):
+        """Checks whether a cell is on the board and has not been shot
+
+        Args:
+            co_ord (tuple(int, int)): The cell
+        Returns:
+            bool: True if the Ai can shoot the cell
+        """
+
+        x, y = co_ord
+        return 0 <= x < self.board_size and 0 <= y < self.board_size and co_ord not in self.shots
+
+    def _sample(self):
+        """Samples the layouts for one move, across the pool when there is more than one worker
+
+        Args:
+            No arguments
+        Returns:
+            list[int]: The number of layouts covering each cell, stored row by row
+            int: The number of layouts sampled
+        """
+
+        arguments = (self.board_size, list(self.ships.values()), self._misses | self._sunk,
+                     self._hits)
+        stop = time.monotonic() + self.deadline
+        # The monotonic clock is shared by every process, so the workers stop together
+        if self.workers <= 1 or multiprocessing.current_process().daemon:
+        # The worker processes of a tournament cannot start processes of their own
+            return sample_layouts(*arguments, random.getrandbits(64), stop, self.max_samples)
+
+        share = -(-self.max_samples // self.workers)
+        try:
+            pool = monte_carlo_pool(self.workers)
+            if pool is None:
+                return sample_layouts(*arguments, random.getrandbits(64), stop, self.max_samples)
+                # No pool was started before the other threads of this process
+            futures = [pool.submit(sample_layouts, *arguments, random.getrandbits(64), stop,
+                                   share) for _ in range(self.workers)]
+        except (RuntimeError, concurrent.futures.process.BrokenProcessPool):
+            global _monte_carlo_pool
+            _monte_carlo_pool = None
+            return sample_layouts(*arguments, random.getrandbits(64), stop, self.max_samples)
+        done, late = concurrent.futures.wait(
+            futures, timeout=max(0.0, stop - time.monotonic()) + MONTE_CARLO_GRACE)
+        for future in late:
+            future.cancel()
+
+        counts = [0] * (self.board_size * self.board_size)
+        samples = 0
+        for future in done:
+            if future.exception() is not None:
+                continue
+            worker_counts, worker_samples = future.result()
+            counts = [total + count for total, count in zip(counts, worker_counts)]
+            samples += worker_samples
+        return counts, samples
+
+    def _fallback_shot(self):
+        """Finds a shot when no layout has been sampled
+
+        Args:
+            No arguments
+        Returns:
+            tuple(int, int): A cell next to an unresolved hit if there is one, otherwise
+                a random cell that has not been shot, or None if every cell has been shot
+        """
+
+        size = self.board_size
+        if len(self.shots) >= size * size:
+            return None
+        for x, y in sorted(self.shots):
+            if not self._hits >> (y * size + x) & 1:
+                continue
+            for co_ord in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if 0 <= co_ord[0] < size and 0 <= co_ord[1] < size and co_ord not in self.shots:
+                    return co_ord
+        for _ in range(64):
+            co_ord = (random.randrange(size), random.randrange(size))
+            if co_ord not in self.shots:
+                return co_ord
+        return next((x, y) for y in range(size) for x in range(size)
+                    if (x, y) not in self.shots)
+
+    def best_shot(self):
+        """Finds the cell covered by the most of the sampled layouts
+
+        Args:
+            No arguments
+        Returns:
+            tuple(int, int): The coordinate for the Ai's next attack, or None if every
+                cell has been shot
+        """
+
+        start = time.perf_counter()
+        key = None
+        co_ord = None
+        if self.zobrist is not None:
+            key = ('montecarlo', self.board_size, tuple(sorted(self.ships.values())),
+                   self.deadline, self.max_samples, self.zobrist.value)
+            co_ord = self.cache.get(key)
+        counts, samples = [], 0
+        if co_ord is None or co_ord in self.shots:
+            if self.ships and self.zobrist is not None:
+                counts, samples = self._sample()
+            shot_cells = self._misses | self._hits | self._sunk
+            best, best_count = None, 0
+            for index, count in enumerate(counts):
+                if count > best_count and not shot_cells >> index & 1:
+                    best, best_count = index, count
+            if best is not None:
+                co_ord = (best % self.board_size, best // self.board_size)
+                if samples >= MONTE_CARLO_CACHE_SHARE * self.max_samples:
+                    self.cache.put(key, co_ord)
+                    # A move sampled from too few layouts is not reused by other games
+            else:
+                co_ord = self._fallback_shot()
+
+        self.samples = samples
+        self.latency = time.perf_counter() - start
+        if self.on_move is not None:
+            self.on_move(self.samples, self.latency)
+        return co_ord
+
+def monte_carlo_ai(ai_state, ai_hitlog, board_size, battleships = None):
+    """Ai that shoots the cell covered most often by random layouts of the player's fleet
+
+    Description:
+        The 'Monte Carlo Ai' samples as many layouts of the player's surviving ships as
+        it can within a time budget, keeping only those that agree with all of its hits,
+        misses and sunk ships, and then shoots the cell that the most layouts put a ship
+        on. The sampling is spread across a pool of processes.
+
+    Args:
+        ai_state (MonteCarloTargeting): The state kept for the game, which must be told
+            the result of every shot through its 'record_shot' method
+        ai_hitlog (list[tuple(int, int)]): A log of all the coordinates that the Ai has hit
+            on the player's board, used when the game does not have a state yet
+        board_size (int): The size of the player's board
+        battleships (dict[str:int]): The player's ships and their lengths, used when the game
+            does not have a state yet
+
+    Returns:
+        tuple(int, int): The coordinate for the Ai's next attack
+    Raises:
+        ValueError: The game does not have a state and the player's ships are not given
+    """
+
+    if ai_state is None:
+        if not battleships:
+            raise ValueError('The surviving ships are needed to attack without a state')
+        ai_state = MonteCarloTargeting(board_size, battleships)
+        for co_ord in ai_hitlog or ():
+            ai_state.record_shot(co_ord, False)
+            # Without a state the results are unknown, so the shots are treated as misses
+    return ai_state.best_shot()
+
+ENDGAME_ESTIMATE = 2000
+ENDGAME_NODES = 300
+ENDGAME_LAYOUTS = 8
+
+class SearchBudgetExceeded(Exception):
+    """Raised when a search of the endgame Ai runs out of nodes"""
+
+def enumerate_layouts(board_size, lengths, blocked, hits, node_budget):
+    """Lists every layout of the surviving ships that agrees with every shot so far
+
+    Description:
+        A depth first search places the ships from the longest to the shortest over the
+        masks of 'bitboard.segment_index' that do not cover a miss or a sunk ship. Ships
+        of the same length are placed in increasing order of their masks, so the same
+        layout is not listed once for each order of the ships, and a branch is cut as
+        soon as the ships left are too short to cover the hits that are still uncovered.
+
+    Args:
+        board_size (int): The width and height of the board
+        lengths (list[int]): The lengths of the surviving ships
+        blocked (int): The mask of the cells that no ship can cover
+        hits (int): The mask of the hits that must be covered by a ship
+        node_budget (int): The largest number of search nodes visited
+    Returns:
+        dict{int : int}: The number of layouts leaving each mask of cells still to be hit,
+            or None if the search ran out of nodes
+    """
+
+    lengths = sorted(lengths, reverse=True)
+    legal = [[mask for mask in segment_index(board_size, length).masks if not mask & blocked]
+             for length in lengths]
+    remaining = [sum(lengths[ship:]) for ship in range(len(lengths) + 1)]
+    layouts = {}
+    nodes = 0
+    stack = [(0, 0, 0, hits)]
+    while stack:
+        ship, start, occupied, uncovered = stack.pop()
+        nodes += 1
+        if nodes > node_budget:
+            return None
+        if ship == len(lengths):
+            if not uncovered:
+                layout = occupied & ~hits
+                layouts[layout] = layouts.get(layout, 0) + 1
+            continue
+        if bin(uncovered).count('1') > remaining[ship]:
+            continue
+        # The ships left cannot cover every hit
+        same_length = ship + 1 < len(lengths) and lengths[ship + 1] == lengths[ship]
+        masks = legal[ship]
+        for position in range(start, len(masks)):
+            mask = masks[position]
+            if not mask & occupied:
+                stack.append((ship + 1, position + 1 if same_length else 0,
+                              occupied | mask, uncovered & ~mask))
+    return layouts
+
+def estimate_layouts(board_size, lengths, blocked):
+    """Estimates the number of layouts of the surviving ships, without listing them
+
+    Description:
+        Multiplies together the number of positions left for each ship, dividing out the
+        orders of the ships of the same length. Overlapping ships are not ruled out, so
+        this is an upper bound of the layouts, and of the work of listing them, found in
+        one pass over the segment index of each length.
+
+    Args:
+        board_size (int): The width and height of the board
+        lengths (list[int]): The lengths of the surviving ships
+        blocked (int): The mask of the cells that no ship can cover
+    Returns:
+        int: The estimated number of layouts
+    """
+
+    estimate = 1
+    same = {}
+    for length in lengths:
+        same[length] = same.get(length, 0) + 1
+        positions = sum(1 for mask in segment_index(board_size, length).masks if not mask & blocked)
+        estimate = estimate * positions // same[length]
+    return estimate
+
+def layout_coverage(layouts):
+    """Counts the layouts that put a ship on each cell
+
+    Args:
+        layouts (dict{int : int}): The number of layouts leaving each mask of cells
+    Returns:
+        dict{int : int}: The number of layouts covering each cell, keyed by its bit
+    """
+
+    coverage = {}
+    for mask, weight in layouts.items():
+        while mask:
+            bit = mask & -mask
+            coverage[bit] = coverage.get(bit, 0) + weight
+            mask ^= bit
+    return coverage
+
+def expected_shots(layouts, node_budget):
+    """Finds the shot that sinks the surviving ships in the fewest expected shots
+
+    Description:
+        Every layout is equally likely. Shooting a cell splits the layouts into those
+        with a ship on it and those without, and the expected number of shots of a set
+        of layouts is one more than the expected number of the split it leads to, for
+        the best cell. A cell covered by every layout is always a hit, so it is shot
+        straight away; otherwise the cells are tried from the most covered, and the
+        search stops early once the lower bound of a cell, the average number of
+        cells that the layouts leave to hit, less the chance that the next shot hits,
+        cannot beat the best cell so far. Knowing that a ship has sunk is not used,
+        so the result is an upper bound of what could be achieved.
+
+    Args:
+        layouts (dict{int : int}): The number of layouts leaving each mask of cells
+        node_budget (int): The largest number of sets of layouts that are looked at
+    Returns:
+        float: The expected number of shots to hit every cell left
+        int: The bit of the cell to shoot, or None if there are no cells left
+    Raises:
+        SearchBudgetExceeded: The search has looked at more sets of layouts than its budget
+    """
+
+    memo = {}
+    nodes = [0]
+
+    def solve(layouts):
+        nodes[0] += 1
+        if nodes[0] > node_budget:
+            raise SearchBudgetExceeded(f'More than {node_budget} nodes were searched')
+        key = frozenset(layouts.items())
+        if key in memo:
+            return memo[key]
+
+        total = sum(layouts.values())
+        union, common = 0, -1
+        for mask in layouts:
+            union |= mask
+            common &= mask
+        if not union:
+            return 0.0, None
+        if common:
+            bit = common & -common
+            # A cell in every layout is a certain hit
+            result = (1 + solve({mask ^ bit: weight for mask, weight in layouts.items()})[0], bit)
+            memo[key] = result
+            return result
+
+        lower = sum(bin(mask).count('1') * weight for mask, weight in layouts.items()) / total
+        best, best_bit = float('inf'), None
+        coverage = layout_coverage(layouts)
+        for bit in sorted(coverage, key=lambda bit: (-coverage[bit], bit)):
+            if 1 + lower - coverage[bit] / total >= best - 1e-9:
+                break
+            # Even the average cells left to hit after this shot cannot beat the best
+            # shot, and the cells after it are covered less often
+            hit, miss = {}, {}
+            for mask, weight in layouts.items():
+                if mask & bit:
+                    hit[mask ^ bit] = hit.get(mask ^ bit, 0) + weight
+                else:
+                    miss[mask] = weight
+            expected = 1 + (coverage[bit] * solve(hit)[0] +
+                            (total - coverage[bit]) * solve(miss)[0]) / total
+            if expected < best:
+                best, best_bit = expected, bit
+        memo[key] = (best, best_bit)
+        return best, best_bit
+
+    return solve(layouts)
+
+class EndgameTargeting(ProbabilityDensity):
+    """The state of the endgame Ai for a single game
+
+    Description:
+        Plays as the probability density Ai until a cheap estimate of the layouts of the
+        surviving ships (see 'estimate_layouts') falls below ENDGAME_ESTIMATE. From then
+        on, each move lists every layout that agrees with the shots so far; when there
+        are few enough of them, it shoots the cell that sinks them in the fewest expected
+        shots, and otherwise the cell covered by the most layouts. Both searches share a
+        node budget, and when the layouts cannot be listed within it the move falls back
+        to the probability density.
+
+    Attributes:
+        node_budget (int): The largest number of search nodes visited for each move
+        solved (bool): Whether the last move came from the endgame search
+    """
+
+    def __init__(self, board_size, battleships, node_budget = None):
+        super().__init__(board_size, battleships)
+        self.node_budget = ENDGAME_NODES if node_budget is None else node_budget
+        self.solved = False
+
+    def _endgame_shot(self):
+        """Finds the best shot from the layouts that agree with the shots so far
+
+        Args:
+            No arguments
+        Returns:
+            tuple(int, int): The coordinate of the shot, or None if the layouts could not
+                be listed within the node budget
+        """
+
+        blocked, hits = 0, 0
+        for index, state in enumerate(self.cells):
+            if state == MISS or state == SUNK:
+                blocked |= 1 << index
+            elif state == HIT:
+                hits |= 1 << index
+        lengths = list(self.ships.values())
+        if estimate_layouts(self.board_size, lengths, blocked) > ENDGAME_ESTIMATE:
+            return None
+            # The board is still too open for the layouts to be listed quickly
+        layouts = enumerate_layouts(self.board_size, lengths, blocked, hits, self.node_budget)
+        if not layouts or not any(layouts):
+            return None
+        bit = None
+        if len(layouts) <= ENDGAME_LAYOUTS:
+            try:
+                bit = expected_shots(layouts, self.node_budget)[1]
+            except SearchBudgetExceeded:
+                bit = None
+        if bit is None:
+            coverage = layout_coverage(layouts)
+            bit = min(coverage, key=lambda bit: (-coverage[bit], bit))
+        index = bit.bit_length() - 1
+        return index % self.board_size, index // self.board_size
+
+    def best_shot(self):
+        """Finds the shot from the endgame search, or from the density before the endgame
+
+        Args:
+            No arguments
+        Returns:
+            tuple(int, int): The coordinate for the Ai's next attack, or None if every
+                cell has been shot
+        """
+
+        self.solved = False
+        if self.ships and self.board_size <= INDEX_MAX_SIZE:
+            co_ord = self._endgame_shot()
+            if co_ord is not None:
+                self.solved = True
+                return co_ord
+        return super().best_shot()
+
+def endgame_ai(ai_state, ai_hitlog, board_size, battleships = None):
+    """Ai that solves the end of the game exactly once few layouts of the fleet are left
+
+    Description:
+        The 'Endgame Ai' hunts with the probability density, and once the player's
+        surviving ships can only be laid out in a few ways it lists every layout of them
+        that agrees with its shots and shoots to sink them in the fewest expected shots.
+
+    Args:
+        ai_state (EndgameTargeting): The state kept for the game, which must be told
+            the result of every shot through its 'record_shot' method
+        ai_hitlog (list[tuple(int, int)]): A log of all the coordinates that the Ai has hit
+            on the player's board, used when the game does not have a state yet
+        board_size (int): The size of the player's board
+        battleships (dict[str:int]): The player's ships and their lengths, used when the game
+            does not have a state yet
+
+    Returns:
+        tuple(int, int): The coordinate for the Ai's next attack
+    Raises:
+        ValueError: The game does not have a state and the player's ships are not given
+    """
+
+    if ai_state is None:
+        if not battleships:
+            raise ValueError('The surviving ships are needed to attack without a state')
+        ai_state = EndgameTargeting(board_size, battleships)
+        for co_ord in ai_hitlog or ():
+            ai_state.record_shot(co_ord, False)
+            # Without a state the results are unknown, so the shots are treated as misses
+    return ai_state.best_shot()
+
+AI_STATES = {'probability': ProbabilityDensity, 'montecarlo': MonteCarloTargeting,
+             'endgame': EndgameTargeting}
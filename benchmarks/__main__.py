@@ -0,0 +1,158 @@
+"""Runs the micro-benchmarks and compares them with the stored baseline
+
+Run from the root of the repository with 'python -m benchmarks'. The results are
+compared case by case with 'benchmarks/baseline.json', and '--update' writes them
+as the new baseline, rounded so that a change in the baseline reads as a diff of
+the cases that changed.
+
+The fastest time of each case is compared rather than its median, which moves with
+whatever else the machine is doing. Both runs also time the same reference case,
+and each case is scaled by how much faster or slower the reference ran, so that a
+baseline stored on another machine, or on a busier one, does not read as a
+regression. A case that still looks slower is timed again, as the machine can slow
+down for a few seconds in the middle of a run, and only keeps its fastest time.
+
+Attributes
+----------
+BASELINE : str
+    The path of the stored baseline
+SLOWDOWN : float
+    The ratio of the fastest time to the baseline, scaled by the reference case,
+    above which a case is reported as a regression
+NOISE_US : float
+    The slowdown per operation, in microseconds, below which a case is not reported,
+    as the cases that take around a microsecond can double in time from one second
+    to the next
+RETRIES : int
+    The number of times a case that looks slower than the baseline is timed again
+MEMORY_GROWTH : float
+    The ratio of the peak memory to the baseline above which a case is reported as
+    a regression
+"""
+
+
+import argparse
+import json
+import math
+import platform
+import sys
+from benchmarks.hot_paths import TIME_BUDGET, run_benchmarks, time_reference
+
+BASELINE = 'benchmarks/baseline.json'
+SLOWDOWN = 1.5
+NOISE_US = 1.0
+RETRIES = 2
+MEMORY_GROWTH = 1.2
+
+def rounded(value, digits = 3):
+    """Rounds a value to a number of significant digits
+
+    Args:
+        value (float): The value
+        digits (int): The number of significant digits kept
+    Returns:
+        float: The rounded value
+    """
+
+    if not value:
+        return 0.0
+    return round(value, digits - 1 - math.floor(math.log10(abs(value))))
+
+def compare(results, baseline, speed = 1.0):
+    """Compares the results of a run with the baseline
+
+    Args:
+        results (dict{str : dict}): The timing and the memory of each case
+        baseline (dict{str : dict}): The timing and the memory of each case in the baseline
+        speed (float): The time of the reference case in this run divided by its time
+            in the baseline, so above 1 on a slower machine
+    Returns:
+        list[str]: The lines of the comparison table
+        list[str]: The names of the cases that have regressed
+    """
+
+    lines = [f'{"case":<50} {"min us":>11} {"baseline":>11} {"ratio":>7} {"peak kb":>10}']
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            lines.append(f'{name:<50} {result["min_us"]:>11.3f} {"new":>11}')
+            continue
+        ratio = result['min_us'] / (speed * before['min_us']) if before['min_us'] else 1.0
+        flags = []
+        if ratio > SLOWDOWN and result['min_us'] > speed * before['min_us'] + NOISE_US:
+            flags.append('SLOWER')
+        if result['peak_kb'] > MEMORY_GROWTH * before['peak_kb'] + 1:
+            flags.append('MORE MEMORY')
+        if flags:
+            regressions.append(name)
+        lines.append(f'{name:<50} {result["min_us"]:>11.3f} {before["min_us"]:>11.3f} '
+                     f'{ratio:>7.2f} {result["peak_kb"]:>10.1f} {" ".join(flags)}')
+    return lines, regressions
+
+def main(argv = None):
+    """Runs the benchmarks from the command line
+
+    Args:
+        argv (list[str]): The command line arguments, taken from sys.argv if not given
+    Returns:
+        int: 1 if '--check' is given and a case has regressed, otherwise 0
+    """
+
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Micro-benchmarks of the game hot paths')
+    parser.add_argument('--filter', default='', help='only run the cases containing this text')
+    parser.add_argument('--budget', type=float, default=TIME_BUDGET,
+                        help='seconds each case is repeated for')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--update', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--check', action='store_true',
+                        help='exit with status 1 if a case has regressed')
+    parser.add_argument('--output', default=None, help='json file for the results')
+    args = parser.parse_args(argv)
+
+    reference_us = time_reference(args.budget)
+    results = run_benchmarks(args.filter, args.budget)
+    reference_us = min(reference_us, time_reference(args.budget))
+    # Timed on both sides of the cases, so a pause of the machine in one of them is skipped
+    try:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        baseline = {'cases': {}}
+    machine = {'python': platform.python_version(), 'platform': platform.platform()}
+    if baseline.get('machine', machine) != machine:
+        print(f'Warning: {args.baseline} was stored on {baseline["machine"]}, the times are '
+              'scaled by the reference case but may still differ')
+    speed = reference_us / baseline['reference_us'] if baseline.get('reference_us') else 1.0
+    lines, regressions = compare(results, baseline['cases'], speed)
+    for _ in range(RETRIES):
+        if not regressions:
+            break
+        for name in regressions:
+            again = run_benchmarks(name, args.budget)[name]
+            results[name]['min_us'] = min(results[name]['min_us'], again['min_us'])
+        lines, regressions = compare(results, baseline['cases'], speed)
+    print('\n'.join(lines))
+    print(f'Reference case: {reference_us:.3f} us, {speed:.2f} times the baseline')
+
+    report = {'machine': machine, 'reference_us': rounded(reference_us),
+              'cases': {name: {key: rounded(value) for key, value in result.items()
+                               if key != 'repeats'}
+                        for name, result in results.items()}}
+    # The number of repeats changes from run to run, so it is left out of the diffs
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4, sort_keys=True)
+    if args.update:
+        report['cases'] = {**baseline['cases'], **report['cases']}
+        # A filtered run only replaces the cases that it ran
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4, sort_keys=True)
+            file.write('\n')
+    if regressions:
+        print(f'{len(regressions)} cases regressed against {args.baseline}')
+    return 1 if args.check and regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,314 @@
+"""Micro-benchmarks of the hot paths of 'components' and 'game_engine'
+
+This module times the functions that every game goes through: building a board,
+reading the fleet, placing it with each placement algorithm, validating a placement,
+attacking and displaying a board. Each of them is timed on boards from 10 to 1000
+cells wide and, where the size of the fleet changes the work, with fleets from the
+standard five ships up to one covering most of the board. Alongside the time, each
+case is run once more under tracemalloc to measure the peak and the retained memory
+it allocates.
+
+Each case is named after the function, the kind of board, its size and the density
+of the fleet, such as 'attack[bitboard-50-half]', so that the results of two runs
+line up when they are compared.
+
+Attributes
+----------
+DENSITIES : dict{str : float}
+    The share of the board covered by the fleet of each density, where None is the
+    standard fleet read from 'battleships.txt'
+TIME_BUDGET : float
+    The number of seconds each case is repeated for
+MIN_REPEATS : int
+    The smallest number of times each case is repeated
+REFERENCE_SIZE : int
+    The number of values sorted by the reference case, which times the machine rather
+    than the game
+"""
+
+
+import contextlib
+import os
+import random
+import statistics
+import time
+import tracemalloc
+from bitboard import BitBoard
+from components import (initialise_board, create_battleships, read_battleships,
+                        place_battleships, valid_board_placement, display_board, new_board)
+from game_engine import attack
+from sparse_board import SparseBoard
+
+DENSITIES = {'fleet': None, 'half': 0.5, 'dense': 0.7}
+TIME_BUDGET = 0.2
+MIN_REPEATS = 3
+SHIP_LENGTHS = (5, 4, 3, 3, 2)
+# The lengths repeated to build a fleet covering a share of the board
+QUERIES = 1000
+# The number of placements checked or cells attacked by each repeat of a case
+REFERENCE_SIZE = 100
+
+def density_fleet(board_size, density):
+    """Builds a fleet that covers a share of the board
+
+    Args:
+        board_size (int): The width and height of the board
+        density (str): The name of the density in DENSITIES
+    Returns:
+        dict{str : int}: The name and the length of each ship
+    """
+
+    share = DENSITIES[density]
+    if share is None:
+        return create_battleships('battleships.txt')
+    ships = {}
+    covered = 0
+    while covered + SHIP_LENGTHS[len(ships) % len(SHIP_LENGTHS)] <= share * board_size ** 2:
+        length = SHIP_LENGTHS[len(ships) % len(SHIP_LENGTHS)]
+        ships[f'Ship_{len(ships)}'] = length
+        covered += length
+    return ships
+
+def scattered_board(kind, board_size, density, seed = 0):
+    """Builds a board whose ships cover random cells, without placing whole ships
+
+    Description:
+        Validating a placement and attacking a cell only look at single cells, so the
+        cells are filled at random, five to a ship, which is far quicker than placing
+        a dense fleet on a large board.
+
+    Args:
+        kind (str): 'list' for a list of lists board or 'bitboard' for a BitBoard
+        board_size (int): The width and height of the board
+        density (str): The name of the density in DENSITIES
+        seed (int): The seed of the random cells
+    Returns:
+        board (list[list] or BitBoard): The board
+        ships (dict{str : int}): The name of each ship and the number of its cells
+    """
+
+    rng = random.Random(seed)
+    share = DENSITIES[density]
+    cells = board_size * board_size
+    count = sum(SHIP_LENGTHS) if share is None else int(share * cells)
+    board = initialise_board(board_size) if kind == 'list' else BitBoard(board_size)
+    ships = {}
+    for position, cell in enumerate(rng.sample(range(cells), count)):
+        name = f'Ship_{position // 5}'
+        ships[name] = ships.get(name, 0) + 1
+        y, x = divmod(cell, board_size)
+        if kind == 'list':
+            board[y][x] = name
+        else:
+            board.ship_masks[name] = board.ship_masks.get(name, 0) | board.cell_bit(x, y)
+            board.occupied |= board.cell_bit(x, y)
+    return board, ships
+
+def random_queries(board_size, seed = 0):
+    """Draws the placements checked by the 'valid_board_placement' cases
+
+    Args:
+        board_size (int): The width and height of the board
+        seed (int): The seed of the random placements
+    Returns:
+        list[tuple(int, list)]: The length of the ship and the placement of each query
+    """
+
+    rng = random.Random(seed)
+    return [(rng.choice(SHIP_LENGTHS),
+             [rng.randrange(board_size), rng.randrange(board_size), rng.choice('hv'),
+              rng.random() < 0.5]) for _ in range(QUERIES)]
+
+def random_shots(board_size, seed = 0):
+    """Draws the cells attacked by the 'attack' cases, each at most once
+
+    Args:
+        board_size (int): The width and height of the board
+        seed (int): The seed of the random cells
+    Returns:
+        list[tuple(int, int)]: The x and y coordinates of each shot
+    """
+
+    rng = random.Random(seed)
+    cells = rng.sample(range(board_size * board_size), min(QUERIES, board_size * board_size))
+    return [(cell % board_size, cell // board_size) for cell in cells]
+
+def make_cases():
+    """Lists every benchmark case
+
+    Args:
+        No arguments
+    Returns:
+        dict{str : tuple(function, function, int)}: For each case name, the function that
+            prepares a repeat, the function that is timed, which takes what the first
+            one returns, and the number of operations in each repeat
+    """
+
+    cases = {}
+
+    for size in (10, 100, 1000):
+        cases[f'initialise_board[list-{size}]'] = (tuple, lambda size=size: initialise_board(size), 1)
+
+    cases['create_battleships[cached]'] = (tuple, lambda: create_battleships('battleships.txt'), 1)
+    cases['create_battleships[parsed]'] = (tuple, lambda: read_battleships('battleships.txt'), 1)
+
+    def placement(kind, size, density, algorithm):
+        def setup():
+            random.seed(0)
+            board = initialise_board(size) if kind == 'list' else new_board(size)
+            return board, density_fleet(size, density), algorithm
+        return setup, place_battleships, 1
+
+    for size in (10, 100, 1000):
+        cases[f'place_battleships[simple-list-{size}-fleet]'] = placement('list', size, 'fleet',
+                                                                           'simple')
+    cases['place_battleships[custom-list-10-fleet]'] = placement('list', 10, 'fleet', 'custom')
+    for size in (10, 50):
+        for density in DENSITIES:
+            cases[f'place_battleships[random-list-{size}-{density}]'] = placement(
+                'list', size, density, 'random')
+            cases[f'place_battleships[random-bitboard-{size}-{density}]'] = placement(
+                'bitboard', size, density, 'random')
+    cases['place_battleships[random-list-100-fleet]'] = placement('list', 100, 'fleet', 'random')
+    cases['place_battleships[random-sparse-1000-fleet]'] = placement('sparse', 1000, 'fleet',
+                                                                     'random')
+
+    def validation(kind, size, density):
+        board = []
+        def setup():
+            if not board:
+                board.append(scattered_board(kind, size, density)[0])
+                board.append(random_queries(size))
+            return tuple(board)
+        def run(board, queries):
+            for length, query in queries:
+                valid_board_placement(board, length, query)
+        return setup, run, QUERIES
+
+    for kind, sizes in (('list', (10, 50, 100, 1000)), ('bitboard', (10, 50))):
+        for size in sizes:
+            for density in ('fleet', 'half'):
+                cases[f'valid_board_placement[{kind}-{size}-{density}]'] = validation(
+                    kind, size, density)
+
+    def attacks(kind, size, density):
+        shots = random_shots(size)
+        def setup():
+            if kind == 'sparse':
+                random.seed(0)
+                ships = density_fleet(size, density)
+                return place_battleships(SparseBoard(size), ships, 'random'), ships, shots
+            board, ships = scattered_board(kind, size, density)
+            return board, ships, shots
+        def run(board, ships, shots):
+            for shot in shots:
+                attack(shot, board, ships)
+        return setup, run, len(shots)
+
+    for kind, sizes in (('list', (10, 50, 100, 1000)), ('bitboard', (10, 50))):
+        for size in sizes:
+            for density in ('fleet', 'half'):
+                cases[f'attack[{kind}-{size}-{density}]'] = attacks(kind, size, density)
+    cases['attack[sparse-1000-fleet]'] = attacks('sparse', 1000, 'fleet')
+
+    def display(size):
+        def run(board):
+            with open(os.devnull, 'w', encoding='utf-8') as devnull:
+                with contextlib.redirect_stdout(devnull):
+                    display_board(board)
+        return lambda: (scattered_board('list', size, 'fleet')[0],), run, 1
+
+    for size in (10, 100, 1000):
+        cases[f'display_board[list-{size}]'] = display(size)
+    return cases
+
+def time_case(setup, run, operations, budget = TIME_BUDGET, min_repeats = MIN_REPEATS):
+    """Times a case, repeating it until the time budget is spent
+
+    Args:
+        setup (function): Prepares a repeat, returning the arguments of 'run'
+        run (function): The code that is timed
+        operations (int): The number of operations in each repeat
+        budget (float): The number of seconds spent repeating the case
+        min_repeats (int): The smallest number of repeats
+    Returns:
+        dict: The number of repeats and the median and the fastest time of each
+            operation, in microseconds
+    """
+
+    times = []
+    spent = 0.0
+    started = time.perf_counter()
+    while len(times) < min_repeats or spent < budget:
+        if len(times) >= min_repeats and time.perf_counter() - started > 10 * budget:
+            break
+            # Stops a case whose set up takes far longer than the code that is timed
+        arguments = setup()
+        start = time.perf_counter()
+        run(*arguments)
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        spent += elapsed
+        if elapsed > budget:
+            break
+            # A case slower than the whole budget is only timed once
+    return {'repeats': len(times),
+            'median_us': 1e6 * statistics.median(times) / operations,
+            'min_us': 1e6 * min(times) / operations}
+
+def measure_memory(setup, run):
+    """Measures the memory allocated by one repeat of a case
+
+    Args:
+        setup (function): Prepares the repeat, returning the arguments of 'run'
+        run (function): The code that is measured
+    Returns:
+        dict: The peak and the retained memory allocated by 'run', in kilobytes
+    """
+
+    arguments = setup()
+    tracemalloc.start()
+    try:
+        result = run(*arguments)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {'peak_kb': peak / 1024, 'retained_kb': current / 1024}
+
+def time_reference(budget = TIME_BUDGET):
+    """Times a fixed piece of pure Python that does not use the game's code
+
+    Description:
+        The cases of two runs on different machines, or on one machine under a
+        different load, are only comparable once both are divided by the speed of
+        the machine at the time, which is what this case measures.
+
+    Args:
+        budget (float): The number of seconds the reference is repeated for
+    Returns:
+        float: The fastest time of one repeat, in microseconds
+    """
+
+    rng = random.Random(0)
+    values = [rng.random() for _ in range(REFERENCE_SIZE)]
+    def run(values):
+        return sorted(str(value) for value in values)
+    return time_case(lambda: (values,), run, 1, budget)['min_us']
+
+def run_benchmarks(pattern = '', budget = TIME_BUDGET):
+    """Times and measures every case whose name contains a pattern
+
+    Args:
+        pattern (str): Only the cases whose name contains it are run
+        budget (float): The number of seconds each case is repeated for
+    Returns:
+        dict{str : dict}: The timing and the memory of each case
+    """
+
+    results = {}
+    for name, (setup, run, operations) in make_cases().items():
+        if pattern in name:
+            results[name] = {**time_case(setup, run, operations, budget),
+                             **measure_memory(setup, run)}
+    return results
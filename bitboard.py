@@ -0,0 +1,285 @@
+"""Integer bitmask representation of a battleships board
+
+This module provides a compact alternative to the list of lists board that is built
+by 'components.initialise_board'. Every cell of the board is a single bit of a Python
+integer, numbered row by row, so that the whole board is described by one mask per
+ship, a mask of all the occupied cells and a mask of all the cells that have been shot.
+Checking whether a ship overlaps another, whether a shot hits and whether a ship has
+sunk are then each a single AND of two integers.
+
+The masks of every position a ship of a given length can take on a board of a given
+size are built once, the first time they are needed, and shared by every game in the
+process through 'segment_index', which keeps the most recently used of them.
+
+Attributes
+----------
+INDEX_MAX_SIZE : int
+    The largest board size whose segments are indexed; a mask grows with the area of
+    the board, so larger boards build their masks on demand instead
+INDEX_CACHE_SIZE : int
+    The number of segment indexes kept, so the memory they hold stays bounded however
+    many board sizes are played in the lifetime of the server
+"""
+
+
+import functools
+
+INDEX_MAX_SIZE = 64
+INDEX_CACHE_SIZE = 16
+# Enough for the distinct ship lengths of the standard fleet on four board sizes at once
+
+class SegmentIndex:
+    """Every position that a ship of one length can take on a board of one size
+
+    Attributes:
+        board_size (int): The width and height of the board
+        ship_length (int): The length of the ship
+        masks (tuple(int)): The mask of the cells covered by each position
+        positions (tuple(tuple(int, int, bool))): The x and y coordinates of the first cell
+            of each position and whether the ship extends downwards from it
+        lookup (dict{tuple(int, int, bool) : int}): The mask of each position
+    """
+
+    __slots__ = ('board_size', 'ship_length', 'masks', 'positions', 'lookup')
+
+    def __init__(self, board_size, ship_length):
+        self.board_size = board_size
+        self.ship_length = ship_length
+        positions = []
+        masks = []
+        if ship_length >= 1:
+            row = (1 << ship_length) - 1
+            column = sum(1 << (count * board_size) for count in range(ship_length))
+            # The masks of a ship in the top left corner, which are shifted into place
+            for vertical, first in ((False, row), (True, column)):
+                for y in range(board_size - (ship_length - 1 if vertical else 0)):
+                    for x in range(board_size - (0 if vertical else ship_length - 1)):
+                        positions.append((x, y, vertical))
+                        masks.append(first << (y * board_size + x))
+        self.positions = tuple(positions)
+        self.masks = tuple(masks)
+        self.lookup = dict(zip(self.positions, self.masks))
+
+@functools.lru_cache(maxsize=INDEX_CACHE_SIZE)
+def segment_index(board_size, ship_length):
+    """Gets the index of every position of a ship, building it the first time it is needed
+
+    Args:
+        board_size (int): The width and height of the board, at most INDEX_MAX_SIZE
+        ship_length (int): The length of the ship
+    Returns:
+        SegmentIndex: The positions and masks of the ship, shared by every game
+    """
+
+    return SegmentIndex(board_size, ship_length)
+
+
+class BitBoard:
+    """A battleships board stored as integer bitmasks
+
+    Attributes:
+        size (int): The width and height of the board
+        ship_masks (dict{str : int}): The cells covered by each ship placed on the board
+        occupied (int): The cells covered by any ship on the board
+        shots (int): The cells that have been shot on the board
+    """
+
+    __slots__ = ('size', 'ship_masks', 'occupied', 'shots')
+
+    def __init__(self, size = 10):
+        self.size = size
+        self.ship_masks = {}
+        self.occupied = 0
+        self.shots = 0
+
+    def __len__(self):
+        return self.size
+
+    def legal_masks(self, length):
+        """Lists the masks of every position where a ship fits without overlapping another
+
+        Args:
+            length (int): The length of the ship
+        Returns:
+            list[tuple(int, tuple(int, int, bool))]: The mask of each legal position along
+                with its x and y coordinates and whether the ship extends downwards
+        """
+
+        occupied = self.occupied
+        if self.size <= INDEX_MAX_SIZE:
+            index = segment_index(self.size, length)
+            return [(mask, position) for mask, position in zip(index.masks, index.positions)
+                    if not occupied & mask]
+        return [(mask, (x, y, vertical)) for vertical in (False, True)
+                for y in range(self.size) for x in range(self.size)
+                for mask in (self.segment_mask(x, y, length, vertical),)
+                if mask and not occupied & mask]
+
+    @classmethod
+    def from_list(cls, board):
+        """Builds a bitboard from a list of lists board
+
+        Args:
+            board (list[list]): The board, where each cell holds a ship name or None
+        Returns:
+            BitBoard: The board with the same ships in the same cells
+        """
+
+        bitboard = cls(len(board))
+        for y, row in enumerate(board):
+            for x, ship in enumerate(row):
+                if ship is not None:
+                    bit = bitboard.cell_bit(x, y)
+                    bitboard.ship_masks[ship] = bitboard.ship_masks.get(ship, 0) | bit
+                    bitboard.occupied |= bit
+        return bitboard
+
+    def cell_bit(self, x, y):
+        """Gets the bit for a single cell of the board
+
+        Args:
+            x (int): The column of the cell
+            y (int): The row of the cell
+        Returns:
+            int: The mask with only the bit for the cell set
+        """
+
+        return 1 << (y * self.size + x)
+
+    def segment_mask(self, x, y, length, vertical):
+        """Gets the mask of the cells covered by a ship
+
+        Args:
+            x (int): The column of the first cell of the ship
+            y (int): The row of the first cell of the ship
+            length (int): The length of the ship
+            vertical (bool): True if the ship extends downwards, False if it extends
+                to the right
+        Returns:
+            int: The mask of the cells covered by the ship, or 0 if the ship goes
+                beyond the border of the board
+        """
+
+        if self.size <= INDEX_MAX_SIZE:
+            return segment_index(self.size, length).lookup.get((x, y, bool(vertical)), 0)
+        if x < 0 or y < 0 or length < 1:
+            return 0
+        if vertical:
+            if y + length > self.size or x >= self.size:
+                return 0
+            step = self.size
+        else:
+            if x + length > self.size or y >= self.size:
+                return 0
+            step = 1
+        mask = 0
+        bit = self.cell_bit(x, y)
+        for _ in range(length):
+            mask |= bit
+            bit <<= step
+        return mask
+
+    def can_place(self, mask):
+        """Checks whether a ship can be placed without overlapping another ship
+
+        Args:
+            mask (int): The cells covered by the ship
+        Returns:
+            bool: True if the mask is on the board and does not overlap another ship
+        """
+
+        return mask != 0 and not self.occupied & mask
+
+    def place(self, name, mask):
+        """Places a ship on the board
+
+        Args:
+            name (str): The name of the ship
+            mask (int): The cells covered by the ship
+        Returns:
+            bool: True if the ship has been placed, False if it overlaps another ship
+                or goes beyond the border of the board
+        """
+
+        if not self.can_place(mask):
+            return False
+        self.ship_masks[name] = self.ship_masks.get(name, 0) | mask
+        self.occupied |= mask
+        return True
+
+    def remove(self, name):
+        """Removes a ship from the board
+
+        Args:
+            name (str): The name of the ship
+        Returns:
+            Returns nothing
+        """
+
+        self.occupied &= ~self.ship_masks.pop(name, 0)
+
+    def fire(self, x, y):
+        """Shoots a single cell of the board
+
+        Args:
+            x (int): The column of the shot
+            y (int): The row of the shot
+        Returns:
+            tuple(bool, str): Whether the shot hit a ship that had not already been hit
+                in that cell, and the name of the ship that was hit (None on a miss)
+        """
+
+        bit = self.cell_bit(x, y)
+        if self.shots & bit:
+            # Shooting a cell twice never hits, as with the list of lists board
+            return False, None
+        self.shots |= bit
+        if not self.occupied & bit:
+            return False, None
+        for name, mask in self.ship_masks.items():
+            if mask & bit:
+                return True, name
+        return False, None
+
+    def is_sunk(self, name):
+        """Checks whether every cell of a ship has been shot
+
+        Args:
+            name (str): The name of the ship
+        Returns:
+            bool: True if the ship has sunk
+        """
+
+        return not self.ship_masks.get(name, 0) & ~self.shots
+
+    def all_sunk(self):
+        """Checks whether every ship on the board has sunk
+
+        Args:
+            No arguments
+        Returns:
+            bool: True if every cell covered by a ship has been shot
+        """
+
+        return not self.occupied & ~self.shots
+
+    def to_list(self):
+        """Converts the board to the list of lists form used by the rest of the game
+
+        Args:
+            No arguments
+        Returns:
+            board (list[list]): The board where every cell that holds a ship which has
+                not been hit contains the name of the ship, and every other cell is None
+        """
+
+        board = [[None for x in range(self.size)] for y in range(self.size)]
+        for name, mask in self.ship_masks.items():
+            remaining = mask & ~self.shots
+            while remaining:
+                low = remaining & -remaining
+                # Isolates the lowest set bit of the mask
+                y, x = divmod(low.bit_length() - 1, self.size)
+                board[y][x] = name
+                remaining ^= low
+        return board
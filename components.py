@@ -4,11 +4,22 @@ This module is designed to be the main backend of the battleships game, providin
 fundamental mechanics of the game, such as developing the board, creating the 
 battleships from a text file and placing the created ships on the boards using a
 variety of algorithms.
+
+Attributes
+----------
+PLACEMENT_ATTEMPTS : int
+    The number of times the random placement tries the whole fleet again before it
+    reports that the fleet cannot be placed
 """
 
 
 import random
 import json
+from bitboard import BitBoard, INDEX_MAX_SIZE, segment_index
+from config_cache import cache
+from sparse_board import SparseBoard
+
+PLACEMENT_ATTEMPTS = 100
 
 def initialise_board(size):
     """Initialises the board for the player
@@ -28,13 +39,29 @@ def initialise_board(size):
 def create_battleships(filename = "battleships.txt"):
     """Creates the battleships for the player
     
+    Description:
+        The file is only read and parsed again when it has changed on disk, so each game
+        is given a copy of the ships that are already held in the configuration cache.
+
     Args:
-        No arguments
+        filename (str): The text file that the battleships are read from
     Returns:
         battleships (dict): Returns the battleships from the text file, 
             where the names of the ships as the key and the size of the ships as the values.
     """
 
+    return dict(cache.get(filename, read_battleships))
+
+def read_battleships(filename):
+    """Reads and parses the battleships from a text file
+
+    Args:
+        filename (str): The text file that the battleships are read from
+    Returns:
+        battleships (dict): The names of the ships as the keys and the size of the ships
+            as the values
+    """
+
     with open(filename, 'r', encoding='utf-8') as file:
     # Reads all the lines in the "battleships.txt" file
         battleships = {}
@@ -47,15 +74,46 @@ def create_battleships(filename = "battleships.txt"):
             # Appending the 'battleships' dictionary by adding the key and value of each line
     return battleships
 
+def load_placement(filename = 'placement.json'):
+    """Loads the player's placement of their ships
+
+    Description:
+        As with the battleships, the file is only parsed again when it has changed on disk.
+
+    Args:
+        filename (str): The json file that the placement is read from
+    Returns:
+        placement (dict{str : list}): The x coordinate, y coordinate and orientation of each
+            of the player's ships
+    """
+
+    return {ship: list(ship_pos) for ship, ship_pos in cache.get(filename, read_json).items()}
+
+def read_json(filename):
+    """Reads and parses a json file
+
+    Args:
+        filename (str): The json file
+    Returns:
+        The data held in the json file
+    """
+
+    with open(filename, encoding = "utf-8") as file:
+        return json.load(file)
+
 def place_battleships(board = None, ships = None, algorithm = ''):
     """Placing ships on to the board
 
     Args:
-        board (list[list]): The player's board used for the game
+        board (list[list], BitBoard or SparseBoard): The player's board used for the game
         battleships (dict[str:int]): The player's ships that are going to be placed on the board
         algorithm (str): The style of ship placement that is used to increase 
             the complexity of the game
     Returns:
+        bitboard_placement(): A function that returns the player's bitboard with the player's
+            ships placed using the chosen algorithm
+        sparse_placement(): A function that returns the player's sparse board with the player's
+            ships placed using the chosen algorithm
         simple_placement(): A function that returns the player's board with the player's ships
             placed along the first few rows on the board
         random_placement(): A function that returns the player's board with the player's ships
@@ -65,6 +123,10 @@ def place_battleships(board = None, ships = None, algorithm = ''):
             file
     """
 
+    if isinstance(board, BitBoard):
+        return bitboard_placement(board, ships, algorithm)
+    if isinstance(board, SparseBoard):
+        return sparse_placement(board, ships, algorithm)
     if algorithm == 'simple':
         return simple_placement(board, ships)
     if algorithm == 'random':
@@ -95,62 +157,110 @@ def simple_placement(board, battleships):
         # Increments after each ship
     return board
 
+def legal_placements(board, ship_size):
+    """Lists every position where a ship fits on the board without overlapping another ship
+
+    Description:
+        For a list of lists board, the number of free cells to the right of and below each
+        cell is counted from the far edge of the board back towards the start, so that each
+        cell only needs to be checked once whatever the length of the ship.
+
+    Args:
+        board (list[list] or BitBoard): The player's board
+        ship_size (int): The length of the ship that is being placed
+    Returns:
+        placements (list[tuple(int, int, bool)]): The x and y coordinates of the first cell of
+            every legal position, and whether the ship extends downwards (True) or to the
+            right (False) from it
+    """
+
+    if isinstance(board, BitBoard):
+        return [position for mask, position in board.legal_masks(ship_size)]
+
+    board_size = len(board)
+    if ship_size < 1:
+        return []
+    free_right = [[0] * (board_size + 1) for y in range(board_size)]
+    free_below = [[0] * board_size for y in range(board_size + 1)]
+    for y in range(board_size - 1, -1, -1):
+        for x in range(board_size - 1, -1, -1):
+            if board[y][x] is None:
+                free_right[y][x] = free_right[y][x + 1] + 1
+                free_below[y][x] = free_below[y + 1][x] + 1
+            # Counts the run of free cells starting at each cell
+
+    placements = [(x, y, False) for y in range(board_size) for x in range(board_size)
+                  if free_right[y][x] >= ship_size]
+    placements += [(x, y, True) for y in range(board_size) for x in range(board_size)
+                   if free_below[y][x] >= ship_size]
+    return placements
+
 def random_placement(board, battleships):
     """Places the ships randomly on the board in random orientations and random paths
 
+    Description:
+        Each ship is placed in turn by listing every legal position for it on the board and
+        choosing one of them uniformly at random, so no random draw is ever rejected. If the
+        earlier ships leave no room for a later ship, the fleet is cleared and placed again,
+        up to PLACEMENT_ATTEMPTS times.
+
     Args:
-        board (list[list]): The player's board used for the game
+        board (list[list] or BitBoard): The player's board used for the game
         battleships (dict[str:int]): The player's ships that are going to be placed on the board
     Returns:
-        board (list[list]): The player's board with the player's ships placed on random
+        board (list[list] or BitBoard): The player's board with the player's ships placed on random
             coordinates with random orientations across the board
+    Raises:
+        ValueError: The fleet cannot be placed on the board
     """
 
-    for ships, value in battleships.items():
-        valid_placement = False
-        # Used to determine whether if the placement of the ship is valid or not
-        while valid_placement is False:
-        # Repeats if the placement of the ship is not valid
-            x = random.randrange(0,10)
-            y = random.randrange(0,10)
-            # Randomly generates the x and y coordinates for the ship
-            vert_orient = random.getrandbits(1)
-            # Randomly generates the orientation for the ship (Vertical or Horizontal)
-            placement = random.getrandbits(1)
-            # Randomly determines the placement method;
-            # Vertical: Up or Down
-            # Horizontal: Left or Right
-
-            ship_placement = x, y, vert_orient, placement
-            value = int(value)
-            if vert_orient:
-            # Checks if the ship uses vertical orientation
+    board_size = len(board)
+    lengths = [int(value) for value in battleships.values()]
+    if sum(lengths) > board_size * board_size or max(lengths, default=0) > board_size:
+    # Checks whether the fleet could ever fit on the board
+        raise ValueError(f'The fleet does not fit on a {board_size} by {board_size} board')
 
-                # If statement to check whether the placement of the ship is within
-                # the periphery of the board and the placement is valid
-                if (y + value < 10 and valid_board_placement(board, value, ship_placement)
-                    and placement):
-                    valid_placement = True
-                    for count in range(value):
-                        board[y + count][x] = ships
-                if (y - value > -1 and valid_board_placement(board, value, ship_placement)
-                    and not placement):
-                    valid_placement = True
-                    for count in range(value):
-                        board[y - count][x] = ships
+    shadow = None
+    if isinstance(board, BitBoard):
+        shadow = board
+    elif board_size <= INDEX_MAX_SIZE:
+        shadow = BitBoard.from_list(board)
+        # The occupied cells are kept as a bitmask, so that each legal position of a ship
+        # is found with a single AND against the cached segment index
+
+    for _ in range(PLACEMENT_ATTEMPTS):
+        if shadow is not None:
+            ship_masks, occupied = dict(shadow.ship_masks), shadow.occupied
+        placed = []
+        for ships, value in battleships.items():
+            value = int(value)
+            if shadow is not None:
+                placements = shadow.legal_masks(value)
             else:
-                # Selection statement when the ship uses horizontal instead of vertical orientation
-                if (x + value < 10 and valid_board_placement(board, value, ship_placement)
-                    and placement):
-                    valid_placement = True
-                    for count in range(value):
-                        board[y][x + count] = ships
-                if (x - value > -1 and valid_board_placement(board, value, ship_placement)
-                    and not placement):
-                    valid_placement = True
-                    for count in range(value):
-                        board[y][x - count] = ships
-    return board
+                placements = legal_placements(board, value)
+            if not placements:
+                break
+                # The earlier ships have left no room for this ship
+            if shadow is not None:
+                mask, (x, y, vertical) = random.choice(placements)
+                shadow.place(ships, mask)
+            else:
+                x, y, vertical = random.choice(placements)
+            if shadow is not board:
+                for count in range(value):
+                    board[y + count * vertical][x + count * (not vertical)] = ships
+            placed.append((x, y, value, vertical))
+        else:
+            return board
+
+        if shadow is not None:
+            shadow.ship_masks, shadow.occupied = ship_masks, occupied
+        if shadow is not board:
+            for x, y, value, vertical in placed:
+            # Clears the ships that were placed before trying the whole fleet again
+                for count in range(value):
+                    board[y + count * vertical][x + count * (not vertical)] = None
+    raise ValueError(f'No placement of the fleet was found after {PLACEMENT_ATTEMPTS} attempts')
 
 def custom_placement(board, battleships):
     """Places the ships on the board based on the values given by the json file
@@ -163,53 +273,155 @@ def custom_placement(board, battleships):
             and orientation given by the 'placement.json' file
     """
 
-    with open('placement.json', encoding = "utf-8") as file:
-        # Reads the 'placement.json' file
-        config_file = json.load(file)
-        # Loads the json data
-        for ship_type, ship_pos in config_file.items():
-        # Splits the json between the type of ship and the position of the ship
-            valid_placement = False
-            while valid_placement is False:
-                for ship, value in battleships.items():
-                    x, y, orient = ship_pos
-                    # Gets the x, y and orient values from the json file
-                    x = int(x)
-                    y = int(y)
-                    placement = random.getrandbits(1)
-                    # Randomly determines the placement method;
-                    # Vertical: Up or Down
-                    # Horizontal: Left or Right
-
-                    # Checks the orientation, placement, whether the ships match
-                    # and if the ship is within the periphery of the board with
-                    # valid placement
-                    if (orient == 'v' and (y - int(value) < 0 or placement) and
-                        ship_type == ship and
-                        valid_board_placement(board, value, [x, y, orient, True])):
-                        valid_placement = True
-                        for count in range(int(value)):
-                            board[y + count][x] = ship
-                    elif (orient == 'v' and (y + int(value) > 10 or not placement) and
-                          ship_type == ship and
-                          valid_board_placement(board, value, [x, y, orient, False])):
-                        valid_placement = True
-                        for count in range(int(value)):
-                            board[y - count][x] = ship
-                    elif (orient == 'h' and (x - int(value) < 0 or placement) and
-                          ship_type == ship and
-                          valid_board_placement(board, value, [x, y, orient, True])):
-                        valid_placement = True
-                        for count in range(int(value)):
-                            board[y][x + count] = ship
-                    elif (orient == 'h' and (x + int(value) > 10 or not placement) and
-                          ship_type == ship and
-                          valid_board_placement(board, value, [x, y, orient, False])):
-                        valid_placement = True
-                        for count in range(int(value)):
-                            board[y][x - count] = ship
+    config_file = load_placement('placement.json')
+    # Loads the json data from the 'placement.json' file
+    for ship_type, ship_pos in config_file.items():
+    # Splits the json between the type of ship and the position of the ship
+        valid_placement = False
+        while valid_placement is False:
+            for ship, value in battleships.items():
+                x, y, orient = ship_pos
+                # Gets the x, y and orient values from the json file
+                x = int(x)
+                y = int(y)
+                placement = random.getrandbits(1)
+                # Randomly determines the placement method;
+                # Vertical: Up or Down
+                # Horizontal: Left or Right
+
+                # Checks the orientation, placement, whether the ships match
+                # and if the ship is within the periphery of the board with
+                # valid placement
+                if (orient == 'v' and (y - int(value) < 0 or placement) and
+                    ship_type == ship and
+                    valid_board_placement(board, value, [x, y, orient, True])):
+                    valid_placement = True
+                    for count in range(int(value)):
+                        board[y + count][x] = ship
+                elif (orient == 'v' and (y + int(value) > len(board) or not placement) and
+                      ship_type == ship and
+                      valid_board_placement(board, value, [x, y, orient, False])):
+                    valid_placement = True
+                    for count in range(int(value)):
+                        board[y - count][x] = ship
+                elif (orient == 'h' and (x - int(value) < 0 or placement) and
+                      ship_type == ship and
+                      valid_board_placement(board, value, [x, y, orient, True])):
+                    valid_placement = True
+                    for count in range(int(value)):
+                        board[y][x + count] = ship
+                elif (orient == 'h' and (x + int(value) > len(board) or not placement) and
+                      ship_type == ship and
+                      valid_board_placement(board, value, [x, y, orient, False])):
+                    valid_placement = True
+                    for count in range(int(value)):
+                        board[y][x - count] = ship
     return board
 
+def bitboard_placement(board, battleships, algorithm):
+    """Places the ships on a bitboard using the chosen placement algorithm
+
+    Description:
+        "simple": Places the ships horizontally on the first few rows
+        "random": Places the ships in random coordinates with random orientations
+        "custom": Places the ships in the coordinates and orientations given by the
+            'placement.json' file, extending down or to the right of each coordinate
+
+    Args:
+        board (BitBoard): The player's bitboard used for the game
+        battleships (dict[str:int]): The player's ships that are going to be placed on the board
+        algorithm (str): The style of ship placement
+    Returns:
+        board (BitBoard): The player's bitboard with the player's ships placed on it
+    Raises:
+        ValueError: A ship from the 'placement.json' file overlaps another ship or goes
+            beyond the border of the board
+    """
+
+    if algorithm == 'simple':
+        for y, (ships, value) in enumerate(battleships.items()):
+            board.place(ships, board.segment_mask(0, y, int(value), False))
+    elif algorithm == 'random':
+        random_placement(board, battleships)
+    elif algorithm == 'custom':
+        config_file = load_placement('placement.json')
+        for ships, value in battleships.items():
+            if ships not in config_file:
+                continue
+            x, y, orient = config_file[ships]
+            mask = board.segment_mask(int(x), int(y), int(value), orient == 'v')
+            if not board.place(ships, mask):
+                raise ValueError(f'{ships} cannot be placed at ({x}, {y})')
+    return board
+
+def sparse_placement(board, battleships, algorithm):
+    """Places the ships on a sparse board using the chosen placement algorithm
+
+    Description:
+        "simple": Places the ships horizontally on the first few rows
+        "random": Places each ship at random positions until one is free
+        "custom": Places the ships in the coordinates and orientations given by the
+            'placement.json' file, extending down or to the right of each coordinate
+
+    Args:
+        board (SparseBoard): The player's sparse board used for the game
+        battleships (dict[str:int]): The player's ships that are going to be placed on the board
+        algorithm (str): The style of ship placement
+    Returns:
+        board (SparseBoard): The player's sparse board with the player's ships placed on it
+    Raises:
+        ValueError: A ship cannot be placed without overlapping another ship or going
+            beyond the border of the board
+    """
+
+    if algorithm == 'simple':
+        for y, (ships, value) in enumerate(battleships.items()):
+            board.place(ships, 0, y, int(value), False)
+    elif algorithm == 'random':
+        for ships, value in battleships.items():
+            if not board.place_randomly(ships, int(value), PLACEMENT_ATTEMPTS * len(board)):
+                raise ValueError(f'{ships} cannot be placed on the board')
+    elif algorithm == 'custom':
+        config_file = load_placement('placement.json')
+        for ships, value in battleships.items():
+            if ships not in config_file:
+                continue
+            x, y, orient = config_file[ships]
+            if not board.place(ships, int(x), int(y), int(value), orient == 'v'):
+                raise ValueError(f'{ships} cannot be placed at ({x}, {y})')
+    return board
+
+def new_board(board_size):
+    """Creates an empty board in the most compact form for its size
+
+    Args:
+        board_size (int): The width and height of the board
+    Returns:
+        BitBoard or SparseBoard: A bitboard if its positions fit in the segment index,
+            otherwise a sparse board whose memory does not grow with its area
+    """
+
+    if board_size <= INDEX_MAX_SIZE:
+        return BitBoard(board_size)
+    return SparseBoard(board_size)
+
+def seeded_fleet(seed, battleships, board_size):
+    """Places the same fleet every time for the same seed
+
+    Args:
+        seed (int): The seed that decides the placement of the fleet
+        battleships (dict[str:int]): The ships that make up the fleet
+        board_size (int): The size of the board
+    Returns:
+        board (BitBoard or SparseBoard): The board with the fleet randomly placed on it
+        ships (dict[str:int]): A fresh copy of the ships and their hitpoints
+    """
+
+    random.seed(seed)
+    ships = dict(battleships)
+    board = place_battleships(new_board(board_size), ships, 'random')
+    return board, ships
+
 def valid_board_placement(board, ship_size, ship_placement):
     """Checks and validates whether the placement of the ship does not collide with any other ship 
         or the border of the board
@@ -228,31 +440,48 @@ def valid_board_placement(board, ship_size, ship_placement):
 
     x, y, orient, placement = ship_placement
     # Extracts the coordinates, orientation and the placement method from the array
+    x, y, ship_size = int(x), int(y), int(ship_size)
+    vertical = orient in {'v', 1, True}
+    if not placement:
+    # A ship placed upwards or to the left starts at the far end from the coordinate
+        if vertical:
+            y = y - ship_size + 1
+        else:
+            x = x - ship_size + 1
+
+    board_size = len(board)
+    if board_size <= INDEX_MAX_SIZE:
+        mask = segment_index(board_size, ship_size).lookup.get((x, y, vertical), 0)
+        # Every position that is within the border of the board is in the cached index
+        if not mask:
+            return False
+        if isinstance(board, BitBoard):
+            return not board.occupied & mask
+    elif isinstance(board, BitBoard):
+        return board.can_place(board.segment_mask(x, y, ship_size, vertical))
+    elif x < 0 or y < 0 or (y if vertical else x) + ship_size > board_size:
+        return False
+
     for count in range(ship_size):
-    # Checks if the ship collides with another ship or the placement goes beyond the border
-        if y + ship_size < 10 and (orient in {'v', 1}) and placement:
-            if board[y + count][x] is not None:
-                return False
-        elif y - ship_size > -1 and (orient in {'v', 1}) and not placement:
-            if board[y - count][x] is not None:
-                return False
-        elif x + ship_size < 10 and (orient in {'h', 0}) and placement:
-            if board[y][x + count] is not None:
-                return False
-        elif x - ship_size > -1 and (orient in {'h', 0}) and not placement:
-            if board[y - count][x - count] is not None:
-                return False
+    # Checks if the ship collides with another ship
+        if board[y + count * vertical][x + count * (not vertical)] is not None:
+            return False
     return True
 
 def display_board(board):
     """Displays the board on the terminal
     
     Args:
-        board (list[list]): The player's board that contains the player's ships
+        board (list[list], BitBoard or SparseBoard): The player's board that contains the
+            player's ships
     Returns:
         Returns nothing
     """
 
+    if isinstance(board, (BitBoard, SparseBoard)):
+        board = board.to_list()
+        # Expands the bitboard into the list of lists form that is displayed
+
     for y in range(len(board)):
         # Reads each row of the board
         for x in range(len(board[y])):
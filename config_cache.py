@@ -0,0 +1,74 @@
+"""Cache of the configuration files read by the game
+
+This module keeps the parsed contents of the configuration files, such as
+'battleships.txt' and 'placement.json', in memory so that they are only read
+and parsed from disk once. Each time a file is requested its modification time
+and size are checked, and the file is only parsed again when either of them has
+changed, so edits to the files are still picked up without restarting the game.
+
+Attributes
+----------
+cache : ConfigCache
+    The cache shared by every game in the process
+"""
+
+
+import os
+import threading
+
+class ConfigCache:
+    """Parsed configuration files, reloaded when their modification time or size changes
+
+    Attributes:
+        loads (int): The number of times a file has been read and parsed from disk
+    """
+
+    def __init__(self):
+        self.loads = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, filename, parser):
+        """Gets the parsed contents of a file, parsing it again only if it has changed
+
+        Args:
+            filename (str): The path of the file
+            parser (function): The function that reads and parses the file from its path
+        Returns:
+            The parsed contents of the file, which are shared and must not be changed
+        """
+
+        status = os.stat(filename)
+        key = (os.path.abspath(filename), parser)
+        signature = (status.st_mtime_ns, status.st_size)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != signature:
+            # Checks again in case another thread has parsed the file in the meantime
+                entry = (signature, parser(filename))
+                self._entries[key] = entry
+                self.loads += 1
+            return entry[1]
+
+    def invalidate(self, filename = None):
+        """Forgets the parsed contents of a file, or of every file
+
+        Args:
+            filename (str): The path of the file, or None to forget every file
+        Returns:
+            Returns nothing
+        """
+
+        with self._lock:
+            if filename is None:
+                self._entries.clear()
+                return
+            path = os.path.abspath(filename)
+            for key in [key for key in self._entries if key[0] == path]:
+                del self._entries[key]
+
+cache = ConfigCache()
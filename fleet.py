@@ -0,0 +1,106 @@
+"""Compact ship and fleet objects with constant-time sinking checks
+
+This module provides the fleet of a player as a mapping from the name of each ship
+to its remaining hitpoints, so it is used in the same way as the dictionary returned
+by 'components.create_battleships'. Each ship is a small slotted object, and the
+fleet keeps a running count of the ships still afloat and the name of the last ship
+that sank, so checking whether a shot sank a ship or whether the whole fleet has
+sunk takes the same time however many ships the fleet holds.
+"""
+
+
+from collections.abc import MutableMapping
+
+class Ship:
+    """A single ship of a fleet
+
+    Attributes:
+        name (str): The name of the ship
+        length (int): The number of cells the ship covers
+        hitpoints (int): The number of cells of the ship that have not been hit
+    """
+
+    __slots__ = ('name', 'length', 'hitpoints')
+
+    def __init__(self, name, length, hitpoints = None):
+        self.name = name
+        self.length = length
+        self.hitpoints = length if hitpoints is None else hitpoints
+
+    @property
+    def sunk(self):
+        """bool: Whether every cell of the ship has been hit"""
+
+        return self.hitpoints <= 0
+
+class Fleet(MutableMapping):
+    """The ships of a player, mapping the name of each ship to its remaining hitpoints
+
+    Attributes:
+        afloat (int): The number of ships that have not sunk
+        last_sunk (str): The name of the ship sunk by the last attack on the fleet, or
+            None if the last attack did not sink a ship
+    """
+
+    __slots__ = ('_ships', 'afloat', 'last_sunk')
+
+    def __init__(self, battleships = None):
+        self._ships = {}
+        self.afloat = 0
+        self.last_sunk = None
+        for name, hitpoints in (battleships or {}).items():
+            self[name] = hitpoints
+
+    def __getitem__(self, name):
+        return self._ships[name].hitpoints
+
+    def __setitem__(self, name, hitpoints):
+        hitpoints = int(hitpoints)
+        ship = self._ships.get(name)
+        if ship is None:
+            self._ships[name] = Ship(name, hitpoints)
+            self.afloat += hitpoints > 0
+            return
+        was_afloat = not ship.sunk
+        ship.hitpoints = hitpoints
+        if was_afloat and ship.sunk:
+            self.afloat -= 1
+            self.last_sunk = name
+            # The hit that takes a ship to 0 hitpoints is the one that sinks it
+        elif not was_afloat and not ship.sunk:
+            self.afloat += 1
+
+    def __delitem__(self, name):
+        ship = self._ships.pop(name)
+        self.afloat -= not ship.sunk
+
+    def __iter__(self):
+        return iter(self._ships)
+
+    def __len__(self):
+        return len(self._ships)
+
+    def __repr__(self):
+        return f'Fleet({dict(self)!r})'
+
+    def ship(self, name):
+        """Gets a ship of the fleet
+
+        Args:
+            name (str): The name of the ship
+        Returns:
+            Ship: The ship, with its length and remaining hitpoints
+        """
+
+        return self._ships[name]
+
+    def all_sunk(self):
+        """Checks whether every ship of the fleet has sunk
+
+        Args:
+            No arguments
+        Returns:
+            bool: True if no ship is still afloat
+        """
+
+        return self.afloat == 0
@@ -9,6 +9,9 @@ the functionality of the game.
 
 
 from ast import literal_eval
+from bitboard import BitBoard
+from fleet import Fleet
+from sparse_board import SparseBoard
 from components import create_battleships, initialise_board, place_battleships, display_board
 
 def attack(coordinates, board, battleships):
@@ -16,17 +19,28 @@ def attack(coordinates, board, battleships):
     
     Args:
         coordinates (tuple(int, int)): The coordinates of the attack on the enemy's board
-        board (list[list]): The enemy's board that contains the enemy's ships
-        battleships (dict[str : int]): The enemy's ships and their remaining slots
+        board (list[list], BitBoard or SparseBoard): The enemy's board that contains the
+            enemy's ships
+        battleships (dict[str : int] or Fleet): The enemy's ships and their remaining slots;
+            a fleet also records in 'last_sunk' the ship that the attack sank, if any
     Returns:
         bool: True if the coordinates hits an enemy ship. False if the coordinates does not hit 
             an enemy ship and instead misses the shot
     """
 
+    if isinstance(battleships, Fleet):
+        battleships.last_sunk = None
+        # Only the attack that takes a ship's last hitpoint sets it again
     x, y = coordinates
     # Get the x and y coordinates from the tuple
     x = int(x)
     y = int(y)
+    if isinstance(board, (BitBoard, SparseBoard)):
+        hit, ship = board.fire(x, y)
+        # A single lookup of the cell decides whether the shot hits
+        if hit:
+            battleships[ship] = battleships.get(ship) - 1
+        return hit
     if board[y][x] is not None:
         # Checks if the coordinate on the board is not empty
         # Returns true if a ship has been hit
@@ -64,7 +78,7 @@ def simple_game_loop():
     print('Welcome to battleships')
     board = initialise_board(10)
     # Initialises the board
-    battleships = create_battleships('battleships.txt')
+    battleships = Fleet(create_battleships('battleships.txt'))
     # Creates the battleships
     board = place_battleships(board, battleships, 'custom')
     # Places the battleships onto the board via custom placement
@@ -86,7 +100,7 @@ def simple_game_loop():
         else:
             print('Miss')
 
-        if all(ships == 0 for ships in battleships.values()):
+        if battleships.all_sunk():
         # Checks if all the positions of the ships have been shot down
             game_finished = True
 
@@ -0,0 +1,176 @@
+"""Fan-out of game events to the clients subscribed to a game
+
+This module lets the web interface push the events of a game, such as each shot,
+each ship that sinks and the end of the game, to any number of subscribed clients
+as a stream of Server-Sent Events, instead of the clients polling for them. Each
+game has a single channel holding a bounded buffer of its recent events. An event
+is serialised once, when it is published, and every subscriber then reads the same
+encoded bytes from the buffer using its own position in the stream, so adding more
+subscribers does not add any more serialisation.
+
+Attributes
+----------
+BUFFER_SIZE : int
+    The default number of recent events that each channel keeps
+KEEP_ALIVE : float
+    The number of seconds a subscriber waits for an event before a keep-alive is sent
+"""
+
+
+import itertools
+import json
+import threading
+from collections import deque
+
+BUFFER_SIZE = 256
+KEEP_ALIVE = 15.0
+
+class EventChannel:
+    """A bounded buffer of the encoded events of one game, shared by all of its subscribers
+
+    Attributes:
+        closed (bool): Whether the game has finished or been removed, so no more events
+            will be published
+    """
+
+    __slots__ = ('closed', '_events', '_next_id', '_condition', '_listeners')
+
+    def __init__(self, size = BUFFER_SIZE):
+        self.closed = False
+        self._events = deque(maxlen=size)
+        self._next_id = 1
+        self._condition = threading.Condition(threading.Lock())
+        self._listeners = []
+
+    def publish(self, event_type, data):
+        """Serialises an event once and wakes every subscriber waiting for it
+
+        Args:
+            event_type (str): The type of the event, such as 'shot', 'sink' or 'finished'
+            data (dict): The json data of the event
+        Returns:
+            int: The id of the event in the stream
+        """
+
+        with self._condition:
+            event_id = self._next_id
+            self._next_id += 1
+            encoded = (f'id: {event_id}\nevent: {event_type}\n'
+                       f'data: {json.dumps(data)}\n\n').encode('utf-8')
+            self._events.append((event_id, encoded))
+            self._condition.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+        return event_id
+
+    def close(self):
+        """Marks the channel as closed and wakes every subscriber so it can finish
+
+        Args:
+            No arguments
+        Returns:
+            Returns nothing
+        """
+
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+
+    def add_listener(self, listener):
+        """Registers a function that is called whenever an event is published
+
+        Description:
+            Lets subscribers that do not block a thread, such as asyncio tasks, be woken
+            up. The function is called from the thread that published the event, so it
+            must only hand the wake-up over to its own thread.
+
+        Args:
+            listener (function): The function called with no arguments
+        Returns:
+            Returns nothing
+        """
+
+        with self._condition:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Unregisters a function added by 'add_listener'
+
+        Args:
+            listener (function): The function to unregister
+        Returns:
+            Returns nothing
+        """
+
+        with self._condition:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def events_after(self, last_id):
+        """Gets the encoded events published after a position in the stream
+
+        Description:
+            A subscriber that has fallen further behind than the buffer carries on from the
+            oldest event that is still kept.
+
+        Args:
+            last_id (int): The id of the last event the subscriber has received
+        Returns:
+            list[bytes]: The encoded events, shared with every other subscriber
+            int: The id of the last event returned, or last_id if there are none
+        """
+
+        with self._condition:
+            return self._after(last_id)
+
+    def wait(self, last_id, timeout = KEEP_ALIVE):
+        """Waits until there are events after a position in the stream, or the channel closes
+
+        Args:
+            last_id (int): The id of the last event the subscriber has received
+            timeout (float): The longest number of seconds to wait
+        Returns:
+            list[bytes]: The encoded events, which is empty if the wait timed out
+            int: The id of the last event returned, or last_id if there are none
+        """
+
+        with self._condition:
+            self._condition.wait_for(lambda: self.closed or self._next_id - 1 > last_id,
+                                     timeout)
+            return self._after(last_id)
+
+    def _after(self, last_id):
+        if not self._events or self._next_id - 1 <= last_id:
+            return [], last_id
+        first_id = self._events[0][0]
+        start = max(0, last_id + 1 - first_id)
+        # The events are numbered consecutively, so the position in the buffer is known
+        chunks = [encoded for _, encoded in itertools.islice(self._events, start, None)]
+        return chunks, self._next_id - 1
+
+def stream(channel, last_id = 0, timeout = KEEP_ALIVE):
+    """Generates the Server-Sent Events stream of a channel for one subscriber
+
+    Args:
+        channel (EventChannel): The channel of the game
+        last_id (int): The id of the last event the subscriber has already received
+        timeout (float): The number of seconds without events before a keep-alive is sent
+    Returns:
+        generator(bytes): The encoded events, ending once the channel has closed and
+            every event has been sent
+    """
+
+    yield b'retry: 3000\n\n'
+    while True:
+        chunks, last_id = channel.wait(last_id, timeout)
+        if chunks:
+            yield b''.join(chunks)
+        elif channel.closed:
+            return
+        else:
+            yield b': keep-alive\n\n'
+            # A comment line keeps proxies from closing an idle connection
@@ -0,0 +1,264 @@
+"""Crash-safe journal of the games played on the web interface
+
+This module keeps the games in progress safe across a restart of the server. Every
+change to a game, such as its creation with the placement of both fleets, each turn
+played and the end of the game, is appended to a journal file as one line of json.
+The lines are only collected in memory by the request threads; a background thread
+writes them out and fsyncs the file on a set interval, so journaling adds almost
+nothing to the latency of '/attack', and at most one interval of turns can be lost.
+
+Every so often the whole of every live game is written to a compact snapshot (json
+compressed with zlib) and the journal is started again, so the journal never grows
+without bound. On start-up the latest snapshot is loaded and only the tail of the
+journal written after it is replayed.
+
+The games are found through the signed session cookie of each player, so the key that
+signs the cookies must outlive the server as well. When no key is configured, one is
+generated the first time and kept in the journal's directory.
+
+Attributes
+----------
+FSYNC_INTERVAL : float
+    The default number of seconds between each write and fsync of the journal
+SNAPSHOT_INTERVAL : float
+    The default number of seconds between each snapshot of the live games
+SECRET_KEY_FILE : str
+    The file in the journal's directory that holds the key signing the session cookies
+"""
+
+
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+FSYNC_INTERVAL = 1.0
+SNAPSHOT_INTERVAL = 5 * 60
+SECRET_KEY_FILE = 'secret.key'
+
+def load_secret_key(directory):
+    """Reads the key that signs the session cookies, generating it the first time
+
+    Description:
+        The key is created with O_EXCL and only readable by its owner, so two servers
+        starting at once on the same directory end up with the same key.
+
+    Args:
+        directory (str): The directory holding the journal
+    Returns:
+        bytes: The key
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, SECRET_KEY_FILE)
+    try:
+        descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, 'rb') as file:
+            return file.read()
+    key = os.urandom(24)
+    with os.fdopen(descriptor, 'wb') as file:
+        file.write(key)
+        file.flush()
+        os.fsync(file.fileno())
+    logging.info('Generated a new session key in %s', path)
+    return key
+
+def read_records(filename):
+    """Reads the records of a journal file, stopping at a line torn by a crash
+
+    Args:
+        filename (str): The path of the journal file
+    Returns:
+        generator(dict): Each record of the journal, in the order they were written
+    """
+
+    if not os.path.exists(filename):
+        return
+    with open(filename, 'rb') as file:
+        for line in file:
+            if not line.endswith(b'\n'):
+                logging.warning('Ignoring a torn record at the end of %s', filename)
+                return
+            yield json.loads(line)
+
+class Journal:
+    """An append-only journal of game records with periodic snapshots
+
+    Attributes:
+        directory (str): The directory holding the journal and the snapshot
+        fsync_interval (float): The number of seconds between each write and fsync
+        snapshot_interval (float): The number of seconds between each snapshot
+        seq (int): The position of the last record in the journal
+    """
+
+    def __init__(self, directory, fsync_interval = FSYNC_INTERVAL,
+                 snapshot_interval = SNAPSHOT_INTERVAL):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.snapshot_interval = snapshot_interval
+        self.journal_path = os.path.join(directory, 'games.journal')
+        self.old_journal_path = self.journal_path + '.old'
+        self.snapshot_path = os.path.join(directory, 'games.snapshot')
+        self.seq = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._file = None
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, record_type, game_id, data = None):
+        """Adds a record to the journal, to be written out by the background thread
+
+        Args:
+            record_type (str): The type of the record, such as 'create', 'turn' or 'end'
+            game_id (str): The id of the game the record belongs to
+            data (dict): The rest of the record
+        Returns:
+            int: The position of the record in the journal
+        """
+
+        with self._lock:
+            self.seq += 1
+            record = {'seq': self.seq, 'type': record_type, 'game': game_id,
+                      'time': time.time(), **(data or {})}
+            self._pending.append(json.dumps(record, separators=(',', ':')) + '\n')
+            return self.seq
+
+    def flush(self):
+        """Writes the pending records to the journal file and fsyncs it
+
+        Args:
+            No arguments
+        Returns:
+            Returns nothing
+        """
+
+        with self._write_lock:
+            self._write_pending()
+
+    def snapshot(self, games):
+        """Writes a snapshot of the live games and starts the journal again
+
+        Description:
+            The journal is moved aside before the games are encoded, so every record
+            that is not in the snapshot is in the new journal or the moved one. The
+            moved journal is only deleted once the snapshot is safely on disk.
+
+        Args:
+            games (function): Returns the id and the encoded state of each live game,
+                where each state holds the 'seq' of the game's last record
+        Returns:
+            Returns nothing
+        """
+
+        with self._write_lock:
+            self._write_pending()
+            with self._lock:
+                seq = self.seq
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.journal_path):
+                os.replace(self.journal_path, self.old_journal_path)
+
+        encoded = zlib.compress(json.dumps({'seq': seq, 'games': dict(games())},
+                                           separators=(',', ':')).encode('utf-8'))
+        temporary = self.snapshot_path + '.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(encoded)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.snapshot_path)
+        # Replacing the file is atomic, so a crash leaves either snapshot whole
+        if os.path.exists(self.old_journal_path):
+            os.remove(self.old_journal_path)
+        logging.info('Snapshot of the games written at journal position %s', seq)
+
+    def _write_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        if self._file is None:
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+        self._file.write(''.join(pending))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        # One fsync covers every record written since the last interval
+
+    def load(self):
+        """Loads the latest snapshot and the records of the journal written after it
+
+        Args:
+            No arguments
+        Returns:
+            dict{str : dict}: The encoded state of each game in the snapshot
+            list[dict]: The records that are not already part of the snapshot, in order
+        """
+
+        snapshot = {'seq': 0, 'games': {}}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'rb') as file:
+                snapshot = json.loads(zlib.decompress(file.read()))
+        games = snapshot['games']
+
+        records = []
+        for filename in (self.old_journal_path, self.journal_path):
+            for record in read_records(filename):
+                game = games.get(record['game'])
+                if record['seq'] > (game['seq'] if game is not None else snapshot['seq']):
+                # A record of a game in the snapshot is only new if it came after the
+                # game was encoded, which can be after the snapshot's own position
+                    records.append(record)
+                self.seq = max(self.seq, record['seq'])
+        self.seq = max(self.seq, snapshot['seq'],
+                       *(game['seq'] for game in games.values()))
+        return games, records
+
+    def start(self, games):
+        """Starts the background thread that writes the journal and the snapshots
+
+        Args:
+            games (function): Returns the id and the encoded state of each live game
+        Returns:
+            Returns nothing
+        """
+
+        def run():
+            last_snapshot = time.monotonic()
+            while not self._stop.wait(self.fsync_interval):
+                try:
+                    self.flush()
+                    if time.monotonic() - last_snapshot >= self.snapshot_interval:
+                        self.snapshot(games)
+                        last_snapshot = time.monotonic()
+                except OSError:
+                    logging.exception('The game journal could not be written')
+            self.flush()
+
+        self._thread = threading.Thread(target=run, name='game-journal', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stops the background thread and writes out the records still pending
+
+        Args:
+            No arguments
+        Returns:
+            Returns nothing
+        """
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,259 @@
+"""Session-keyed storage for the games being played on the web interface
+
+This module keeps every game that is in progress on the Flask interface in
+its own state object, so that each browser session plays its own game rather
+than sharing a single set of module-level boards. Each game carries its own
+lock so that concurrent '/attack' requests for the same game are serialised,
+while the store itself bounds memory by evicting the least recently used
+games and any games that have been idle for too long.
+
+Attributes
+----------
+MAX_GAMES : int
+    The default number of games that the store holds before evicting
+GAME_TTL : float
+    The default number of seconds a game can stay idle before it is evicted
+"""
+
+
+import threading
+import time
+from collections import OrderedDict
+from battleships_ai import AI_STATES, CellPool
+from fleet import Fleet
+from game_events import EventChannel
+
+MAX_GAMES = 10000
+GAME_TTL = 60 * 60
+
+def ship_cells(board):
+    """Lists the cells covered by each ship on a board
+
+    Args:
+        board (list[list]): The board, where each cell holds a ship name or None
+    Returns:
+        dict{str : list[tuple]}: The x and y coordinates of the cells of each ship
+    """
+
+    cells = {}
+    for y, row in enumerate(board):
+        for x, ship in enumerate(row):
+            if ship is not None:
+                cells.setdefault(ship, []).append((x, y))
+    return cells
+
+class GameState:
+    """The state of a single battleships game between the player and the Ai
+
+    Attributes:
+        player_board (list[list]): The player's board in the battleships game
+        player_ships (Fleet): The player's ships and their remaining hitpoints
+        player_hitlog (set[tuple]): Log of all the coordinates that the player has shot
+        ai_board (list[list]): The Ai's board in the battleships game
+        ai_ships (Fleet): The Ai's ships and their remaining hitpoints
+        ai_hitlog (set[tuple]): Log of all the coordinates that the Ai has shot
+        ai_pool (CellPool): The cells of the player's board that the Ai has not shot yet
+        algorithm (str): The type of algorithm used by the Ai against the player
+        lastco_ord (tuple(int, int)): The last coordinate that the Ai has hit
+        stackco_ords (list[tuple]): Stack of coordinates that the Ai is going to shoot next
+        ship_detected (bool): Whether the Ai is tracking a ship after hitting one or not
+        shiphit (bool): Whether the Ai hit a ship on its last turn or not
+        open_hits (int): The number of the Ai's hits on ships that have not sunk yet
+        ai_state (ProbabilityDensity or MonteCarloTargeting): The Ai's state of the player's
+            board when the Ai uses the probability or montecarlo algorithm, otherwise None
+        player_ship_cells (dict{str : list[tuple]}): The cells of each of the player's ships,
+            kept so the Ai can be told which cells a sunk ship covered
+        placements (dict): The ships and the cells of both fleets as the game started,
+            kept so the game can be journaled and rebuilt
+        turns (list[tuple]): The player's and the Ai's coordinates of each turn played
+        journal_seq (int): The position in the journal of the last record of the game
+        events (EventChannel): The events of the game, pushed to its subscribed clients
+        lock (threading.Lock): Serialises the turns that are played on this game
+        last_access (float): The monotonic time that the game was last used
+    """
+
+    __slots__ = ('player_board', 'player_ships', 'player_hitlog',
+                 'ai_board', 'ai_ships', 'ai_hitlog', 'ai_pool', 'algorithm',
+                 'lastco_ord', 'stackco_ords', 'ship_detected', 'shiphit', 'open_hits',
+                 'ai_state', 'player_ship_cells', 'placements', 'turns', 'journal_seq',
+                 'events', 'lock', 'last_access')
+
+    def __init__(self, player_board, player_ships, ai_board, ai_ships, algorithm = 'parity'):
+        self.player_board = player_board
+        self.player_ships = Fleet(player_ships)
+        self.player_hitlog = set()
+        self.ai_board = ai_board
+        self.ai_ships = Fleet(ai_ships)
+        self.ai_hitlog = set()
+        self.ai_pool = CellPool(len(player_board))
+        self.algorithm = algorithm
+        self.lastco_ord = ()
+        self.stackco_ords = []
+        self.ship_detected = False
+        self.shiphit = False
+        self.open_hits = 0
+        self.ai_state = None
+        self.player_ship_cells = ship_cells(player_board)
+        if algorithm in AI_STATES:
+            self.ai_state = AI_STATES[algorithm](len(player_board), player_ships)
+        self.placements = {'size': len(player_board),
+                           'player_ships': dict(player_ships),
+                           'player_cells': self.player_ship_cells,
+                           'ai_ships': dict(ai_ships),
+                           'ai_cells': ship_cells(ai_board)}
+        self.turns = []
+        self.journal_seq = 0
+        self.events = EventChannel()
+        self.lock = threading.Lock()
+        self.last_access = time.monotonic()
+
+    def ship_detection(self):
+        """Packs the Ai's tracking variables in the form used by 'generate_attack'
+
+        Args:
+            No arguments
+        Returns:
+            list: The ship_detected, shiphit, lastco_ord and stackco_ords values of the game
+        """
+
+        return [self.ship_detected, self.shiphit, self.lastco_ord, self.stackco_ords]
+
+    def finished(self):
+        """Checks whether either fleet has been sunk, after which no more turns are played
+
+        Args:
+            No arguments
+        Returns:
+            bool: Whether the game is over
+        """
+
+        return self.ai_ships.all_sunk() or self.player_ships.all_sunk()
+
+    def close(self):
+        """Ends the game's event stream once the game is replaced or evicted
+
+        Args:
+            No arguments
+        Returns:
+            Returns nothing
+        """
+
+        self.events.close()
+
+class GameStore:
+    """A bounded, thread-safe mapping of session ids to their games
+
+    Description:
+        The games are kept in least recently used order, so that when the store is full
+        the game that has gone the longest without being used is the one that is evicted.
+        Games that have been idle for longer than the time-to-live are evicted lazily
+        whenever the store is used.
+
+    Attributes:
+        max_games (int): The maximum number of games held by the store
+        ttl (float): The number of seconds a game can be idle before it is evicted
+        evictions (int): The number of games that have been evicted from the store
+    """
+
+    def __init__(self, max_games = MAX_GAMES, ttl = GAME_TTL):
+        self.max_games = max_games
+        self.ttl = ttl
+        self.evictions = 0
+        self._games = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._games)
+
+    def __contains__(self, game_id):
+        with self._lock:
+            return game_id in self._games
+
+    def get(self, game_id):
+        """Looks up the game for a session and marks it as recently used
+
+        Args:
+            game_id (str): The id of the session that owns the game
+        Returns:
+            GameState: The game for the session, or None if there is no live game
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            game = self._games.get(game_id)
+            if game is not None:
+                self._games.move_to_end(game_id)
+                # Moves the game to the most recently used end of the store
+                game.last_access = now
+            return game
+
+    def put(self, game_id, game):
+        """Stores the game for a session, replacing any game the session already had
+
+        Args:
+            game_id (str): The id of the session that owns the game
+            game (GameState): The game being stored
+        Returns:
+            GameState: The game that has been stored
+        """
+
+        now = time.monotonic()
+        game.last_access = now
+        with self._lock:
+            replaced = self._games.get(game_id)
+            if replaced is not None and replaced is not game:
+                replaced.close()
+            self._games[game_id] = game
+            self._games.move_to_end(game_id)
+            self._expire(now)
+            while len(self._games) > self.max_games:
+            # Evicts the least recently used games until the store is back within its bound
+                self._games.popitem(last=False)[1].close()
+                self.evictions += 1
+        return game
+
+    def discard(self, game_id):
+        """Removes the game for a session if there is one
+
+        Args:
+            game_id (str): The id of the session that owns the game
+        Returns:
+            Returns nothing
+        """
+
+        with self._lock:
+            game = self._games.pop(game_id, None)
+        if game is not None:
+            game.close()
+
+    def items(self):
+        """Lists every game in the store without touching how recently it was used
+
+        Args:
+            No arguments
+        Returns:
+            list[tuple(str, GameState)]: The id of each session and its game
+        """
+
+        with self._lock:
+            return list(self._games.items())
+
+    def _expire(self, now):
+        """Evicts the games that have been idle for longer than the time-to-live
+
+        Args:
+            now (float): The current monotonic time
+        Returns:
+            Returns nothing
+        """
+
+        while self._games:
+            game_id, game = next(iter(self._games.items()))
+            # The least recently used game is always at the front of the store
+            if now - game.last_access <= self.ttl:
+                break
+            del self._games[game_id]
+            game.close()
+            self.evictions += 1
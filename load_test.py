@@ -0,0 +1,284 @@
+"""Load-test driver for the Flask game server
+
+This module simulates many players at once, each playing whole games through the
+routes of the web interface: loading '/' to start a game, loading '/placement' and
+then shooting '/attack' at random cells until the game is over. The players either
+share the Flask application in this process through its test client, or talk to a
+running server over http with a cookie jar each, so that the same run can measure
+the application itself and the server in front of it.
+
+Every request is timed, and the report gives the throughput, the 50th, 95th and
+99th percentile latency and the error rate of each route as json, so that runs can
+be compared between versions. A share of the shots can be aimed at a cell that has
+already been shot, to measure how the server copes with the 500 responses.
+
+Attributes
+----------
+ROUTES : tuple(str)
+    The routes driven by each simulated player
+"""
+
+
+import argparse
+import http.cookiejar
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from ai_tournament import PERCENTILES, percentile
+
+ROUTES = ('/', '/placement', '/attack')
+
+class InProcessClient:
+    """A simulated player's session with the Flask application of this process"""
+
+    def __init__(self):
+        import main
+        self._client = main.app.test_client()
+
+    def get(self, path):
+        """Sends a GET request to the application
+
+        Args:
+            path (str): The path and query of the request
+        Returns:
+            int: The status code of the response
+            bytes: The body of the response
+        """
+
+        response = self._client.get(path)
+        return response.status_code, response.get_data()
+
+class HttpClient:
+    """A simulated player's session with a server over http
+
+    Attributes:
+        url (str): The address of the server, such as 'http://127.0.0.1:5000'
+        timeout (float): The number of seconds to wait for each response
+    """
+
+    def __init__(self, url, timeout = 10.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self._opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def get(self, path):
+        """Sends a GET request to the server
+
+        Args:
+            path (str): The path and query of the request
+        Returns:
+            int: The status code of the response, or 0 if the server could not be reached
+            bytes: The body of the response
+        """
+
+        try:
+            with self._opener.open(self.url + path, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+        except OSError as error:
+            return 0, str(error).encode('utf-8')
+
+class LoadStats:
+    """The latency and the errors of every request, collected from every player thread
+
+    Attributes:
+        games (int): The number of games the players have finished
+    """
+
+    def __init__(self):
+        self._latencies = {route: [] for route in ROUTES}
+        self._errors = {route: 0 for route in ROUTES}
+        self._statuses = {route: {} for route in ROUTES}
+        self.games = 0
+        self._lock = threading.Lock()
+
+    def record(self, route, status, latency):
+        """Records the result of one request
+
+        Args:
+            route (str): The route of the request
+            status (int): The status code of the response, 0 if there was none
+            latency (float): The seconds the request took
+        Returns:
+            Returns nothing
+        """
+
+        with self._lock:
+            self._latencies[route].append(latency)
+            self._errors[route] += not 200 <= status < 400
+            self._statuses[route][str(status)] = self._statuses[route].get(str(status), 0) + 1
+
+    def finish_game(self):
+        """Counts a game that a player has finished
+
+        Args:
+            No arguments
+        Returns:
+            Returns nothing
+        """
+
+        with self._lock:
+            self.games += 1
+
+    def report(self, wall_time):
+        """Summarises the requests of the run
+
+        Args:
+            wall_time (float): The seconds the whole run took
+        Returns:
+            dict: The requests, throughput and error rate of the run, and the latency
+                percentiles, in milliseconds, of each route
+        """
+
+        with self._lock:
+            routes = {}
+            for route in ROUTES:
+                latencies = sorted(self._latencies[route])
+                requests = len(latencies)
+                routes[route] = {
+                    'requests': requests,
+                    'throughput': requests / wall_time if wall_time else 0.0,
+                    'errors': self._errors[route],
+                    'error_rate': self._errors[route] / requests if requests else 0.0,
+                    'statuses': self._statuses[route],
+                    'mean_ms': 1000 * sum(latencies) / requests if requests else 0.0,
+                    **{f'p{percent}_ms': 1000 * percentile(latencies, percent)
+                       for percent in PERCENTILES},
+                }
+            requests = sum(route['requests'] for route in routes.values())
+            errors = sum(route['errors'] for route in routes.values())
+            return {'requests': requests, 'games': self.games,
+                    'throughput': requests / wall_time if wall_time else 0.0,
+                    'error_rate': errors / requests if requests else 0.0,
+                    'routes': routes}
+
+def play_player(client, stats, games, board_size, think, repeat_rate, rng):
+    """Plays games as one simulated player
+
+    Args:
+        client (InProcessClient or HttpClient): The player's session
+        stats (LoadStats): Where the result of every request is recorded
+        games (int): The number of games the player plays
+        board_size (int): The size of the board of each game
+        think (float): The mean number of seconds the player waits between requests
+        repeat_rate (float): The share of shots aimed at a cell that has already been shot
+        rng (random.Random): The player's own random choices
+    Returns:
+        Returns nothing
+    """
+
+    def request(route, path):
+        if think:
+            time.sleep(rng.uniform(0, 2 * think))
+        start = time.perf_counter()
+        status, body = client.get(path)
+        stats.record(route, status, time.perf_counter() - start)
+        return status, body
+
+    for _ in range(games):
+        status, _ = request('/', f'/?size={board_size}')
+        if status != 200:
+            continue
+        request('/placement', '/placement')
+        cells = [(x, y) for y in range(board_size) for x in range(board_size)]
+        rng.shuffle(cells)
+        shot = []
+        while cells:
+            if shot and rng.random() < repeat_rate:
+                x, y = rng.choice(shot)
+            else:
+                x, y = cells.pop()
+                shot.append((x, y))
+            status, body = request('/attack', f'/attack?x={x}&y={y}')
+            if status == 200 and b'finished' in body:
+                break
+            if status in (0, 404, 409):
+                break
+                # The game is gone or over, or the server cannot be reached
+        stats.finish_game()
+
+def run_load_test(players = 10, games = 5, board_size = 10, think = 0.0, repeat_rate = 0.0,
+                  url = None, seed = 0):
+    """Runs simulated players at the same time and reports how the server coped
+
+    Args:
+        players (int): The number of players playing at the same time
+        games (int): The number of games each player plays
+        board_size (int): The size of the board of each game
+        think (float): The mean number of seconds each player waits between requests
+        repeat_rate (float): The share of shots aimed at a cell that has already been shot
+        url (str): The address of a running server, or None to drive the Flask
+            application in this process
+        seed (int): The seed of the players' random choices
+    Returns:
+        dict: The settings of the run and the report of 'LoadStats.report'
+    Raises:
+        ValueError: The repeat rate is not at least 0 and less than 1, so the players'
+            games might never end
+    """
+
+    if not 0 <= repeat_rate < 1:
+        raise ValueError(f'The repeat rate must be at least 0 and less than 1, not {repeat_rate}')
+    stats = LoadStats()
+    threads = []
+    for player in range(players):
+        client = HttpClient(url) if url else InProcessClient()
+        threads.append(threading.Thread(
+            target=play_player, name=f'player-{player}',
+            args=(client, stats, games, board_size, think, repeat_rate,
+                  random.Random(seed * 1000003 + player))))
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - start
+
+    return {'settings': {'players': players, 'games': games, 'size': board_size,
+                         'think': think, 'repeat_rate': repeat_rate,
+                         'target': url or 'in-process', 'seed': seed, 'time': time.time()},
+            'wall_time': wall_time, **stats.report(wall_time)}
+
+def main(argv = None):
+    """Runs the load test from the command line
+
+    Args:
+        argv (list[str]): The command line arguments, taken from sys.argv if not given
+    Returns:
+        Returns nothing
+    """
+
+    parser = argparse.ArgumentParser(description='Load test of the battleships web server')
+    parser.add_argument('--players', type=int, default=10, help='players at the same time')
+    parser.add_argument('--games', type=int, default=5, help='games played by each player')
+    parser.add_argument('--size', type=int, default=10)
+    parser.add_argument('--think', type=float, default=0.0,
+                        help='mean seconds each player waits between requests')
+    parser.add_argument('--repeat-rate', type=float, default=0.0,
+                        help='share of shots aimed at a cell that has already been shot, below 1')
+    parser.add_argument('--url', default=None,
+                        help='address of a running server (drives main.app in-process if not given)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='json file for the report (stdout if not given)')
+    args = parser.parse_args(argv)
+    if not 0 <= args.repeat_rate < 1:
+        parser.error('--repeat-rate must be at least 0 and less than 1')
+
+    report = run_load_test(args.players, args.games, args.size, args.think, args.repeat_rate,
+                           args.url, args.seed)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+
+if __name__ == '__main__':
+    main()
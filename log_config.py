@@ -0,0 +1,146 @@
+"""Non-blocking logging set-up for the Flask interface
+
+This module configures the logging of the game so that the threads handling requests
+never wait on the log file. Each log record is only put on a queue by the request
+thread, and a background listener thread takes the records off the queue and writes
+them to a log file that is rotated once it reaches a set size. The per-move debug
+records, which are logged on every '/attack', can also be sampled so that only one
+in every N of them is kept.
+
+The set-up is read from environment variables, so it can be changed without editing
+the code:
+    BATTLESHIPS_LOG_LEVEL: The lowest level that is logged (default DEBUG)
+    BATTLESHIPS_LOG_SAMPLE: Keep one in every N debug records (default 1, keep all)
+    BATTLESHIPS_LOG_MAX_BYTES: The size the log file reaches before it is rotated
+    BATTLESHIPS_LOG_BACKUPS: The number of rotated log files that are kept
+    BATTLESHIPS_LOG_QUEUE: Set to 0 to write the records from the request threads instead
+A value that cannot be read is replaced by its default, and a warning is logged once
+the logging has been set up, so a typo never stops the server from starting.
+
+Attributes
+----------
+MAX_BYTES : int
+    The default size the log file reaches before it is rotated
+BACKUP_COUNT : int
+    The default number of rotated log files that are kept
+"""
+
+
+import atexit
+import itertools
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in every N debug records, and every record of a higher level
+
+    Attributes:
+        rate (int): The number of debug records for each one that is kept
+    """
+
+    def __init__(self, rate = 1):
+        super().__init__()
+        self.rate = max(1, int(rate))
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate == 1:
+            return True
+        return next(self._counter) % self.rate == 0
+
+def read_level(level, problems):
+    """Turns the name of a logging level into its number
+
+    Args:
+        level (str or int): The name or the number of the level
+        problems (list[str]): The warnings about the settings, added to if the name is unknown
+    Returns:
+        int: The level, DEBUG if the name is unknown
+    """
+
+    if isinstance(level, int):
+        return level
+    number = logging.getLevelName(str(level).upper())
+    if not isinstance(number, int):
+        problems.append(f'Unknown log level {level!r}, logging at DEBUG instead')
+        return logging.DEBUG
+    return number
+
+def read_int(name, default, problems):
+    """Reads a whole number from an environment variable
+
+    Args:
+        name (str): The environment variable
+        default (int): The value used when the variable is not set or is not a whole number
+        problems (list[str]): The warnings about the settings, added to if the value is not
+            a whole number
+    Returns:
+        int: The value of the variable, or the default
+    """
+
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        problems.append(f'{name}={value!r} is not a whole number, using {default} instead')
+        return default
+
+def setup_logging(filename = 'flask.log', level = None, sample_rate = None,
+                  max_bytes = None, backup_count = None, use_queue = None):
+    """Sets up the root logger to write to a rotating log file through a queue
+
+    Description:
+        Any argument that is not given is read from its environment variable, or
+        otherwise takes its default value.
+
+    Args:
+        filename (str): The log file
+        level (str or int): The lowest level that is logged
+        sample_rate (int): Keep one in every this many debug records
+        max_bytes (int): The size the log file reaches before it is rotated
+        backup_count (int): The number of rotated log files that are kept
+        use_queue (bool): Whether the records are written by a background listener
+    Returns:
+        QueueListener: The listener writing the records, or None when the queue is not used
+    """
+
+    environ = os.environ
+    problems = []
+    level = read_level(level or environ.get('BATTLESHIPS_LOG_LEVEL', 'DEBUG'), problems)
+    sample_rate = sample_rate or read_int('BATTLESHIPS_LOG_SAMPLE', 1, problems)
+    max_bytes = max_bytes or read_int('BATTLESHIPS_LOG_MAX_BYTES', MAX_BYTES, problems)
+    backup_count = backup_count or read_int('BATTLESHIPS_LOG_BACKUPS', BACKUP_COUNT, problems)
+    if use_queue is None:
+        use_queue = environ.get('BATTLESHIPS_LOG_QUEUE', '1') != '0'
+
+    file_handler = RotatingFileHandler(filename, maxBytes=max_bytes,
+                                       backupCount=backup_count, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    # Keeps the same format as the log file written by logging.basicConfig
+
+    listener = None
+    if use_queue:
+        records = queue.SimpleQueue()
+        handler = QueueHandler(records)
+        listener = QueueListener(records, file_handler)
+        listener.start()
+        atexit.register(listener.stop)
+        # Writes out the records still on the queue when the interpreter exits
+    else:
+        handler = file_handler
+    handler.addFilter(SamplingFilter(sample_rate))
+    # Dropping the sampled records before they are queued keeps them off the listener too
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(handler)
+    for problem in problems:
+        logging.warning(problem)
+    return listener
@@ -13,54 +13,237 @@ from the URL.
 
 Attributes
 ----------
-player_board : list[list]
-    The player's board in the battleships game
-player_ships : dict{str : int}
-    The player's ships and its' remaining hitpoints in the game
-player_hitog : list[tuple]
-    Log of all the coordinates that the player has shot in this game
-ai_board : list[list]
-    The Ai's board in the battleships game
-ai_ships : dict{str : int}
-    The Ai's ships and it's remaining hitpoints in the game
-ai_hitlog : list[tuple]
-    Log of all the coordinates that the Ai has shot in this game
+games : GameStore
+    The games in progress, keyed by the session id of the player's browser
 AI_ALGORITHM : str
-    The type of algorithm used by the Ai against the player
-lastco_ord : tuple(int, int)
-    The last coordinate that the Ai has shot
-stackco_ords : list[tuple]
-    Stack of coordinates that the Ai is going to shoot next
-SHIP_DETECTED : bool
-    Determines whether the Ai is tracking a ship after hitting one or not
-SHIPHIT : bool
-    Validation for when the Ai has hit a ship or not
+    The type of algorithm used by the Ai for a session that has not chosen a difficulty
+BOARD_SIZE : int
+    The size of the boards for a session that has not chosen a size
+MAX_BOARD_SIZE : int
+    The largest board size that can be chosen, as the webpage draws every cell
+REQUEST_LATENCY : Histogram
+    The time taken to handle each request, by route and method
+AI_DECISION : Histogram
+    The time taken by the Ai to choose each attack, by algorithm
+ATTACKS : Counter
+    The number of attacks made through 'game_engine.attack', by the player or the Ai
+AI_REDRAWS : Counter
+    The number of coordinates the Ai drew again because they had already been shot
+journal : Journal
+    The crash-safe journal of the games, or None when BATTLESHIPS_JOURNAL_DIR is not set
+profiler : RequestProfiler
+    Profiles the chosen requests once BATTLESHIPS_PROFILE_DIR is set
+setting_problems : list[str]
+    The warnings about the settings read before the logging is set up
 """
 
 
+import atexit
 import json
 import logging
-from flask import Flask, render_template, request, jsonify, redirect, url_for
-from components import initialise_board, create_battleships, place_battleships
+import os
+import time
+import uuid
+from flask import (Flask, Response, g, render_template, request, jsonify, redirect, url_for,
+                   session)
+from battleships_ai import MONTE_CARLO_WORKERS, monte_carlo_pool
+from components import (initialise_board, create_battleships, place_battleships, load_placement,
+                        valid_board_placement)
+from config_cache import cache
 from game_engine import attack
+from game_events import stream
+from game_journal import FSYNC_INTERVAL, SNAPSHOT_INTERVAL, Journal, load_secret_key
+from game_store import GameState, GameStore
+from log_config import read_int, setup_logging
+from metrics import Counter, Gauge, Histogram, registry
 from mp_game_engine import generate_attack
+from opening_book import load_book
+from request_profiler import REQUEST_ID_HEADER, RequestProfiler
+from zobrist import transpositions
 
-player_board = []
-player_ships = {}
-player_hitlog = []
-ai_board = []
-ai_ships = {}
-ai_hitlog = []
+games = GameStore()
 AI_ALGORITHM = 'parity'
-lastco_ord = ()
-stackco_ords = []
-SHIP_DETECTED = False
-SHIPHIT = False
+BOARD_SIZE = 10
+MAX_BOARD_SIZE = 100
+journal = None
+setting_problems = []
+profiler = RequestProfiler(os.environ.get('BATTLESHIPS_PROFILE_DIR'),
+                           read_int('BATTLESHIPS_PROFILE_RATE', 0, setting_problems),
+                           [route for route in
+                            os.environ.get('BATTLESHIPS_PROFILE_ROUTES', '/attack').split(',')
+                            if route],
+                           os.environ.get('BATTLESHIPS_PROFILE_TOKEN'))
+
+REQUEST_LATENCY = registry.register(Histogram(
+    'battleships_request_seconds', 'Time taken to handle each request', ('route', 'method')))
+AI_DECISION = registry.register(Histogram(
+    'battleships_ai_decision_seconds', 'Time taken by the Ai to choose each attack',
+    ('algorithm',)))
+ATTACKS = registry.register(Counter(
+    'battleships_attacks_total', 'Attacks made through game_engine.attack', ('by',)))
+AI_REDRAWS = registry.register(Counter(
+    'battleships_ai_redraws_total', 'Ai coordinates drawn again as they were already shot',
+    ('algorithm',)))
+registry.register(Gauge('battleships_active_games', 'Games held in memory',
+                        lambda: len(games)))
+registry.register(Gauge('battleships_evicted_games_total',
+                        'Games evicted as they were idle or the store was full',
+                        lambda: games.evictions, kind='counter'))
+registry.register(Gauge('battleships_transposition_hits_total',
+                        'Ai moves answered from the transposition cache',
+                        lambda: transpositions.hits, kind='counter'))
+registry.register(Gauge('battleships_transposition_misses_total',
+                        'Ai moves looked up in the transposition cache and not found',
+                        lambda: transpositions.misses, kind='counter'))
+registry.register(Gauge('battleships_transposition_entries',
+                        'Moves held in the transposition cache', lambda: len(transpositions)))
+registry.register(Gauge('battleships_transposition_bytes',
+                        'Estimated memory used by the transposition cache',
+                        lambda: transpositions.memory))
+
+if os.environ.get('BATTLESHIPS_MONTE_CARLO_POOL', '0') != '0':
+    monte_carlo_pool(MONTE_CARLO_WORKERS)
+    # Forks the Monte Carlo Ai's workers before the logging and journal threads start
+
+setup_logging('flask.log')
+# Logs each event that occurs in the runtime of flask, through a queue so that
+# writing the log never holds up a request
+for problem in setting_problems:
+    logging.warning(problem)
+    # A setting that cannot be read falls back to its default rather than stopping the server
 
 app = Flask(__name__)
+app.secret_key = os.environ.get('BATTLESHIPS_SECRET_KEY')
+if not app.secret_key and os.environ.get('BATTLESHIPS_JOURNAL_DIR'):
+    app.secret_key = load_secret_key(os.environ['BATTLESHIPS_JOURNAL_DIR'])
+    # The restored games can only be found through cookies signed with the same key
+app.secret_key = app.secret_key or os.urandom(24)
+# Signs the session cookie that holds the id of the player's game
 
-logging.basicConfig(filename='flask.log', level=logging.DEBUG)
-# Logs each event that occurs in the runtime of flask
+@app.before_request
+def start_timer():
+    """Records when the handling of a request started
+
+    Args:
+        No arguments
+    Returns:
+        Returns nothing
+    """
+
+    g.request_start = time.perf_counter()
+
+@app.teardown_request
+def record_latency(error):
+    """Records the time taken to handle a request in the latency histogram of its route
+
+    Description:
+        Recorded once the request has ended rather than when its response is made, so
+        that the requests whose view raised an error, and were answered with a 500,
+        are counted too.
+
+    Args:
+        error (Exception): The error that ended the request, if any
+    Returns:
+        Returns nothing
+    """
+
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        # Labelled by the route rather than the URL, so the query string cannot add labels
+        REQUEST_LATENCY.observe(time.perf_counter() - start, (route, request.method))
+
+@app.before_request
+def start_profile():
+    """Starts profiling the request if it has been chosen to be profiled
+
+    Args:
+        No arguments
+    Returns:
+        Returns nothing
+    """
+
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    session_profile = profiler.start(route, request.headers)
+    if session_profile is not None:
+        g.profile = session_profile
+
+@app.after_request
+def finish_profile(response):
+    """Writes out the profile of the request if it was profiled
+
+    Args:
+        response (Response): The response to the request
+    Returns:
+        Response: The same response, carrying the id that the profile is named after
+    """
+
+    session_profile = g.pop('profile', None)
+    if session_profile is not None:
+        profiler.finish(session_profile)
+        response.headers[REQUEST_ID_HEADER] = session_profile.request_id
+    return response
+
+@app.teardown_request
+def abandon_profile(error):
+    """Stops profiling a request that ended without a response
+
+    Args:
+        error (Exception): The error that ended the request, if any
+    Returns:
+        Returns nothing
+    """
+
+    session_profile = g.pop('profile', None)
+    if session_profile is not None:
+        profiler.finish(session_profile)
+
+@app.route('/profiling', methods=['GET', 'POST'])
+def profiling_interface():
+    """Shows and changes how requests are profiled, for trusted clients only
+
+    Description:
+        "GET": Shows the sampling rate, the sampled routes and the number of requests
+            profiled so far
+        "POST": Changes the sampling rate and the sampled routes from the json 'rate'
+            and 'routes', without restarting the server
+    Args:
+        No arguments
+    Returns:
+        jsonify(): The settings of the profiler
+    Responses:
+        200: The settings have been shown or changed
+        400: The rate is not a whole number of at least 0, or the routes are not a list
+        403: The request does not carry the trusted token in the profiling header
+    """
+
+    if not profiler.trusted(request.headers):
+        return jsonify({'message': 'Profiling is only available to trusted clients'}), 403
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        rate = data.get('rate', profiler.rate)
+        routes = data.get('routes', sorted(profiler.routes))
+        if (not isinstance(rate, int) or isinstance(rate, bool) or rate < 0
+                or not isinstance(routes, list)):
+            return jsonify({'message': 'The rate must be a whole number and the routes a list'}), 400
+        profiler.rate = rate
+        profiler.routes = set(routes)
+        logging.info('Profiling one in %s requests to %s', rate, routes)
+    return jsonify(profiler.settings())
+
+@app.route('/metrics', methods=['GET'])
+def metrics_interface():
+    """Exports the metrics of the game in the Prometheus text format
+
+    Args:
+        No arguments
+    Returns:
+        Response(): The metrics as plain text
+    Responses:
+        200: The metrics have been rendered
+    """
+
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/placement', methods=['GET', 'POST'])
 def placement_interface():
@@ -87,7 +270,7 @@ def placement_interface():
         logging.info('Rendering placement template...')
         ships = create_battleships('battleships.txt')
         logging.info('SUCCESS! Placement template has been rendered')
-        return render_template('placement.html', ships=ships, board_size = 10)
+        return render_template('placement.html', ships=ships, board_size = session_board_size())
         # Renders the html for the ship placement html
 
     if request.method == 'POST':
@@ -103,6 +286,8 @@ def placement_interface():
             # 'dumps' the data into the placement file by overwriting it
         file.close()
         # Closes the file
+        cache.invalidate('placement.json')
+        # Makes sure the next game reads the new placement
         logging.info('SUCCESS! Data stored into placement.json file')
         return jsonify({'message' : 'Received'}), 200
         # Returns a message displaying that the data has been received
@@ -113,8 +298,8 @@ def root():
     
     Description:
         "GET": Renders and displays the main template on the root interface, where the
-            player will get to the game, as well as creating the player's board
-            and the Ai's board
+            player will get to the game, as well as creating a new game with the player's
+            board and the Ai's board for the player's session
     Args:
         No arguments
     Returns:
@@ -124,59 +309,249 @@ def root():
     """
 
     if request.method == 'GET':
-        global player_board, player_ships, ai_board, ai_ships, AI_ALGORITHM
-
+        board_size = session_board_size()
         logging.info("Creating the player board and the player's ships")
-        player_board = initialise_board(10)
+        player_board = initialise_board(board_size)
         player_ships = create_battleships('battleships.txt')
         # Initialises the player's board and creates the player's battleships
 
         logging.info("Creating the Ai board and the Ai's ships")
-        ai_board = initialise_board(10)
+        ai_board = initialise_board(board_size)
         ai_ships = create_battleships('battleships.txt')
         # Initialises the Ai's board and creates the Ai's battleships
 
-        global player_hitlog, ai_hitlog, lastco_ord, stackco_ords, SHIP_DETECTED, SHIPHIT
-
-        player_hitlog = []
-        ai_hitlog = []
-        lastco_ord = ()
-        stackco_ords = []
-        SHIP_DETECTED = False
-        SHIPHIT = False
-
-        with open('placement.json', encoding = "utf-8") as file:
-        # Opens the 'placement.json' file to read from ('r' is automatic)
-            config_file = json.load(file)
-            # Loads the data from the config file
-            for ship_type, ship_pos in config_file.items():
-                for ship, value in player_ships.items():
-                    x, y, orient = ship_pos
-                    x = int(x)
-                    y = int(y)
-                    # Places the ships onto the player's board
-                    if (orient == 'v' and ship_type == ship):
-                        for count in range(int(value)):
-                            player_board[y + count][x] = ship
-                    elif (orient == 'h' and ship_type == ship):
-                        for count in range(int(value)):
-                            player_board[y][x + count] = ship
-            file.close()
-            logging.info('SUCCESS! Player board has been created')
+        config_file = load_placement('placement.json')
+        # Loads the data from the config file, which is only read again once it has changed
+        if not all(valid_board_placement(player_board, player_ships[ship],
+                                         [x, y, orient, True])
+                   for ship, (x, y, orient) in config_file.items() if ship in player_ships):
+        # The placements were made on a larger board than the one chosen
+            logging.info('Placements do not fit the board, placing the ships randomly')
+            player_board = place_battleships(player_board, player_ships, 'random')
+            config_file = {}
+        for ship_type, ship_pos in config_file.items():
+            for ship, value in player_ships.items():
+                x, y, orient = ship_pos
+                x = int(x)
+                y = int(y)
+                # Places the ships onto the player's board
+                if (orient == 'v' and ship_type == ship):
+                    for count in range(int(value)):
+                        player_board[y + count][x] = ship
+                elif (orient == 'h' and ship_type == ship):
+                    for count in range(int(value)):
+                        player_board[y][x + count] = ship
+        logging.info('SUCCESS! Player board has been created')
         ai_board = place_battleships(ai_board, ai_ships, 'random')
         logging.info('SUCCESS! Ai board has been created')
+
+        game_id = session.get('game_id') or uuid.uuid4().hex
+        session['game_id'] = game_id
+        # Gives the player's browser a session id if it does not already have one
+        game = GameState(player_board, player_ships, ai_board, ai_ships,
+                         session.get('algorithm', AI_ALGORITHM))
+        games.put(game_id, game)
+        # Starts a new game for the session, replacing any game it was already playing
+        with game.lock:
+            journal_record('create', game_id, game, encode_game(game))
         return render_template('main.html', player_board=player_board)
         # Renders the main template onto Flask
     return None
 
+def session_board_size():
+    """Gets the board size of the player's session, which is changed by the 'size' argument
+
+    Args:
+        No arguments
+    Returns:
+        int: The size of the boards for the session's games
+    """
+
+    size = request.args.get('size', type=int)
+    if size is not None:
+        longest = max(int(value) for value in create_battleships('battleships.txt').values())
+        session['board_size'] = max(longest, min(size, MAX_BOARD_SIZE))
+        # Every ship must fit on the board, and the webpage must be able to draw it
+    return session.get('board_size', BOARD_SIZE)
+
+def play_turn(game, coords):
+    """Plays one turn of a game: the player's attack followed by the Ai's attack
+
+    Description:
+        The caller must hold the game's lock, so that only one turn is played on a
+        game at a time.
+
+    Args:
+        game (GameState): The game that the turn is played on
+        coords (tuple(int, int)): The coordinates of the player's attack
+    Returns:
+        dict: Whether the player's attack hit, the coordinates of the Ai's attack and,
+            once the game is over, the message saying who has won
+    Raises:
+        TypeError: The player's coordinate has already been shot
+        ValueError: The Ai has no coordinates left to shoot, as the game is already over
+    """
+
+    if coords in game.player_hitlog:
+    # Checks if the player's chosen coordinate has already been shot, before the
+    # Ai's state is touched
+        logging.error('Repeated coordinate has been shot again')
+        raise TypeError('Player clicked on a square that is already hit')
+
+    logging.debug('Generating Ai coordinates...')
+    decision_start = time.perf_counter()
+    if game.ai_state is not None:
+    # The probability density and Monte Carlo Ais never pick a coordinate that has been shot
+        ai_coords = generate_attack(game.algorithm, None, game.ai_hitlog,
+                                    board_size=len(game.player_board), ai_state=game.ai_state)
+    else:
+        ai_coords = None
+        draws = 0
+        while ai_coords not in game.ai_pool and game.ai_pool:
+            draws += 1
+        # Pops the stack until it gives a coordinate that has not been shot, drawing
+        # from the pool of remaining coordinates once the Ai is no longer tracking a ship
+            if (game.algorithm != 'simple' and game.ship_detected and
+                    (game.shiphit or game.stackco_ords)):
+                ai_coords, game.stackco_ords = generate_attack(game.algorithm,
+                                                               game.ship_detection(),
+                                                               game.ai_hitlog,
+                                                               board_size=len(game.player_board))
+                game.shiphit = False
+                # The neighbours of the last hit are only added to the stack once
+            else:
+                ai_coords = generate_attack(game.algorithm, None, game.ai_hitlog,
+                                            board_size=len(game.player_board), cell_pool=game.ai_pool)
+        if ai_coords not in game.ai_pool:
+            raise ValueError('The Ai has no coordinates left to shoot')
+            # An empty pool samples None, which would otherwise be drawn forever
+        if draws > 1:
+            AI_REDRAWS.inc((game.algorithm,), draws - 1)
+    AI_DECISION.observe(time.perf_counter() - decision_start, (game.algorithm,))
+
+    logging.debug('Ai coordinates successfuly generated!')
+    if game.stackco_ords == []:
+    # Checks if there are no more coordinates in the stack and therefore
+    # no longer tracking
+        game.ship_detected = False
+
+    return apply_turn(game, coords, ai_coords)
+
+def apply_turn(game, coords, ai_coords, replay = False):
+    """Plays the player's attack and the Ai's chosen attack on the boards of a game
+
+    Description:
+        The caller must hold the game's lock. This is also used to replay the turns of
+        a game from the journal, where the Ai's attack has already been chosen. A replayed
+        turn only rebuilds the game: it is not counted in the metrics or logged, and no
+        event is published for it, as all of that happened when it was first played.
+
+    Args:
+        game (GameState): The game that the turn is played on
+        coords (tuple(int, int)): The coordinates of the player's attack
+        ai_coords (tuple(int, int)): The coordinates of the Ai's attack
+        replay (bool): Whether the turn is being replayed from the journal
+    Returns:
+        dict: Whether the player's attack hit, the coordinates of the Ai's attack and,
+            once the game is over, the message saying who has won
+    """
+
+    live = not replay
+    game.turns.append((coords, ai_coords))
+    hit_register = attack(coords, game.ai_board, game.ai_ships)
+    # Initiates the attack on the Ai's board
+    sunk = game.ai_ships.last_sunk
+    if live:
+        ATTACKS.inc(('player',))
+        game.events.publish('shot', {'by': 'player', 'shot': coords, 'hit': hit_register})
+        if sunk is not None:
+            game.events.publish('sink', {'by': 'player', 'ship': sunk})
+        if hit_register:
+            logging.debug('Player has hit an Ai ship')
+        else:
+            logging.debug('Player misses')
+    game.player_hitlog.add(coords)
+    # Adds the coordinate to the player's hitlog
+    if live:
+        logging.debug('Coordinates have been added to players hitlog')
+
+    ai_hit_register = attack(ai_coords, game.player_board, game.player_ships)
+    # Initiates the attack on the player's board
+    ai_sunk = game.player_ships.last_sunk
+    if game.ai_state is not None:
+        game.ai_state.record_shot(ai_coords, ai_hit_register, ai_sunk,
+                                  game.player_ship_cells.get(ai_sunk))
+        # Tells the probability density or Monte Carlo Ai the result of its shot; when
+        # the turn is replayed this rebuilds the Ai's state, without choosing a move
+    game.ai_hitlog.add(ai_coords)
+    game.ai_pool.remove(ai_coords)
+    #Adds the coordinate to the Ai's hitlog
+
+    if live:
+        ATTACKS.inc(('ai',))
+        logging.debug('Ai coordinates have been added to the Ai hitlog')
+        game.events.publish('shot', {'by': 'ai', 'shot': ai_coords, 'hit': ai_hit_register})
+        if ai_sunk is not None:
+            game.events.publish('sink', {'by': 'ai', 'ship': ai_sunk})
+            # Tells the subscribed clients about the turn
+
+    if ai_hit_register:
+        # Checks if the ai has hit one the player's ships
+        game.lastco_ord = ai_coords
+        game.ship_detected = True
+        game.shiphit = True
+        game.open_hits += 1
+        if live:
+            logging.debug('Ai has hit a player ship')
+    else:
+        game.shiphit = False
+        if live:
+            logging.debug('Ai bot misses')
+    if ai_sunk is not None:
+        game.open_hits -= game.player_ships.ship(ai_sunk).length
+        if game.open_hits <= 0:
+        # Stops targeting once every ship that the Ai has hit has sunk
+            game.ship_detected = False
+            game.shiphit = False
+            game.stackco_ords = []
+        if live:
+            logging.debug('Ai has sunk a player ship')
+
+    finished = None
+    if game.ai_ships.all_sunk():
+    # Checks if all the ai's ships have been sunk
+        finished = 'Game Over, Player Wins!'
+        if live:
+            logging.debug('Player has won the game')
+    elif game.player_ships.all_sunk():
+    # Checks if all the player's ships have been sunk
+        finished = 'Game Over, Player Loses!'
+        if live:
+            logging.debug('Ai Bot has won the game')
+    if finished is not None:
+        if live:
+            game.events.publish('finished', {'finished': finished})
+        game.events.close()
+        # A replayed game that is over is closed too, so that it is not restored
+        return {'hit': hit_register,
+                'AI_Turn': ai_coords,
+                'finished': finished}
+
+    if sunk is not None:
+        return {'hit': hit_register,
+                'AI_Turn': ai_coords,
+                'sunk': sunk}
+    return {'hit': hit_register,
+            'AI_Turn': ai_coords}
+
 @app.route('/attack', methods=['GET'])
 def process_attack():
     """Processes the player's attack and the AI's attack
     
     Description:
         "GET": Retrieves the coordinates of the attack from the position of the player's mouse 
-            and generates the Ai's attack; continues until either the player or the Ai
-            win the game
+            and generates the Ai's attack for the game of the player's session; continues
+            until either the player or the Ai win the game
     Args:
         No arguments
     Returns:
@@ -187,6 +562,13 @@ def process_attack():
     Responses:
         200:
             Description: The attack has been successfully registered
+        400:
+            Description: The coordinates are not whole numbers on the board
+        404:
+            Description: The player's session does not have a game in progress, either because
+                the root page was never loaded or because the game has been evicted
+        409:
+            Description: The game is already over, so no more turns can be played
         500: 
             Description: The function for did not return a valid response as the function
                 returned None, this is because the player clicked on a coordinate
@@ -194,92 +576,127 @@ def process_attack():
     """
 
     if request.method == 'GET':
-        global player_hitlog, ai_hitlog, lastco_ord, SHIP_DETECTED, stackco_ords, SHIPHIT
+        game = games.get(session.get('game_id'))
+        if game is None:
+        # Checks whether the player's session has a game in progress
+            logging.error('No game in progress for this session')
+            return jsonify({'message': 'No game in progress, reload the page to start a new game'}), 404
 
         logging.debug('Retrieving coordinates...')
         x = request.args.get('x')
         y = request.args.get('y')
         # Retrieves the x and y coordinates from the player's mouse on the root interface
-        coords = (x, y)
-        # Stores the x and y coordinates into a tuple
+        try:
+            coords = (int(x), int(y))
+            # Stores the x and y coordinates into a tuple
+        except (TypeError, ValueError):
+            return jsonify({'message': 'x and y must be whole numbers'}), 400
+        board_size = len(game.ai_board)
+        if not (0 <= coords[0] < board_size and 0 <= coords[1] < board_size):
+            return jsonify({'message': 'The coordinates must be within the board'}), 400
         logging.debug('Coordinates received!')
 
-        ship_detection = [SHIP_DETECTED, SHIPHIT, lastco_ord, stackco_ords]
-        # Packs the ship_detection variables
-        logging.debug('Generating Ai coordinates...')
-        if AI_ALGORITHM == 'simple' or SHIP_DETECTED is False:
-        # Checks if the Ai uses a simple algorithm or whether the ai is not tracking a ship
-            ai_coords = generate_attack('simple', ship_detection,
-                                        ai_hitlog, board_size=10)
-        else:
-            ai_coords, stackco_ords = generate_attack(AI_ALGORITHM, ship_detection,
-                                                    ai_hitlog, board_size=10)
+        with game.lock:
+        # Only one turn can be played on a game at a time
+            if game.finished():
+                return jsonify({'message': 'The game is over, reload the page to start a new game'}), 409
+            result = play_turn(game, coords)
+            journal_turn(session.get('game_id'), game, coords, result)
+            return jsonify(result)
 
-        while ai_coords in ai_hitlog:
-        # Repeats the function until the algorithm generates a new and unique coordinate
-        # that has not been shot
+@app.route('/attack/salvo', methods=['POST'])
+def process_salvo():
+    """Processes a salvo of the player's attacks in a single request
 
-            if AI_ALGORITHM == 'simple' or SHIP_DETECTED is False:
-                ai_coords = generate_attack('simple', ship_detection,
-                                            ai_hitlog, board_size=10)
-            else:
-                ai_coords, stackco_ords = generate_attack(AI_ALGORITHM, ship_detection,
-                                                        ai_hitlog, board_size=10)
-
-        logging.debug('Ai coordinates successfuly generated!')
-        if stackco_ords == []:
-        # Checks if there are no more coordinates in the stack and therefore
-        # no longer tracking
-            SHIP_DETECTED = False
-
-        if coords not in player_hitlog:
-        # Checks if the player's chosen coordinate is not in the player's hitlog
-            hit_register = attack(coords, ai_board, ai_ships)
-            # Initiates the attack on the Ai's board
-            if hit_register:
-                logging.debug('Player has hit an Ai ship')
-            else:
-                logging.debug('Player misses')
-            player_hitlog.append(coords)
-            # Adds the coordinate to the player's hitlog
-            logging.debug('Coordinates have been added to players hitlog')
-
-            ai_hit_register = attack(ai_coords, player_board, player_ships)
-            # Initiates the attack on the player's board
-            ai_hitlog.append(ai_coords)
-            #Adds the coordinate to the Ai's hitlog
-            logging.debug('Ai coordinates have been added to the Ai hitlog')
-
-            if ai_hit_register:
-                # Checks if the ai has hit one the player's ships
-                lastco_ord = ai_coords
-                SHIP_DETECTED = True
-                SHIPHIT = True
-                logging.debug('Ai has hit a player ship')
-            else:
-                SHIPHIT = False
-                logging.debug('Ai bot misses')
-
-            if all(ships == 0 for ships in ai_ships.values()):
-            # Checks if all the ai's ships have been sunk
-                logging.debug('Player has won the game')
-                return jsonify({'hit': hit_register,
-                                'AI_Turn': ai_coords,
-                                'finished': 'Game Over, Player Wins!'})
-
-            if all(ships == 0 for ships in player_ships.values()):
-            # Checks if all the player's ships have been sunk
-                logging.debug('Ai Bot has won the game')
-                return jsonify({'hit': hit_register,
-                                'AI_Turn': ai_coords,
-                                'finished': 'Game Over, Player Loses!'})
-
-            return jsonify({'hit': hit_register,
-                            'AI_Turn': ai_coords})
+    Description:
+        "POST": Receives a json body of the form {"shots": [[x, y], ...]} and plays a
+            turn for each shot in order, each with the Ai's reply, stopping once the
+            game is over. A shot at a coordinate that has already been shot is reported
+            in the results and skipped, rather than failing the whole salvo
+    Args:
+        No arguments
+    Returns:
+        jsonify(): Function that displays a message on the flask interface
+    Responses:
+        200:
+            Description: The salvo has been played; 'results' holds the outcome of each
+                shot that was played and 'finished' is set once the game is over
+        400:
+            Description: The body is not an object holding a list of integer coordinates
+                on the board, or it holds more shots than the board has cells
+        404:
+            Description: The player's session does not have a game in progress
+        409:
+            Description: The game is already over, so no more turns can be played
+    """
 
-        logging.error('Repeated coordinate has been shot again')
-        raise TypeError('Player clicked on a square that is already hit')
+    game = games.get(session.get('game_id'))
+    if game is None:
+        logging.error('No game in progress for this session')
+        return jsonify({'message': 'No game in progress, reload the page to start a new game'}), 404
+
+    data = request.get_json(silent=True)
+    shots = data.get('shots', []) if isinstance(data, dict) else None
+    if not isinstance(shots, list):
+        return jsonify({'message': 'The body must be an object with a list of shots'}), 400
+    board_size = len(game.ai_board)
+    if len(shots) > board_size * board_size:
+        return jsonify({'message': f'A salvo holds at most {board_size * board_size} shots'}), 400
+        # No game needs more shots than there are cells, and the game is locked throughout
+    try:
+        shots = [(int(x), int(y)) for x, y in shots]
+        # Checks that every shot is a pair of whole numbers
+    except (TypeError, ValueError):
+        return jsonify({'message': 'shots must be a list of [x, y] coordinates'}), 400
+    if not all(0 <= x < board_size and 0 <= y < board_size for x, y in shots):
+        return jsonify({'message': 'shots must be within the board'}), 400
+
+    results = []
+    with game.lock:
+    # The whole salvo is played as one uninterrupted run of turns
+        if game.finished():
+            return jsonify({'message': 'The game is over, reload the page to start a new game'}), 409
+        for coords in shots:
+            if coords in game.player_hitlog:
+                results.append({'shot': coords, 'error': 'Coordinate has already been shot'})
+                continue
+            result = play_turn(game, coords)
+            journal_turn(session.get('game_id'), game, coords, result)
+            result['shot'] = coords
+            results.append(result)
+            if 'finished' in result:
+                logging.debug('Salvo stopped as the game is over')
+                return jsonify({'results': results, 'finished': result['finished']})
+    return jsonify({'results': results})
+
+
+@app.route('/events', methods=['GET'])
+def game_events():
+    """Streams the events of a game to the client as Server-Sent Events
+
+    Description:
+        "GET": Subscribes to the game of the player's session, or to the game given by the
+            'game' argument for spectators, and streams each shot, sunk ship and the end of
+            the game as they happen. A reconnecting client carries on from the
+            'Last-Event-ID' header that the browser sends
+    Args:
+        No arguments
+    Returns:
+        Response(): The 'text/event-stream' response, which ends when the game is over
+    Responses:
+        200: The client has subscribed to the game's events
+        404: There is no game in progress to subscribe to
+    """
 
+    game = games.get(request.args.get('game') or session.get('game_id'))
+    if game is None:
+        return jsonify({'message': 'No game in progress'}), 404
+    try:
+        last_id = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        last_id = 0
+    return Response(stream(game.events, last_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/difficulty:normal')
 def normal_difficulty():
@@ -287,15 +704,15 @@ def normal_difficulty():
     
     Description:
         Calls the ai algorithm and resets it back to using the simple algorithm
-        at normal difficulty
+        at normal difficulty for the player's session
     Args:
         No arguments
     Returns:
         redirect(url_for('root')): Brings the user back to the main template of the game
     """
 
-    global AI_ALGORITHM
-    AI_ALGORITHM = 'simple'
+    session['algorithm'] = 'simple'
+    journal_record('difficulty', session.get('game_id'), data={'algorithm': 'simple'})
     logging.info('Difficulty has been switched to normal')
     return redirect(url_for('root'))
 
@@ -305,15 +722,16 @@ def huntdifficulty():
     
     Description:
         Calls the Ai algorithm and changes the difficulty of the Ai to hunt & target difficulty
+        for the player's session
     Args:
         No arguments
     Returns:
         redirect(url_for('root')): Brings the user back to the main template of the game
     """
 
-    global AI_ALGORITHM
     logging.info('Difficulty has been switched to hunt & target difficulty')
-    AI_ALGORITHM = 'hunt&target'
+    session['algorithm'] = 'hunt&target'
+    journal_record('difficulty', session.get('game_id'), data={'algorithm': 'hunt&target'})
     return redirect(url_for('root'))
 
 @app.route('/difficulty:parity')
@@ -322,16 +740,232 @@ def paritydifficulty():
     
     Description:
         Calls the Ai algorithm and changes the difficulty of the Ai to parity difficulty
+        for the player's session
     Args:
         No arguments
     Returns:
         redirect(url_for('root')): Brings the user back to the main template of the game
     """
 
-    global AI_ALGORITHM
-    AI_ALGORITHM = "parity"
+    session['algorithm'] = "parity"
+    journal_record('difficulty', session.get('game_id'), data={'algorithm': "parity"})
     logging.info('Difficulty has been switched to parity difficulty')
     return redirect(url_for('root'))
 
+@app.route('/difficulty:probability')
+def probabilitydifficulty():
+    """Changes the Ai difficulty to probability density mode difficulty
+    
+    Description:
+        Calls the Ai algorithm and changes the difficulty of the Ai to probability density
+        difficulty for the player's session
+    Args:
+        No arguments
+    Returns:
+        redirect(url_for('root')): Brings the user back to the main template of the game
+    """
+
+    session['algorithm'] = 'probability'
+    journal_record('difficulty', session.get('game_id'), data={'algorithm': 'probability'})
+    logging.info('Difficulty has been switched to probability density difficulty')
+    return redirect(url_for('root'))
+
+@app.route('/difficulty:montecarlo')
+def montecarlodifficulty():
+    """Changes the Ai difficulty to Monte Carlo mode difficulty
+    
+    Description:
+        Calls the Ai algorithm and changes the difficulty of the Ai to Monte Carlo
+        difficulty for the player's session
+    Args:
+        No arguments
+    Returns:
+        redirect(url_for('root')): Brings the user back to the main template of the game
+    """
+
+    session['algorithm'] = 'montecarlo'
+    journal_record('difficulty', session.get('game_id'), data={'algorithm': 'montecarlo'})
+    logging.info('Difficulty has been switched to Monte Carlo difficulty')
+    return redirect(url_for('root'))
+
+@app.route('/difficulty:endgame')
+def endgamedifficulty():
+    """Changes the Ai difficulty to endgame mode difficulty
+    
+    Description:
+        Calls the Ai algorithm and changes the difficulty of the Ai to endgame
+        difficulty for the player's session
+    Args:
+        No arguments
+    Returns:
+        redirect(url_for('root')): Brings the user back to the main template of the game
+    """
+
+    session['algorithm'] = 'endgame'
+    journal_record('difficulty', session.get('game_id'), data={'algorithm': 'endgame'})
+    logging.info('Difficulty has been switched to endgame difficulty')
+    return redirect(url_for('root'))
+
+def encode_game(game):
+    """Encodes a game in the form kept by the journal and its snapshots
+
+    Description:
+        The caller must hold the game's lock. Only the placements that the game started
+        with, the turns played and the Ai's tracking variables are kept; everything else
+        is rebuilt by playing the turns again.
+
+    Args:
+        game (GameState): The game to encode
+    Returns:
+        dict: The json form of the game
+    """
+
+    return {**game.placements,
+            'algorithm': game.algorithm,
+            'turns': [[*coords, *ai_coords] for coords, ai_coords in game.turns],
+            'tracking': game.ship_detection()}
+
+def restore_tracking(game, tracking):
+    """Sets the Ai's tracking variables of a game from the form kept by the journal
+
+    Args:
+        game (GameState): The game being restored
+        tracking (list): The ship_detected, shiphit, lastco_ord and stackco_ords values
+    Returns:
+        Returns nothing
+    """
+
+    game.ship_detected, game.shiphit, lastco_ord, stackco_ords = tracking
+    game.lastco_ord = tuple(lastco_ord)
+    game.stackco_ords = [tuple(co_ord) for co_ord in stackco_ords]
+
+def rebuild_game(data):
+    """Rebuilds a game from the form kept by the journal and its snapshots
+
+    Args:
+        data (dict): The json form of the game made by 'encode_game'
+    Returns:
+        GameState: The game with every turn played again
+    """
+
+    boards = []
+    for cells in (data['player_cells'], data['ai_cells']):
+        board = initialise_board(data['size'])
+        for ship, positions in cells.items():
+            for x, y in positions:
+                board[y][x] = ship
+        boards.append(board)
+    game = GameState(boards[0], dict(data['player_ships']), boards[1],
+                     dict(data['ai_ships']), data['algorithm'])
+    for x, y, ai_x, ai_y in data['turns']:
+        apply_turn(game, (x, y), (ai_x, ai_y), replay=True)
+    restore_tracking(game, data['tracking'])
+    return game
+
+def journal_record(record_type, game_id, game = None, data = None):
+    """Adds a record to the journal, if the games are being journaled
+
+    Args:
+        record_type (str): The type of the record: 'create', 'turn' or 'difficulty'
+        game_id (str): The id of the session that owns the game
+        game (GameState): The game the record changes, whose lock the caller holds
+        data (dict): The rest of the record
+    Returns:
+        Returns nothing
+    """
+
+    if journal is None:
+        return
+    seq = journal.record(record_type, game_id, data)
+    if game is not None:
+        game.journal_seq = seq
+
+def journal_turn(game_id, game, coords, result):
+    """Adds a turn that has just been played to the journal
+
+    Args:
+        game_id (str): The id of the session that owns the game
+        game (GameState): The game the turn was played on
+        coords (tuple(int, int)): The coordinates of the player's attack
+        result (dict): The result of the turn returned by 'play_turn'
+    Returns:
+        Returns nothing
+    """
+
+    journal_record('turn', game_id, game, {'player': coords, 'ai': result['AI_Turn'],
+                                           'tracking': game.ship_detection()})
+
+def encoded_games():
+    """Encodes every live game for a snapshot of the journal
+
+    Args:
+        No arguments
+    Returns:
+        generator(tuple(str, dict)): The id of each game and its json form, along with the
+            position of its last record in the journal and when it was last used
+    """
+
+    for game_id, game in games.items():
+        with game.lock:
+            if game.events.closed:
+            # A game that is over has nothing left to restore
+                continue
+            last_used = time.time() - (time.monotonic() - game.last_access)
+            yield game_id, {'seq': game.journal_seq, 'time': last_used, **encode_game(game)}
+
+def restore_games():
+    """Restores the live games from the latest snapshot and the tail of the journal
+
+    Args:
+        No arguments
+    Returns:
+        int: The number of games restored
+    """
+
+    snapshot, records = journal.load()
+    restored = {game_id: rebuild_game(data) for game_id, data in snapshot.items()}
+    last_used = {game_id: data['time'] for game_id, data in snapshot.items()}
+    for record in records:
+        game_id = record['game']
+        if record['type'] == 'create':
+            restored[game_id] = rebuild_game(record)
+        elif record['type'] == 'turn' and game_id in restored:
+            apply_turn(restored[game_id], tuple(record['player']), tuple(record['ai']),
+                       replay=True)
+            restore_tracking(restored[game_id], record['tracking'])
+        # The difficulty is kept in the session cookie, so its records need no replaying
+        if game_id in restored:
+            restored[game_id].journal_seq = record['seq']
+            last_used[game_id] = record['time']
+
+    now = time.time()
+    count = 0
+    for game_id in sorted(restored, key=last_used.get):
+    # Stored from the least recently used, so the store evicts them in the same order
+        game = restored[game_id]
+        idle = now - last_used[game_id]
+        if game.events.closed or idle > games.ttl:
+            continue
+        games.put(game_id, game)
+        game.last_access = time.monotonic() - idle
+        count += 1
+    logging.info('Restored %s games from the journal', count)
+    journal.snapshot(encoded_games)
+    # Folds the replayed journal into a new snapshot straight away
+    return count
+
+if os.environ.get('BATTLESHIPS_JOURNAL_DIR'):
+    journal = Journal(os.environ['BATTLESHIPS_JOURNAL_DIR'],
+                      float(os.environ.get('BATTLESHIPS_JOURNAL_FSYNC', FSYNC_INTERVAL)),
+                      float(os.environ.get('BATTLESHIPS_JOURNAL_SNAPSHOT', SNAPSHOT_INTERVAL)))
+    restore_games()
+    journal.start(encoded_games)
+    atexit.register(journal.close)
+    # Writes out the records still pending when the server stops
+
+if os.environ.get('BATTLESHIPS_OPENING_BOOK'):
+    load_book(os.environ['BATTLESHIPS_OPENING_BOOK'])
+    # Maps the Ai's opening book, so its first moves are not computed
+
 if __name__ == '__main__':
     app.run()
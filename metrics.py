@@ -0,0 +1,245 @@
+"""Counters and latency histograms exported in the Prometheus text format
+
+This module collects the metrics of the running game, such as how long each route
+and each Ai decision takes, and renders them in the text format that Prometheus
+scrapes. Recording a value only takes a lock and a few additions, with the bucket of
+a histogram found by a binary search, so the metrics can be left on in production;
+all of the formatting is done when the metrics are scraped.
+
+Attributes
+----------
+LATENCY_BUCKETS : tuple(float)
+    The default upper bounds, in seconds, of the buckets of a latency histogram
+registry : Registry
+    The metrics of the process, rendered by the '/metrics' route
+"""
+
+
+import bisect
+import threading
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+def format_labels(names, values, extra = ''):
+    """Formats the labels of a sample, such as '{route="/attack"}'
+
+    Args:
+        names (tuple(str)): The names of the labels
+        values (tuple(str)): The value of each label
+        extra (str): An extra label that is already formatted, such as 'le="0.5"'
+    Returns:
+        str: The formatted labels, or an empty string if there are none
+    """
+
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def escape(value):
+    """Escapes a label value for the text format
+
+    Args:
+        value: The value of the label
+    Returns:
+        str: The value with backslashes, quotes and newlines escaped
+    """
+
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Counter:
+    """A count that only goes up, kept separately for each set of label values
+
+    Attributes:
+        name (str): The name of the metric
+        documentation (str): The help text of the metric
+        labels (tuple(str)): The names of the labels
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels = (), amount = 1):
+        """Adds to the count for a set of label values
+
+        Args:
+            labels (tuple(str)): The value of each label
+            amount (float): The amount added to the count
+        Returns:
+            Returns nothing
+        """
+
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels = ()):
+        """Gets the count for a set of label values
+
+        Args:
+            labels (tuple(str)): The value of each label
+        Returns:
+            float: The count, which is 0 if nothing has been counted
+        """
+
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        """Lists the lines of the metric in the text format
+
+        Args:
+            No arguments
+        Returns:
+            list[str]: A line for each set of label values
+        """
+
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{format_labels(self.labels, labels)} {value}'
+                for labels, value in values]
+
+class Gauge:
+    """A value that is read from a function each time the metrics are scraped
+
+    Attributes:
+        name (str): The name of the metric
+        documentation (str): The help text of the metric
+        function (function): The function, with no arguments, that returns the value
+        kind (str): 'gauge', or 'counter' for a count that is kept elsewhere
+    """
+
+    def __init__(self, name, documentation, function, kind = 'gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.kind = kind
+
+    def samples(self):
+        """Lists the line of the metric in the text format
+
+        Args:
+            No arguments
+        Returns:
+            list[str]: The single line holding the current value
+        """
+
+        return [f'{self.name} {self.function()}']
+
+class Histogram:
+    """The distribution of observed values, kept separately for each set of label values
+
+    Attributes:
+        name (str): The name of the metric
+        documentation (str): The help text of the metric
+        labels (tuple(str)): The names of the labels
+        buckets (tuple(float)): The upper bounds of the buckets, in increasing order
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels = (), buckets = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels = ()):
+        """Records a value in its bucket
+
+        Args:
+            value (float): The observed value, such as a latency in seconds
+            labels (tuple(str)): The value of each label
+        Returns:
+            Returns nothing
+        """
+
+        index = bisect.bisect_left(self.buckets, value)
+        # The first bucket whose upper bound is at least the value; the last slot is +Inf
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, labels = ()):
+        """Gets the number of values observed for a set of label values
+
+        Args:
+            labels (tuple(str)): The value of each label
+        Returns:
+            int: The number of observed values
+        """
+
+        entry = self._values.get(labels)
+        return entry[2] if entry else 0
+
+    def samples(self):
+        """Lists the lines of the metric in the text format
+
+        Args:
+            No arguments
+        Returns:
+            list[str]: The cumulative buckets, the sum and the count of each set of labels
+        """
+
+        with self._lock:
+            values = sorted((labels, (list(entry[0]), entry[1], entry[2]))
+                            for labels, entry in self._values.items())
+        lines = []
+        bounds = [repr(bound) for bound in self.buckets] + ['+Inf']
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket in zip(bounds, counts):
+                cumulative += bucket
+                le = f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{format_labels(self.labels, labels, le)} '
+                             f'{cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(self.labels, labels)} {total}')
+            lines.append(f'{self.name}_count{format_labels(self.labels, labels)} {count}')
+        return lines
+
+class Registry:
+    """The metrics of the process, in the order they are rendered"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        """Adds a metric to the registry
+
+        Args:
+            metric (Counter, Gauge or Histogram): The metric to add
+        Returns:
+            The same metric, so it can be created and registered in one line
+        """
+
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Renders every metric in the Prometheus text format
+
+        Args:
+            No arguments
+        Returns:
+            str: The text scraped from the '/metrics' route
+        """
+
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
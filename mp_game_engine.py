@@ -11,17 +11,25 @@ Attributes
 players : (dict{str : (list[list]), dict{str : int}})
     This module_level stores the names for the player and the Ai bot, as
     well as the board and the battleships for each player
+ALGORITHMS : tuple(str)
+    The names of all the algorithms that 'generate_attack' can use
 """
 
 
 import random
+import time
 from components import initialise_board, create_battleships, place_battleships, display_board
+from fleet import Fleet
 from game_engine import attack, cli_coordinates_input
-from battleships_ai import hunt_and_target_ai, parity_ai
+from opening_book import book_move
+from battleships_ai import (hunt_and_target_ai, parity_ai, probability_density_ai,
+                            monte_carlo_ai, endgame_ai, AI_STATES, CellPool)
 
 players = {}
+ALGORITHMS = ('simple', 'hunt&target', 'parity', 'probability', 'montecarlo', 'endgame')
 
-def generate_attack(algorithm = '', ship_detection = None, ai_hitlog = None, board_size = None):
+def generate_attack(algorithm = '', ship_detection = None, ai_hitlog = None, board_size = None,
+                    ai_state = None, cell_pool = None, battleships = None):
     """Randomly generates an attack for the AI
     
     Args:
@@ -34,6 +42,13 @@ def generate_attack(algorithm = '', ship_detection = None, ai_hitlog = None, boa
         ai_hitlog (list[tuple(int, int)]): A log of all the coordinates that the Ai has hit 
             on the player's board
         board_size (int): The size of the player's board
+        ai_state (ProbabilityDensity, MonteCarloTargeting or EndgameTargeting): The Ai's state
+            of the player's board, used by the probability, montecarlo and endgame algorithms
+        cell_pool (CellPool): The cells that the Ai has not shot yet; when given, the random
+            coordinates are drawn from it so they are never repeated; the hunt&target and
+            parity algorithms hunt from it when no 'ship_detection' is given
+        battleships (dict[str:int] or Fleet): The player's surviving ships, used by the
+            probability, montecarlo and endgame algorithms when there is no 'ai_state'
 
     Returns:
         hunt_and_target_ai (ship_detection, ai_hitlog, board_size): A function that generates 
@@ -42,27 +57,151 @@ def generate_attack(algorithm = '', ship_detection = None, ai_hitlog = None, boa
         parity_ai (ship_detection, ai_hitlog, board_size): A function that generates specified
             coordinates that is determined by whether the Ai has hit a player's ship, otherwise it
             will generate a random coordinate based on the checkerboard method
-        coordinates (tuple(int, int)): The coordinates of the attack that is randomly generated
+        probability_density_ai (ai_state, ai_hitlog, board_size): A function that generates the
+            coordinate covered by the most placements of the player's surviving ships
+        monte_carlo_ai (ai_state, ai_hitlog, board_size): A function that generates the
+            coordinate covered by the most sampled layouts of the player's surviving ships
+        endgame_ai (ai_state, ai_hitlog, board_size): A function that generates the coordinate
+            of the probability density until few layouts of the surviving ships are left, and
+            then the coordinate that sinks them in the fewest expected shots
+        coordinates (tuple(int, int)): The coordinates of the attack that is randomly generated,
+            or the move from the opening book when the Ai's position is in it
     """
 
+    if ai_state is not None:
+        move = book_move(algorithm, ai_state)
+        if move is not None:
+            return move
+            # The move of a position in the opening book is taken without computing it
+
     if algorithm == 'simple':
         # Checks if the Ai is using a simple algorithm
+        if cell_pool is not None:
+            return cell_pool.sample()
+            # Draws the random coordinate from the cells that have not been shot
         coordinates = (random.randrange(0, board_size), random.randrange(0, board_size))
         # Generates a random coordinate
         return tuple(coordinates)
 
     if algorithm == 'hunt&target':
         # Checks if the Ai is using a hunt&target algorithm
+        if ship_detection is None and cell_pool is not None:
+            return cell_pool.sample()
+            # Hunts on a random cell that has not been shot while no ship is being tracked
         return hunt_and_target_ai(ship_detection, ai_hitlog, board_size)
 
     if algorithm == 'parity':
         # Checks if the Ai is using a parity algorithm
+        if ship_detection is None and cell_pool is not None:
+            return cell_pool.sample_checkerboard()
+            # Hunts on the checkerboard cells that have not been shot while no ship is
+            # being tracked
         return parity_ai(ship_detection, ai_hitlog, board_size)
 
-    coordinates = (random.randrange(0, 10), random.randrange(0, 10))
+    if algorithm == 'probability':
+        # Checks if the Ai is using a probability density algorithm
+        return probability_density_ai(ai_state, ai_hitlog, board_size, battleships)
+
+    if algorithm == 'montecarlo':
+        # Checks if the Ai is using a Monte Carlo algorithm
+        return monte_carlo_ai(ai_state, ai_hitlog, board_size, battleships)
+
+    if algorithm == 'endgame':
+        # Checks if the Ai is using the exact endgame algorithm
+        return endgame_ai(ai_state, ai_hitlog, board_size, battleships)
+
+    board_size = board_size or 10
+    coordinates = (random.randrange(0, board_size), random.randrange(0, board_size))
     # Default board size with random coordinates
     return tuple(coordinates)
 
+def headless_ai_game(algorithm, board, battleships, board_size = 10, clock = time.perf_counter,
+                     shot_log = None, cache = None):
+    """Plays the Ai against a fleet until every ship has sunk, without any display or input
+
+    Description:
+        Drives 'generate_attack' in the same way as the web interface: the hunt & target and
+        parity algorithms track a ship from their stack of neighbours, and otherwise hunt
+        from the pool of cells that have not been shot, the parity algorithm only on the
+        checkerboard cells.
+
+    Args:
+        algorithm (str): The algorithm used by the Ai
+        board (list[list], BitBoard or SparseBoard): The board holding the fleet that is attacked
+        battleships (dict[str:int] or Fleet): The ships on the board and their remaining
+            hitpoints; a dictionary is copied into a fleet and left unchanged
+        board_size (int): The size of the board
+        clock (function): The clock used to time each of the Ai's decisions
+        shot_log (list): When given, the coordinates and the result of each shot are
+            appended to it in the order they were taken
+        cache (TranspositionCache): The cache of the Monte Carlo Ai's moves, the one shared
+            by the whole process if not given
+    Returns:
+        shots (int): The number of shots the Ai took to sink the fleet
+        decision_times (list[float]): The time taken by 'generate_attack' for each shot
+    """
+
+    fleet = battleships if isinstance(battleships, Fleet) else Fleet(battleships)
+    hitlog = set()
+    pool = CellPool(board_size)
+    ship_detected, shiphit, lastco_ord, stackco_ords = False, False, (), []
+    open_hits = 0
+    density = None
+    ship_cells = {}
+    if algorithm in AI_STATES:
+        options = {'cache': cache} if algorithm == 'montecarlo' and cache is not None else {}
+        density = AI_STATES[algorithm](board_size, fleet, **options)
+        cells = board if isinstance(board, list) else board.to_list()
+        for y, row in enumerate(cells):
+            for x, ship in enumerate(row):
+                if ship is not None:
+                    ship_cells.setdefault(ship, []).append((x, y))
+        # The cells of each ship are kept to tell the Ai which cells a sunk ship covered
+
+    decision_times = []
+    while not fleet.all_sunk() and len(hitlog) < board_size * board_size:
+    # Stops once every cell is shot, in case a ship was placed over another ship
+        start = clock()
+        if density is not None:
+            co_ord = generate_attack(algorithm, None, hitlog, board_size, ai_state=density)
+        else:
+            co_ord = None
+            while co_ord not in pool:
+            # Pops the stack until it gives a cell that has not been shot, drawing from
+            # the pool of remaining cells once the Ai is no longer tracking a ship
+                if algorithm != 'simple' and ship_detected and (shiphit or stackco_ords):
+                    co_ord, stackco_ords = generate_attack(algorithm,
+                                                           [ship_detected, shiphit,
+                                                            lastco_ord, stackco_ords],
+                                                           hitlog, board_size)
+                    shiphit = False
+                    # The neighbours of the last hit are only added to the stack once
+                else:
+                    co_ord = generate_attack(algorithm, None, hitlog, board_size, cell_pool=pool)
+            if stackco_ords == []:
+                ship_detected = False
+        decision_times.append(clock() - start)
+
+        hitlog.add(co_ord)
+        pool.remove(co_ord)
+        hit_register = attack(co_ord, board, fleet)
+        if shot_log is not None:
+            shot_log.append((co_ord, hit_register))
+        if hit_register:
+            lastco_ord, ship_detected, shiphit = co_ord, True, True
+            open_hits += 1
+        else:
+            shiphit = False
+        sunk = fleet.last_sunk
+        if sunk is not None:
+            open_hits -= fleet.ship(sunk).length
+            if open_hits <= 0:
+                ship_detected, shiphit, stackco_ords = False, False, []
+                # Stops targeting once every ship that has been hit has sunk
+        if density is not None:
+            density.record_shot(co_ord, hit_register, sunk, ship_cells.get(sunk))
+    return len(hitlog), decision_times
+
 def ai_opponent_game_loop():
     """Loops the game for the AI opponent until the game finishes
     
@@ -75,7 +214,7 @@ def ai_opponent_game_loop():
     print('Welcome to battleships')
     player_board = initialise_board(10)
     # Initialises the player's board
-    player_ships = create_battleships('battleships.txt')
+    player_ships = Fleet(create_battleships('battleships.txt'))
     # Creates the player's ships
     player_board = place_battleships(player_board, player_ships, 'custom')
     players['Player'] = (player_board, player_ships)
@@ -83,7 +222,7 @@ def ai_opponent_game_loop():
 
     ai_board = initialise_board(10)
     # Initialises the AI's board
-    ai_ships = create_battleships('battleships.txt')
+    ai_ships = Fleet(create_battleships('battleships.txt'))
     # Creates the AI's ships
     ai_board = place_battleships(ai_board, ai_ships, 'random')
     players['AI Bot'] = (ai_board, ai_ships)
@@ -109,7 +248,7 @@ def ai_opponent_game_loop():
             else:
                 print('Miss')
 
-            if all(ships == 0 for ships in players['AI Bot'][1].values()):
+            if players['AI Bot'][1].all_sunk():
                 # Game ends when all the AI ships have been sunk
                 game_finished = True
                 print(f'Game Over, {list(players.keys())[0]} WINS!!!') #Display player name
@@ -128,7 +267,7 @@ def ai_opponent_game_loop():
             else:
                 print('Miss')
 
-            if all(ships == 0 for ships in players['Player'][1].values()):
+            if players['Player'][1].all_sunk():
                 # Game ends when all the player's ships have been sunk
                 game_finished = True
                 print(f'Game Over, {list(players.keys())[0]} LOSES!!!')
@@ -0,0 +1,250 @@
+"""Opening book of the Ai's first moves, built offline and memory-mapped at run time
+
+The first moves of a deterministic Ai on an empty board, and its replies to the hits
+and misses that commonly follow, are the same in every game. This module plays an
+algorithm against many seeded fleets ahead of time, keeps the move that it chose in
+each position that came up often enough, and writes them to a compact file. At run
+time the file is memory-mapped rather than read, so the book costs nothing to load
+and its pages are shared by every process that maps it, and 'generate_attack' looks
+a position up in it before computing anything.
+
+A position is identified by the Zobrist hash of the Ai's shots (see 'zobrist'),
+XORed with a salt of the algorithm, the board size and the lengths of the surviving
+ships. The file starts with BOOK_HEADER and then holds one BOOK_RECORD for each
+position, sorted by its key, so a position is found by a binary search of the map.
+
+Attributes
+----------
+BOOK_MAGIC : bytes
+    The bytes at the start of every opening book
+BOOK_HEADER : struct.Struct
+    The layout of the header: the magic bytes and the number of records
+BOOK_RECORD : struct.Struct
+    The layout of each record: the key of the position and the x and y coordinates
+    of the move
+BOOK_DEPTH : int
+    The default number of moves of each game that are added to the book
+BOOK_MIN_COUNT : int
+    The default number of games a position must come up in to be added to the book
+book : OpeningBook
+    The book consulted by 'generate_attack', or None if no book has been loaded
+"""
+
+
+import argparse
+import functools
+import hashlib
+import mmap
+import random
+import struct
+from battleships_ai import AI_STATES
+from components import create_battleships, seeded_fleet
+from fleet import Fleet
+from game_engine import attack
+from game_store import ship_cells
+
+BOOK_MAGIC = b'BSBOOK01'
+BOOK_HEADER = struct.Struct('<8sI')
+BOOK_RECORD = struct.Struct('<QHH')
+BOOK_DEPTH = 8
+BOOK_MIN_COUNT = 2
+
+book = None
+
+@functools.lru_cache(maxsize=256)
+def book_salt(algorithm, board_size, lengths):
+    """Gets the salt that is XORed into the hash of a position
+
+    Args:
+        algorithm (str): The algorithm that chose the move
+        board_size (int): The width and height of the board
+        lengths (tuple(int)): The sorted lengths of the surviving ships
+    Returns:
+        int: A 64 bit salt that is the same in every process
+    """
+
+    text = f'{algorithm}:{board_size}:{",".join(map(str, lengths))}'.encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(text, digest_size=8).digest(), 'little')
+
+def position_key(algorithm, ai_state):
+    """Finds the key of the position that an Ai's state is in
+
+    Args:
+        algorithm (str): The algorithm that uses the state
+        ai_state (ProbabilityDensity or MonteCarloTargeting): The Ai's state of the board
+    Returns:
+        int: The key of the position, or None if the state does not keep a hash
+    """
+
+    zobrist = getattr(ai_state, 'zobrist', None)
+    if zobrist is None:
+        return None
+    lengths = tuple(sorted(ai_state.ships.values()))
+    return book_salt(algorithm, ai_state.board_size, lengths) ^ zobrist.value
+
+class OpeningBook:
+    """A memory-mapped opening book
+
+    Attributes:
+        filename (str): The path of the book
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = BOOK_HEADER.unpack_from(self._map, 0)
+        if magic != BOOK_MAGIC:
+            self._map.close()
+            raise ValueError(f'{filename} is not an opening book')
+
+    def __len__(self):
+        return self._count
+
+    def lookup(self, key):
+        """Finds the move for a position by a binary search of the records
+
+        Args:
+            key (int): The key of the position
+        Returns:
+            tuple(int, int): The move, or None if the position is not in the book
+        """
+
+        lo, hi = 0, self._count
+        while lo < hi:
+            middle = (lo + hi) // 2
+            record_key, x, y = BOOK_RECORD.unpack_from(
+                self._map, BOOK_HEADER.size + middle * BOOK_RECORD.size)
+            if record_key == key:
+                return x, y
+            if record_key < key:
+                lo = middle + 1
+            else:
+                hi = middle
+        return None
+
+    def close(self):
+        """Unmaps the book
+
+        Args:
+            No arguments
+        Returns:
+            Returns nothing
+        """
+
+        self._map.close()
+
+def load_book(filename):
+    """Maps a book as the one consulted by 'generate_attack'
+
+    Args:
+        filename (str): The path of the book, or None to stop using a book
+    Returns:
+        OpeningBook: The book that has been loaded, or None
+    """
+
+    global book
+    if book is not None:
+        book.close()
+    book = OpeningBook(filename) if filename else None
+    return book
+
+def book_move(algorithm, ai_state):
+    """Looks up the move of an Ai in the loaded book
+
+    Args:
+        algorithm (str): The algorithm that uses the state
+        ai_state (ProbabilityDensity or MonteCarloTargeting): The Ai's state of the board
+    Returns:
+        tuple(int, int): The move from the book, or None if there is no book, the position
+            is not in it or the move has already been shot
+    """
+
+    if book is None or ai_state is None:
+        return None
+    key = position_key(algorithm, ai_state)
+    if key is None:
+        return None
+    move = book.lookup(key)
+    if move is None or not ai_state.can_shoot(move):
+        return None
+    return move
+
+def write_book(filename, moves):
+    """Writes an opening book
+
+    Args:
+        filename (str): The path of the book
+        moves (dict{int : tuple(int, int)}): The move for the key of each position
+    Returns:
+        Returns nothing
+    """
+
+    with open(filename, 'wb') as file:
+        file.write(BOOK_HEADER.pack(BOOK_MAGIC, len(moves)))
+        file.write(b''.join(BOOK_RECORD.pack(key, x, y) for key, (x, y) in sorted(moves.items())))
+
+def build_book(algorithm, games, board_size = 10, depth = BOOK_DEPTH,
+               min_count = BOOK_MIN_COUNT, seed = 0, battleships = None):
+    """Plays an algorithm against seeded fleets and keeps its moves in the common positions
+
+    Args:
+        algorithm (str): An algorithm that keeps a state, such as 'probability'
+        games (int): The number of games to play
+        board_size (int): The size of the board
+        depth (int): The number of moves of each game that are kept
+        min_count (int): The number of games a position must come up in to be kept
+        seed (int): The seed of the first fleet; the following fleets use the next seeds
+        battleships (dict[str:int]): The ships of each fleet, read from 'battleships.txt'
+            if not given
+    Returns:
+        dict{int : tuple(int, int)}: The move most often chosen in each kept position
+    """
+
+    if battleships is None:
+        battleships = create_battleships('battleships.txt')
+    seen = {}
+    for game_seed in range(seed, seed + games):
+        board, ships = seeded_fleet(game_seed, battleships, board_size)
+        fleet = Fleet(ships)
+        cells = ship_cells(board.to_list())
+        random.seed(game_seed ^ 0x5EED)
+        state = AI_STATES[algorithm](board_size, fleet)
+        for _ in range(depth):
+            if fleet.all_sunk():
+                break
+            key = position_key(algorithm, state)
+            move = state.best_shot()
+            choices = seen.setdefault(key, {})
+            choices[move] = choices.get(move, 0) + 1
+            hit = attack(move, board, fleet)
+            state.record_shot(move, hit, fleet.last_sunk, cells.get(fleet.last_sunk))
+    return {key: max(choices, key=choices.get) for key, choices in seen.items()
+            if sum(choices.values()) >= min_count}
+
+def main(argv = None):
+    """Builds an opening book from the command line
+
+    Args:
+        argv (list[str]): The command line arguments, taken from sys.argv if not given
+    Returns:
+        Returns nothing
+    """
+
+    parser = argparse.ArgumentParser(description='Build an opening book for the battleships Ai')
+    parser.add_argument('output')
+    parser.add_argument('--algorithm', choices=sorted(AI_STATES), default='probability')
+    parser.add_argument('--games', type=int, default=2000)
+    parser.add_argument('--depth', type=int, default=BOOK_DEPTH)
+    parser.add_argument('--min-count', type=int, default=BOOK_MIN_COUNT)
+    parser.add_argument('--size', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    moves = build_book(args.algorithm, args.games, args.size, args.depth, args.min_count,
+                       args.seed)
+    write_book(args.output, moves)
+    print(f'{len(moves)} positions written to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,372 @@
+"""Compact move logs of battleships games and a replay engine for them
+
+This module records games in a compact binary move log and plays them back without
+any input, display or logging, so that games from the web interface can be
+reproduced for debugging and the Ai algorithms can be checked for regressions.
+
+A move log starts with the bytes in MOVE_LOG_MAGIC and then holds one record after
+another, each of them for one fleet being attacked until it sinks:
+    GAME_HEADER: the board size, the index of the algorithm in 'ALGORITHMS', the
+        number of ships, the seed of the random choices and the number of shots
+    SHIP, for each ship: the x and y coordinates of its first cell, whether it extends
+        downwards and its length, followed by its name
+    The shots: an unsigned 32-bit integer for each shot, holding the index of the cell
+        (y * board_size + x) shifted left by one, with the lowest bit set on a hit
+
+The records are read one at a time, so a log of any size is streamed in constant
+memory, and the shots of a record are read into an array in a single call.
+
+Attributes
+----------
+MOVE_LOG_MAGIC : bytes
+    The bytes at the start of every move log
+GAME_HEADER : struct.Struct
+    The layout of the header of each record
+SHIP : struct.Struct
+    The layout of each ship of a record, before the length of its name
+NO_SEED : int
+    The seed of a record whose random choices were not seeded, such as a game taken
+    from the journal of the web interface
+"""
+
+
+import argparse
+import json
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+from bitboard import BitBoard
+from components import create_battleships, new_board, seeded_fleet
+from game_engine import attack
+from game_journal import Journal
+from mp_game_engine import ALGORITHMS, headless_ai_game
+
+MOVE_LOG_MAGIC = b'BSMOVES1'
+GAME_HEADER = struct.Struct('<HBBQI')
+SHIP = struct.Struct('<HHBBB')
+NO_SEED = 0xFFFFFFFFFFFFFFFF
+
+class GameRecord:
+    """One fleet and the shots taken at it, as kept in a move log
+
+    Attributes:
+        board_size (int): The width and height of the board
+        algorithm (str): The algorithm that took the shots
+        seed (int): The seed of the Ai's random choices, or NO_SEED
+        ships (list[tuple(str, int, int, bool, int)]): The name, the x and y coordinates of
+            the first cell, whether it extends downwards and the length of each ship
+        shots (array): The packed cell and result of each shot
+    """
+
+    __slots__ = ('board_size', 'algorithm', 'seed', 'ships', 'shots')
+
+    def __init__(self, board_size, algorithm, seed, ships, shots):
+        self.board_size = board_size
+        self.algorithm = algorithm
+        self.seed = seed
+        self.ships = ships
+        self.shots = shots
+
+    def board(self):
+        """Builds the board holding the fleet of the record
+
+        Args:
+            No arguments
+        Returns:
+            board (BitBoard or SparseBoard): The board with every ship placed on it
+            battleships (dict[str:int]): The ships and their hitpoints
+        """
+
+        board = new_board(self.board_size)
+        battleships = {}
+        for name, x, y, vertical, length in self.ships:
+            if isinstance(board, BitBoard):
+                board.place(name, board.segment_mask(x, y, length, vertical))
+            else:
+                board.place(name, x, y, length, vertical)
+            battleships[name] = length
+        return board, battleships
+
+    def coordinates(self):
+        """Unpacks the coordinates and the result of each shot
+
+        Args:
+            No arguments
+        Returns:
+            list[tuple(tuple(int, int), bool)]: The coordinates and whether the shot hit
+        """
+
+        size = self.board_size
+        return [(((packed >> 1) % size, (packed >> 1) // size), bool(packed & 1))
+                for packed in self.shots]
+
+def fleet_positions(board):
+    """Lists the position of each ship on a board in the form kept by a move log
+
+    Args:
+        board (BitBoard or SparseBoard): The board holding the fleet
+    Returns:
+        list[tuple(str, int, int, bool, int)]: The name, the x and y coordinates of the
+            first cell, whether it extends downwards and the length of each ship
+    """
+
+    if not isinstance(board, BitBoard):
+        return board.positions()
+    ships = []
+    for name, mask in board.ship_masks.items():
+        first = (mask & -mask).bit_length() - 1
+        y, x = divmod(first, board.size)
+        vertical = bool(mask >> (first + board.size) & 1)
+        ships.append((name, x, y, vertical, bin(mask).count('1')))
+    return ships
+
+def write_game(file, board_size, algorithm, seed, ships, shots):
+    """Appends one record to a move log
+
+    Args:
+        file (file): The move log, opened for writing in binary mode
+        board_size (int): The width and height of the board
+        algorithm (str): The algorithm that took the shots
+        seed (int): The seed of the Ai's random choices, or NO_SEED
+        ships (list[tuple(str, int, int, bool, int)]): The position of each ship
+        shots (list[tuple(tuple(int, int), bool)]): The coordinates and result of each shot
+    Returns:
+        Returns nothing
+    """
+
+    parts = [GAME_HEADER.pack(board_size, ALGORITHMS.index(algorithm), len(ships),
+                              seed, len(shots))]
+    for name, x, y, vertical, length in ships:
+        encoded = name.encode('utf-8')
+        parts.append(SHIP.pack(x, y, vertical, length, len(encoded)) + encoded)
+    packed = array('I', (((y * board_size + x) << 1) | bool(hit)
+                         for (x, y), hit in shots))
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    parts.append(packed.tobytes())
+    file.write(b''.join(parts))
+
+def read_games(file):
+    """Reads the records of a move log one at a time
+
+    Args:
+        file (file): The move log, opened for reading in binary mode
+    Returns:
+        generator(GameRecord): Each record in the order they were written
+    Raises:
+        ValueError: The file is not a move log or its last record is cut short
+    """
+
+    if file.read(len(MOVE_LOG_MAGIC)) != MOVE_LOG_MAGIC:
+        raise ValueError('The file is not a battleships move log')
+    while True:
+        header = file.read(GAME_HEADER.size)
+        if not header:
+            return
+        if len(header) < GAME_HEADER.size:
+            raise ValueError('The last record of the move log is cut short')
+        board_size, algorithm, ship_count, seed, shot_count = GAME_HEADER.unpack(header)
+        ships = []
+        for _ in range(ship_count):
+            x, y, vertical, length, name_length = SHIP.unpack(file.read(SHIP.size))
+            ships.append((file.read(name_length).decode('utf-8'), x, y, bool(vertical), length))
+        shots = array('I')
+        shots.frombytes(file.read(shot_count * shots.itemsize))
+        # Reads every shot of the record into the array in one call
+        if len(shots) < shot_count:
+            raise ValueError('The last record of the move log is cut short')
+        if sys.byteorder != 'little':
+            shots.byteswap()
+        yield GameRecord(board_size, ALGORITHMS[algorithm], seed, ships, shots)
+
+def replay_game(record):
+    """Plays the shots of a record through 'game_engine.attack' on its fleet
+
+    Args:
+        record (GameRecord): The record to replay
+    Returns:
+        dict: The number of shots and hits, the number of shots whose result differs
+            from the one in the log, and whether every ship sank
+    """
+
+    board, battleships = record.board()
+    size = record.board_size
+    hits = mismatches = 0
+    for packed in record.shots:
+        cell = packed >> 1
+        hit = attack((cell % size, cell // size), board, battleships)
+        hits += hit
+        mismatches += hit != (packed & 1)
+    return {'shots': len(record.shots), 'hits': hits, 'mismatches': mismatches,
+            'sunk': board.all_sunk()}
+
+def check_game(record):
+    """Checks the result of every shot of a record against its fleet
+
+    Description:
+        The fast path of 'replay_game', which only tests the bit of each shot against
+        the mask of the fleet instead of playing the shot on the board.
+
+    Args:
+        record (GameRecord): The record to check
+    Returns:
+        int: The number of shots whose result differs from the one in the log
+    """
+
+    board, _ = record.board()
+    if not isinstance(board, BitBoard):
+        size = record.board_size
+        return sum((((packed >> 1) % size, (packed >> 1) // size) in board.cells)
+                   != (packed & 1) for packed in record.shots)
+    occupied = board.occupied
+    mismatches = 0
+    for packed in record.shots:
+        if (occupied >> (packed >> 1) ^ packed) & 1:
+        # The bit of the cell in the fleet against the result bit of the shot
+            mismatches += 1
+    return mismatches
+
+def resimulate(record):
+    """Plays the record's algorithm again from its seed and finds where it diverges
+
+    Args:
+        record (GameRecord): A record made by 'record_games', with a seed
+    Returns:
+        int: The index of the first shot that differs from the log, or None if the Ai
+            takes exactly the same shots
+    """
+
+    board, battleships = record.board()
+    random.seed(record.seed ^ 0x5EED)
+    # The same seeding of the Ai's random choices as the tournament and 'record_games'
+    shot_log = []
+    headless_ai_game(record.algorithm, board, battleships, record.board_size,
+                     shot_log=shot_log)
+    logged = record.coordinates()
+    for index, (shot, expected) in enumerate(zip(shot_log, logged)):
+        if shot != expected:
+            return index
+    if len(shot_log) != len(logged):
+        return min(len(shot_log), len(logged))
+    return None
+
+def record_games(filename, algorithm, games, seed = 0, board_size = 10, battleships = None):
+    """Plays an algorithm against seeded fleets and writes each game to a move log
+
+    Args:
+        filename (str): The move log to write
+        algorithm (str): The algorithm that takes the shots
+        games (int): The number of games to play
+        seed (int): The seed of the first fleet; the following fleets use the next seeds
+        board_size (int): The size of the board
+        battleships (dict[str:int]): The ships of each fleet, read from 'battleships.txt'
+            if not given
+    Returns:
+        Returns nothing
+    """
+
+    if battleships is None:
+        battleships = create_battleships('battleships.txt')
+    with open(filename, 'wb') as file:
+        file.write(MOVE_LOG_MAGIC)
+        for game_seed in range(seed, seed + games):
+            board, ships = seeded_fleet(game_seed, battleships, board_size)
+            positions = fleet_positions(board)
+            random.seed(game_seed ^ 0x5EED)
+            shot_log = []
+            headless_ai_game(algorithm, board, ships, board_size, shot_log=shot_log)
+            write_game(file, board_size, algorithm, game_seed, positions, shot_log)
+
+def journal_to_log(directory, filename):
+    """Writes the Ai's shots of every game in a journal of the web interface to a move log
+
+    Args:
+        directory (str): The directory holding the journal and its snapshot
+        filename (str): The move log to write
+    Returns:
+        int: The number of games written
+    """
+
+    snapshot, records = Journal(directory).load()
+    games = {game_id: dict(data) for game_id, data in snapshot.items()}
+    for record in records:
+        if record['type'] == 'create':
+            games[record['game']] = dict(record, turns=[])
+        elif record['type'] == 'turn' and record['game'] in games:
+            games[record['game']]['turns'].append([*record['player'], *record['ai']])
+
+    with open(filename, 'wb') as file:
+        file.write(MOVE_LOG_MAGIC)
+        for data in games.values():
+            board = BitBoard(data['size'])
+            for ship, cells in data['player_cells'].items():
+                for x, y in cells:
+                    board.place(ship, board.cell_bit(x, y))
+            shots = [((ai_x, ai_y), bool(board.occupied & board.cell_bit(ai_x, ai_y)))
+                     for _, _, ai_x, ai_y in data['turns']]
+            write_game(file, data['size'], data['algorithm'], NO_SEED,
+                       fleet_positions(board), shots)
+    return len(games)
+
+def main(argv = None):
+    """Records, converts and replays move logs from the command line
+
+    Args:
+        argv (list[str]): The command line arguments, taken from sys.argv if not given
+    Returns:
+        Returns nothing
+    """
+
+    parser = argparse.ArgumentParser(description='Move logs and replay of battleships games')
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help='play seeded games and log them')
+    record.add_argument('output')
+    record.add_argument('--algorithm', choices=ALGORITHMS, default='parity')
+    record.add_argument('--games', type=int, default=1000)
+    record.add_argument('--seed', type=int, default=0)
+    record.add_argument('--size', type=int, default=10)
+    convert = commands.add_parser('journal', help='log the games of a journal directory')
+    convert.add_argument('directory')
+    convert.add_argument('output')
+    play = commands.add_parser('replay', help='replay a move log')
+    play.add_argument('log')
+    play.add_argument('--check', action='store_true',
+                      help='only check the result of each shot against the fleet')
+    play.add_argument('--resimulate', action='store_true',
+                      help='play the algorithm again from each seed and report divergences')
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        record_games(args.output, args.algorithm, args.games, args.seed, args.size)
+        return
+    if args.command == 'journal':
+        print(f'{journal_to_log(args.directory, args.output)} games written to {args.output}')
+        return
+
+    games = shots = mismatches = 0
+    diverged = []
+    start = time.perf_counter()
+    with open(args.log, 'rb', buffering=1 << 20) as file:
+        for index, game in enumerate(read_games(file)):
+            games += 1
+            shots += len(game.shots)
+            if args.check:
+                mismatches += check_game(game)
+            else:
+                mismatches += replay_game(game)['mismatches']
+            if args.resimulate and game.seed != NO_SEED:
+                divergence = resimulate(game)
+                if divergence is not None:
+                    diverged.append({'game': index, 'seed': game.seed, 'shot': divergence})
+    elapsed = time.perf_counter() - start
+    json.dump({'games': games, 'shots': shots, 'mismatches': mismatches,
+               'diverged': diverged, 'seconds': elapsed,
+               'shots_per_second': shots / elapsed if elapsed > 0 else 0.0,
+               'bytes': os.path.getsize(args.log)}, sys.stdout, indent=4)
+    print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""Opt-in profiling of the requests handled by the web interface
+
+This module wraps chosen requests in cProfile and tracemalloc, so that a slow
+'/attack' can be looked into on the running server. Profiling is off unless a
+directory is given for the results. A request is then profiled either when it
+carries the profiling header with the trusted token, or when it is one of every
+N requests to the chosen routes, so a steady trickle of real traffic can be
+profiled. The sampling rate and the routes can be changed while the server runs.
+
+cProfile only traces the thread that handles the request, but tracemalloc traces
+the whole process, so only one request is profiled at a time, and a request sampled
+while another is being profiled is skipped. Its memory snapshot still holds what
+the other threads allocated meanwhile.
+Each profiled request writes '<request id>.prof', which can be read with 'pstats'
+or snakeviz, and '<request id>.tracemalloc', a snapshot of the memory allocated
+while the request ran, which can be loaded with 'tracemalloc.Snapshot.load'.
+
+Attributes
+----------
+PROFILE_HEADER : str
+    The header that asks for a request to be profiled, holding the trusted token
+REQUEST_ID_HEADER : str
+    The header holding the id of the request, used to name its profile
+"""
+
+
+import cProfile
+import hmac
+import logging
+import os
+import re
+import threading
+import tracemalloc
+import uuid
+
+PROFILE_HEADER = 'X-Battleships-Profile'
+REQUEST_ID_HEADER = 'X-Request-Id'
+
+def request_id(headers, trusted = False):
+    """Makes up the id of a profiled request, which its profiles are named after
+
+    Description:
+        The id is always made up by the server, so two requests never write over each
+        other's profiles. A trusted client's own id is put in front of it, so that the
+        client can find its profiles, while a request picked by sampling cannot choose
+        the name of the files it writes.
+
+    Args:
+        headers (dict): The headers of the request
+        trusted (bool): Whether the request carries the trusted token
+    Returns:
+        str: The id, holding only characters that are safe in a filename
+    """
+
+    made_up = uuid.uuid4().hex
+    if not trusted:
+        return made_up
+    given = re.sub(r'[^A-Za-z0-9_.-]', '', headers.get(REQUEST_ID_HEADER, ''))[:64].lstrip('.')
+    return f'{given}-{made_up[:12]}' if given else made_up
+
+class ProfileSession:
+    """The profilers of a single request that is being profiled
+
+    Attributes:
+        request_id (str): The id of the request, used to name its profile
+        profile (cProfile.Profile): The profiler of the request's thread
+        started_tracing (bool): Whether tracemalloc was started for this request
+    """
+
+    __slots__ = ('request_id', 'profile', 'started_tracing')
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.profile = cProfile.Profile()
+        self.started_tracing = False
+
+class RequestProfiler:
+    """Decides which requests are profiled and writes out their profiles
+
+    Attributes:
+        directory (str): The directory the profiles are written to, or None when
+            profiling is off
+        rate (int): One in this many requests to the chosen routes is profiled; 0 only
+            profiles the requests with the trusted header
+        routes (set[str]): The routes whose requests are sampled, such as '/attack'
+        token (str): The token that trusted clients send in the profiling header, or
+            None if the header is not accepted
+        profiled (int): The number of requests that have been profiled
+    """
+
+    def __init__(self, directory = None, rate = 0, routes = ('/attack',), token = None):
+        self.directory = directory
+        self.rate = rate
+        self.routes = set(routes)
+        self.token = token
+        self.profiled = 0
+        self._seen = 0
+        self._lock = threading.Lock()
+        self._busy = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def trusted(self, headers):
+        """Checks whether a request carries the trusted token in the profiling header
+
+        Args:
+            headers (dict): The headers of the request
+        Returns:
+            bool: True if the token is set and the header holds it
+        """
+
+        given = headers.get(PROFILE_HEADER)
+        return bool(self.token and given and
+                    hmac.compare_digest(given.encode('utf-8'), self.token.encode('utf-8')))
+
+    def should_profile(self, route, headers):
+        """Decides whether a request is profiled
+
+        Args:
+            route (str): The route of the request
+            headers (dict): The headers of the request
+        Returns:
+            bool: True if the request is profiled
+        """
+
+        if not self.directory:
+            return False
+        if self.trusted(headers):
+            return True
+        if self.rate <= 0 or route not in self.routes:
+            return False
+        with self._lock:
+            self._seen += 1
+            return self._seen % self.rate == 0
+
+    def start(self, route, headers):
+        """Starts profiling a request if it is chosen and no other request is being profiled
+
+        Args:
+            route (str): The route of the request
+            headers (dict): The headers of the request
+        Returns:
+            ProfileSession: The profilers of the request, or None if it is not profiled
+        """
+
+        if not self.should_profile(route, headers):
+            return None
+        if not self._busy.acquire(blocking=False):
+            return None
+        # tracemalloc traces the whole process, unlike cProfile, so only one request at a time
+        session = ProfileSession(request_id(headers, self.trusted(headers)))
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            session.started_tracing = True
+        session.profile.enable()
+        return session
+
+    def finish(self, session):
+        """Stops profiling a request and writes its profile and its memory snapshot
+
+        Args:
+            session (ProfileSession): The profilers returned by 'start'
+        Returns:
+            str: The path of the profile, without its extension
+        """
+
+        session.profile.disable()
+        path = os.path.join(self.directory, session.request_id)
+        try:
+            session.profile.dump_stats(path + '.prof')
+            tracemalloc.take_snapshot().dump(path + '.tracemalloc')
+            with self._lock:
+                self.profiled += 1
+            logging.info('Profile of request %s written to %s', session.request_id, path)
+        except OSError:
+            logging.exception('The profile of request %s could not be written',
+                              session.request_id)
+        finally:
+            if session.started_tracing:
+                tracemalloc.stop()
+            self._busy.release()
+        return path
+
+    def settings(self):
+        """Lists the settings that can be changed while the server runs
+
+        Args:
+            No arguments
+        Returns:
+            dict: The sampling rate, the sampled routes and the requests profiled so far
+        """
+
+        return {'rate': self.rate, 'routes': sorted(self.routes), 'profiled': self.profiled}
@@ -0,0 +1,207 @@
+"""Sparse representation of a battleships board for very large boards
+
+This module provides a board that only stores what is on it: the position of each
+ship, the cells covered by the ships and the cells that have been shot. Unlike the
+list of lists board and the BitBoard, nothing grows with the area of the board, so
+a 1000x1000 or larger board holding a fleet of a few ships takes a few kilobytes and
+can be used to stress test the Ai. 'components.new_board' builds one for every board
+that is too large for the segment index of the BitBoard.
+"""
+
+
+import random
+
+class SparseBoard:
+    """A battleships board that stores only its ships and its shots
+
+    Attributes:
+        size (int): The width and height of the board
+        ships (dict{str : tuple(int, int, int, bool)}): The x and y coordinates of the first
+            cell, the length and whether each ship extends downwards
+        cells (dict{tuple(int, int) : str}): The name of the ship covering each cell
+        shots (set[tuple(int, int)]): The cells that have been shot
+    """
+
+    __slots__ = ('size', 'ships', 'cells', 'shots', '_afloat', '_unhit')
+
+    def __init__(self, size = 10):
+        self.size = size
+        self.ships = {}
+        self.cells = {}
+        self.shots = set()
+        self._afloat = {}
+        self._unhit = 0
+
+    def __len__(self):
+        return self.size
+
+    def segment_cells(self, x, y, length, vertical):
+        """Lists the cells covered by a ship
+
+        Args:
+            x (int): The column of the first cell of the ship
+            y (int): The row of the first cell of the ship
+            length (int): The length of the ship
+            vertical (bool): True if the ship extends downwards, False if it extends
+                to the right
+        Returns:
+            list[tuple(int, int)]: The cells covered by the ship, or None if the ship goes
+                beyond the border of the board
+        """
+
+        end_x, end_y = (x, y + length - 1) if vertical else (x + length - 1, y)
+        if length < 1 or x < 0 or y < 0 or end_x >= self.size or end_y >= self.size:
+            return None
+        return [(x, y + count) if vertical else (x + count, y) for count in range(length)]
+
+    def can_place(self, x, y, length, vertical):
+        """Checks whether a ship can be placed without overlapping another ship
+
+        Args:
+            x (int): The column of the first cell of the ship
+            y (int): The row of the first cell of the ship
+            length (int): The length of the ship
+            vertical (bool): Whether the ship extends downwards
+        Returns:
+            bool: True if the ship is on the board and does not overlap another ship
+        """
+
+        cells = self.segment_cells(x, y, length, vertical)
+        return cells is not None and not any(cell in self.cells for cell in cells)
+
+    def place(self, name, x, y, length, vertical):
+        """Places a ship on the board
+
+        Args:
+            name (str): The name of the ship
+            x (int): The column of the first cell of the ship
+            y (int): The row of the first cell of the ship
+            length (int): The length of the ship
+            vertical (bool): Whether the ship extends downwards
+        Returns:
+            bool: True if the ship has been placed, False if it overlaps another ship
+                or goes beyond the border of the board
+        """
+
+        if not self.can_place(x, y, length, vertical):
+            return False
+        self.remove(name)
+        for cell in self.segment_cells(x, y, length, vertical):
+            self.cells[cell] = name
+        self.ships[name] = (x, y, length, bool(vertical))
+        self._afloat[name] = length
+        self._unhit += length
+        return True
+
+    def place_randomly(self, name, length, attempts):
+        """Places a ship at a random position, retrying when the position is taken
+
+        Description:
+            On a large board the ships cover so little of it that a random position is
+            almost always free, so trying positions at random is faster than listing
+            every legal position.
+
+        Args:
+            name (str): The name of the ship
+            length (int): The length of the ship
+            attempts (int): The number of random positions tried before giving up
+        Returns:
+            bool: True if the ship has been placed
+        """
+
+        for _ in range(attempts):
+            vertical = random.getrandbits(1) == 1
+            x = random.randrange(self.size - (0 if vertical else length - 1))
+            y = random.randrange(self.size - (length - 1 if vertical else 0))
+            if self.place(name, x, y, length, vertical):
+                return True
+        return False
+
+    def remove(self, name):
+        """Removes a ship from the board
+
+        Args:
+            name (str): The name of the ship
+        Returns:
+            Returns nothing
+        """
+
+        if name not in self.ships:
+            return
+        x, y, length, vertical = self.ships.pop(name)
+        for cell in self.segment_cells(x, y, length, vertical):
+            del self.cells[cell]
+        self._unhit -= self._afloat.pop(name)
+
+    def positions(self):
+        """Lists the position of each ship in the form kept by a move log
+
+        Args:
+            No arguments
+        Returns:
+            list[tuple(str, int, int, bool, int)]: The name, the x and y coordinates of the
+                first cell, whether it extends downwards and the length of each ship
+        """
+
+        return [(name, x, y, vertical, length)
+                for name, (x, y, length, vertical) in self.ships.items()]
+
+    def fire(self, x, y):
+        """Shoots a single cell of the board
+
+        Args:
+            x (int): The column of the shot
+            y (int): The row of the shot
+        Returns:
+            tuple(bool, str): Whether the shot hit a ship that had not already been hit
+                in that cell, and the name of the ship that was hit (None on a miss)
+        """
+
+        cell = (x, y)
+        if cell in self.shots:
+            return False, None
+        self.shots.add(cell)
+        name = self.cells.get(cell)
+        if name is None:
+            return False, None
+        self._afloat[name] -= 1
+        self._unhit -= 1
+        return True, name
+
+    def is_sunk(self, name):
+        """Checks whether every cell of a ship has been shot
+
+        Args:
+            name (str): The name of the ship
+        Returns:
+            bool: True if the ship has sunk
+        """
+
+        return self._afloat.get(name, 0) == 0
+
+    def all_sunk(self):
+        """Checks whether every ship on the board has sunk
+
+        Args:
+            No arguments
+        Returns:
+            bool: True if every cell covered by a ship has been shot
+        """
+
+        return self._unhit == 0
+
+    def to_list(self):
+        """Converts the board to the list of lists form, for displaying a small board
+
+        Args:
+            No arguments
+        Returns:
+            board (list[list]): The board where every cell that holds a ship which has
+                not been hit contains the name of the ship, and every other cell is None
+        """
+
+        board = [[None for x in range(self.size)] for y in range(self.size)]
+        for (x, y), name in self.cells.items():
+            if (x, y) not in self.shots:
+                board[y][x] = name
+        return board
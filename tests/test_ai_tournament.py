@@ -0,0 +1,31 @@
+from ai_tournament import percentile, run_tournament
+
+
+def test_percentile_interpolates():
+    """
+    Test if the percentile is interpolated between the two nearest values.
+    """
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) == 0.0
+
+
+def test_tournament_is_repeatable():
+    """
+    Test if the same seeds give the same shots to win for every algorithm.
+    """
+    first = run_tournament(('hunt&target', 'probability'), games=4, workers=1, chunk=2)
+    second = run_tournament(('hunt&target', 'probability'), games=4, workers=1, chunk=2)
+    for algorithm, report in first['algorithms'].items():
+        assert report['games'] == 4
+        assert report['shots_to_win'] == second['algorithms'][algorithm]['shots_to_win']
+
+
+def test_parity_hunts_differently_from_hunt_and_target():
+    """
+    Test if the parity algorithm hunts on the checkerboard rather than playing like hunt&target.
+    """
+    report = run_tournament(('hunt&target', 'parity'), games=20, workers=1, chunk=10)
+    hunt = report['algorithms']['hunt&target']['shots_to_win']['mean']
+    parity = report['algorithms']['parity']['shots_to_win']['mean']
+    assert parity < hunt, "the parity hunt did not need fewer shots than hunt&target"
@@ -0,0 +1,45 @@
+import asyncio
+from asgi_app import Application
+
+
+def request(app, path, query = b'', headers = (), body = b''):
+    """
+    Sends one http request to an ASGI application and collects the response.
+    """
+    async def call():
+        received = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+        async def receive():
+            if received:
+                return received.pop()
+            await asyncio.sleep(3600)
+        async def send(message):
+            sent.append(message)
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query,
+                 'headers': list(headers)}
+        await asyncio.wait_for(app(scope, receive, send), 5)
+        return sent
+    sent = asyncio.run(call())
+    return sent[0], b''.join(message.get('body', b'') for message in sent[1:])
+
+
+def test_attack_is_played_through_the_executor():
+    """
+    Test if a game started over ASGI can be attacked with the session cookie it was given.
+    """
+    app = Application(workers=1)
+    start, page = request(app, '/')
+    assert start['status'] == 200 and b'<html' in page.lower()
+    cookie = next(value.split(b';')[0] for name, value in start['headers']
+                  if name == b'set-cookie')
+    start, body = request(app, '/attack', b'x=0&y=0', [(b'cookie', cookie)])
+    assert start['status'] == 200, "the attack was not played for the session's game"
+    assert b'AI_Turn' in body
+
+
+def test_events_without_a_game_is_not_found():
+    """
+    Test if subscribing to the events of a game that does not exist returns 404.
+    """
+    start, _ = request(Application(workers=1), '/events', b'game=missing')
+    assert start['status'] == 404
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from batch_simulator import random_fleets, simulate
+
+
+def test_random_fleets_places_every_ship():
+    """
+    Test if every board in a batch holds every cell of every ship without overlaps.
+    """
+    ships = {'Aircraft_Carrier': 5, 'Battleship': 4, 'Destroyer': 2}
+    fleets = random_fleets(500, ships, 10, np.random.default_rng(0))
+    for ship_index, length in enumerate(ships.values(), start=1):
+        assert ((fleets == ship_index).sum(axis=1) == length).all(), "a ship is missing cells"
+
+
+def test_random_fleets_reports_infeasible_fleet():
+    """
+    Test if placing a fleet that cannot fit raises an error rather than hanging.
+    """
+    with pytest.raises(ValueError):
+        random_fleets(10, {'Aircraft_Carrier': 5}, 3, np.random.default_rng(0))
+
+
+def test_random_fleets_starts_blocked_fleets_again():
+    """
+    Test if a dense fleet that the earlier ships can block is still placed on every board.
+    """
+    ships = {'A': 2, 'B': 2, 'C': 2, 'D': 2}
+    fleets = random_fleets(200, ships, 3, np.random.default_rng(0))
+    for ship_index in range(1, 5):
+        assert ((fleets == ship_index).sum(axis=1) == 2).all(), "a ship is missing cells"
+
+
+def test_simulate_sinks_every_fleet():
+    """
+    Test if every strategy sinks every fleet within the number of cells on the board.
+    """
+    for strategy in ('simple', 'hunt&target', 'parity'):
+        summary = simulate(strategy, 200, seed=0, batch_size=64)
+        assert summary['games'] == 200
+        assert 17 <= summary['min'] and summary['max'] <= 100
+        assert sum(summary['histogram'].values()) == 200
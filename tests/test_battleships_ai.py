@@ -0,0 +1,207 @@
+import threading
+
+import pytest
+
+from battleships_ai import (UNKNOWN, CellPool, EndgameTargeting, MonteCarloTargeting,
+                            ProbabilityDensity, enumerate_layouts, estimate_layouts, expected_shots,
+                            line_coverage,
+                            monte_carlo_pool, sample_layouts)
+from bitboard import BitBoard
+from components import create_battleships, place_battleships, seeded_fleet
+from fleet import Fleet
+from game_engine import attack
+from game_store import ship_cells
+from mp_game_engine import generate_attack
+from zobrist import TranspositionCache
+
+
+def test_probability_density_counts_placements():
+    """
+    Test if the density of an empty board counts every placement covering each cell.
+    """
+    density = ProbabilityDensity(10, {'Destroyer': 2})
+    # A corner cell is covered by one horizontal and one vertical placement,
+    # and a middle cell by two of each
+    assert density._score(0) == 2
+    assert density._score(55) == 4
+    density.record_shot((1, 0), False)
+    assert density._score(0) == 1, "the miss did not block the placement over it"
+
+
+def test_probability_density_sinks_fleet_without_repeats():
+    """
+    Test if the probability algorithm sinks a fleet without shooting any cell twice.
+    """
+    ships = create_battleships('battleships.txt')
+    board = place_battleships(BitBoard(10), ships, 'random')
+    density = ProbabilityDensity(10, ships)
+    shots = set()
+    while not board.all_sunk():
+        co_ord = generate_attack('probability', None, None, 10, ai_state=density)
+        assert co_ord not in shots, "the probability algorithm repeated a shot"
+        shots.add(co_ord)
+        density.record_shot(co_ord, attack(co_ord, board, ships))
+    assert len(shots) <= 100
+
+
+def test_probability_density_stays_exact_after_sinks():
+    """
+    Test if the density kept up to date shot by shot matches one counted from scratch, sinks included.
+    """
+    battleships = create_battleships('battleships.txt')
+    board, ships = seeded_fleet(3, battleships, 10)
+    fleet = Fleet(ships)
+    cells = ship_cells(board.to_list())
+    density = ProbabilityDensity(10, fleet)
+    while not fleet.all_sunk():
+        lengths = density._ship_lengths()
+        for index in range(100):
+            y, x = divmod(index, 10)
+            full = (line_coverage(density.cells, y * 10, 1, 10, x, x + 1, lengths)[0]
+                    + line_coverage(density.cells, x, 10, 10, y, y + 1, lengths)[0])
+            expected = full if density.cells[index] == UNKNOWN else -1
+            assert density._score(index) == expected, "the density drifted from a full count"
+        co_ord = density.best_shot()
+        hit = attack(co_ord, board, fleet)
+        density.record_shot(co_ord, hit, fleet.last_sunk, cells.get(fleet.last_sunk))
+
+
+def test_stateless_probability_needs_the_fleet():
+    """
+    Test if the probability algorithm without a density uses the fleet it is given, and refuses to guess.
+    """
+    ships = create_battleships('battleships.txt')
+    expected = ProbabilityDensity(10, ships).best_shot()
+    assert generate_attack('probability', None, set(), 10, battleships=ships) == expected
+    with pytest.raises(ValueError):
+        generate_attack('probability', None, set(), 10)
+
+
+def test_cell_pool_draws_without_replacement():
+    """
+    Test if the cell pool only ever draws cells that have not been removed.
+    """
+    pool = CellPool(3)
+    drawn = set()
+    while len(pool):
+        co_ord = pool.sample()
+        assert co_ord not in drawn, "the pool drew a removed cell"
+        assert pool.remove(co_ord)
+        drawn.add(co_ord)
+    assert len(drawn) == 9 and pool.sample() is None
+    assert not pool.remove((0, 0))
+
+
+def test_cell_pool_draws_checkerboard_cells_first():
+    """
+    Test if the parity hunt only draws checkerboard cells until none are left.
+    """
+    pool = CellPool(4)
+    for _ in range(8):
+        co_ord = pool.sample_checkerboard()
+        assert sum(co_ord) % 2 == 1, "a cell off the checkerboard was drawn"
+        pool.remove(co_ord)
+    assert sum(pool.sample_checkerboard()) % 2 == 0, "the pool did not fall back to any cell"
+    pool = CellPool(5)
+    while sum(pool.sample_checkerboard()) % 2 == 1:
+        pool.remove(pool.sample_checkerboard())
+    assert len(pool) == 13, "the checkerboard cells of an odd board were not all drawn first"
+
+
+def test_monte_carlo_pool_is_not_forked_beside_other_threads():
+    """
+    Test if the pool is not started once other threads are running, and the Ai samples inline instead.
+    """
+    release = threading.Event()
+    thread = threading.Thread(target=release.wait)
+    thread.start()
+    try:
+        assert monte_carlo_pool(7) is None, "the pool was forked while another thread was running"
+        state = MonteCarloTargeting(10, {'Destroyer': 2}, deadline=1, max_samples=50, workers=7,
+                                    cache=TranspositionCache())
+        assert state.best_shot() is not None and state.samples == 50
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_monte_carlo_samples_agree_with_shots():
+    """
+    Test if every sampled layout avoids the misses and covers the unresolved hits.
+    """
+    counts, samples = sample_layouts(10, [3], 0b110, 1 << 11, 1, float('inf'), 200)
+    # With a miss at (1, 0) and (2, 0), a ship of length 3 over (1, 1) must cover it
+    assert samples == 200
+    assert counts[1] == 0 and counts[2] == 0, "a layout covered a miss"
+    assert counts[11] == 200, "a layout did not cover the hit"
+
+
+def test_monte_carlo_sinks_fleet_and_reports_moves():
+    """
+    Test if the montecarlo algorithm sinks a fleet without repeats, calling its benchmark hook.
+    """
+    ships = create_battleships('battleships.txt')
+    board = place_battleships(BitBoard(10), dict(ships), 'random')
+    fleet = Fleet(ships)
+    cells = ship_cells(board.to_list())
+    moves = []
+    state = MonteCarloTargeting(10, ships, deadline=1, max_samples=50, workers=1,
+                                on_move=lambda samples, latency: moves.append(samples))
+    shots = set()
+    while not fleet.all_sunk():
+        co_ord = generate_attack('montecarlo', None, None, 10, ai_state=state)
+        assert co_ord not in shots, "the montecarlo algorithm repeated a shot"
+        shots.add(co_ord)
+        hit = attack(co_ord, board, fleet)
+        sunk = fleet.last_sunk
+        state.record_shot(co_ord, hit, sunk, cells.get(sunk))
+    assert len(moves) == len(shots) and all(samples <= 50 for samples in moves)
+
+
+def test_endgame_enumerates_layouts_covering_hits():
+    """
+    Test if the endgame search lists every layout, keeping only those covering the hits.
+    """
+    assert sum(enumerate_layouts(3, [2], 0, 0, 1000).values()) == 12
+    layouts = enumerate_layouts(3, [2], 0, 1 << 4, 1000)
+    # Only the four positions through the middle cell cover the hit there
+    assert sum(layouts.values()) == 4 and all(not mask & (1 << 4) for mask in layouts)
+    assert enumerate_layouts(3, [2, 2], 0, 0, 5) is None, "the node budget was not kept"
+
+
+def test_endgame_minimises_expected_shots():
+    """
+    Test if the expected shots of two equally likely single cells is one and a half.
+    """
+    assert expected_shots({0b01: 1, 0b10: 1}, 100) == (1.5, 0b01)
+    assert expected_shots({0b11: 1}, 100) == (2.0, 0b01)
+
+
+def test_endgame_waits_for_few_layouts():
+    """
+    Test if the endgame search stays off on an open board, however few ships survive.
+    """
+    assert estimate_layouts(10, [3], 0) == 160
+    assert estimate_layouts(10, [2, 2], 0) == 180 * 180 // 2
+    state = EndgameTargeting(10, {'Destroyer': 2, 'Submarine': 3})
+    state.best_shot()
+    assert not state.solved, "the endgame search ran on an open board"
+
+
+def test_endgame_sinks_fleet_without_repeats():
+    """
+    Test if the endgame algorithm sinks a fleet without shooting any cell twice.
+    """
+    ships = create_battleships('battleships.txt')
+    board = place_battleships(BitBoard(10), dict(ships), 'random')
+    fleet = Fleet(ships)
+    cells = ship_cells(board.to_list())
+    state = EndgameTargeting(10, ships)
+    shots = set()
+    while not fleet.all_sunk():
+        co_ord = generate_attack('endgame', None, None, 10, ai_state=state)
+        assert co_ord not in shots, "the endgame algorithm repeated a shot"
+        shots.add(co_ord)
+        hit = attack(co_ord, board, fleet)
+        state.record_shot(co_ord, hit, fleet.last_sunk, cells.get(fleet.last_sunk))
+    assert state.solved, "the last ships were not found by the endgame search"
@@ -0,0 +1,30 @@
+from benchmarks.__main__ import compare, rounded
+from benchmarks.hot_paths import run_benchmarks, time_reference
+
+
+def test_benchmarks_report_time_and_memory():
+    """
+    Test if a benchmark case reports its timing and the memory it allocates.
+    """
+    results = run_benchmarks('initialise_board[list-10]', budget=0.01)
+    assert list(results) == ['initialise_board[list-10]']
+    result = results['initialise_board[list-10]']
+    assert result['repeats'] >= 3 and 0 < result['min_us'] <= result['median_us']
+    assert result['peak_kb'] > 0, "the board allocated no memory"
+    assert time_reference(budget=0.01) > 0, "the reference case was not timed"
+
+
+def test_compare_flags_regressions():
+    """
+    Test if a case that is much slower than the baseline is reported as a regression.
+    """
+    baseline = {'attack[list-10-fleet]': {'min_us': 10.0, 'peak_kb': 1.0}}
+    slower = {'attack[list-10-fleet]': {'min_us': 20.0, 'peak_kb': 1.0}}
+    assert compare(slower, baseline)[1] == ['attack[list-10-fleet]']
+    assert compare(baseline, baseline)[1] == []
+    assert compare(slower, baseline, speed=2.0)[1] == [], \
+        "a case was reported as a regression on a machine that is twice as slow"
+    noisy = {'attack[list-10-fleet]': {'min_us': 1.6, 'peak_kb': 1.0}}
+    assert compare(noisy, {'attack[list-10-fleet]': {'min_us': 0.7, 'peak_kb': 1.0}})[1] == [], \
+        "a sub-microsecond wobble was reported as a regression"
+    assert rounded(1234.5678) == 1230 and rounded(0.012345) == 0.0123
@@ -0,0 +1,57 @@
+from bitboard import INDEX_CACHE_SIZE, BitBoard, segment_index
+from components import initialise_board, place_battleships, valid_board_placement
+from game_engine import attack
+
+
+def test_bitboard_rejects_overlapping_ships():
+    """
+    Test if a ship cannot be placed over another ship or beyond the border of the board.
+    """
+    board = BitBoard(10)
+    assert board.place('Destroyer', board.segment_mask(0, 0, 2, False))
+    assert not board.place('Cruiser', board.segment_mask(1, 0, 3, True)), "overlapping ship was placed"
+    assert board.segment_mask(8, 0, 3, False) == 0, "ship beyond the border has a mask"
+
+
+def test_bitboard_attack_sinks_fleet():
+    """
+    Test if attacking every ship cell of a bitboard sinks the whole fleet.
+    """
+    ships = {'Battleship': 4, 'Destroyer': 2}
+    board = place_battleships(BitBoard(10), ships, 'random')
+    cells = [(x, y) for y, row in enumerate(board.to_list()) for x, cell in enumerate(row) if cell]
+    assert len(cells) == 6
+    for cell in cells:
+        assert attack(cell, board, ships) is True
+        # Shooting the same cell again must miss
+        assert attack(cell, board, ships) is False
+    assert board.all_sunk() and board.is_sunk('Destroyer')
+    assert all(ship == 0 for ship in ships.values())
+
+
+def test_segment_index_is_shared_and_complete():
+    """
+    Test if the segment index lists every position once and is built only once per key.
+    """
+    index = segment_index(10, 3)
+    assert index is segment_index(10, 3), "the segment index was not memoized"
+    assert len(index.masks) == 2 * 10 * 8
+    assert all(bin(mask).count('1') == 3 for mask in index.masks)
+    assert index.lookup[(7, 0, False)] == 0b111 << 7
+    assert (8, 0, False) not in index.lookup, "a position beyond the border was indexed"
+    for size in range(5, 5 + 2 * INDEX_CACHE_SIZE):
+        segment_index(size, 3)
+    assert segment_index.cache_info().currsize <= INDEX_CACHE_SIZE, "the segment indexes are unbounded"
+
+
+def test_valid_board_placement_uses_board_border():
+    """
+    Test if a placement is only valid when it is within the border and clear of other ships.
+    """
+    board = initialise_board(10)
+    board[0][0] = 'Destroyer'
+    assert not valid_board_placement(board, 3, [0, 0, 'h', True])
+    assert valid_board_placement(board, 3, [7, 0, 'h', True])
+    assert not valid_board_placement(board, 3, [8, 0, 'h', True])
+    assert valid_board_placement(board, 3, [2, 2, 'v', False])
+    assert not valid_board_placement(board, 3, [2, 1, 'v', False])
@@ -0,0 +1,30 @@
+from bitboard import BitBoard
+from fleet import Fleet
+from game_engine import attack
+
+
+def test_fleet_counts_ships_afloat():
+    """
+    Test if the fleet keeps a running count of the ships that have not sunk.
+    """
+    fleet = Fleet({'Destroyer': 2, 'Submarine': 3})
+    assert fleet.afloat == 2 and dict(fleet) == {'Destroyer': 2, 'Submarine': 3}
+    fleet['Destroyer'] -= 1
+    assert fleet.afloat == 2 and fleet.last_sunk is None
+    fleet['Destroyer'] -= 1
+    assert fleet.afloat == 1 and fleet.last_sunk == 'Destroyer'
+    fleet['Submarine'] = 0
+    assert fleet.all_sunk()
+
+
+def test_attack_reports_the_ship_it_sank():
+    """
+    Test if attack records the sunk ship on the fleet, and clears it on the next attack.
+    """
+    board = BitBoard(10)
+    board.place('Destroyer', board.segment_mask(0, 0, 2, False))
+    fleet = Fleet({'Destroyer': 2})
+    assert attack((0, 0), board, fleet) and fleet.last_sunk is None
+    assert attack((1, 0), board, fleet) and fleet.last_sunk == 'Destroyer'
+    assert not attack((5, 5), board, fleet)
+    assert fleet.last_sunk is None, "a miss still reported the ship sunk before it"
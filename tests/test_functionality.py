@@ -1,4 +1,7 @@
-from components import initialise_board
+import pytest
+
+from components import create_battleships, initialise_board, random_placement
+from config_cache import cache
 
 
 def test_initialise_board_return_size():
@@ -17,3 +20,88 @@ def test_initialise_board_return_size():
         assert isinstance(row, list), "initialise_board function does not return a list of lists"
         # Check that each sub list is the same size as board
         assert len(row) == size, "initialise_board function does not return lists of the correct size"
+
+
+def test_random_placement_fills_any_board_size():
+    """
+    Test if the random placement places every cell of every ship on boards of any size.
+    """
+    ships = {'Battleship': 4, 'Cruiser': 3, 'Destroyer': 2}
+    for size in (4, 10, 25):
+        board = random_placement(initialise_board(size), ships)
+        cells = [cell for row in board for cell in row if cell is not None]
+        assert len(cells) == 9, "random_placement did not place every cell of every ship"
+        for name, length in ships.items():
+            assert cells.count(name) == length
+
+
+def test_random_placement_reports_infeasible_fleet():
+    """
+    Test if the random placement raises an error rather than hanging on a fleet that cannot fit.
+    """
+    with pytest.raises(ValueError):
+        random_placement(initialise_board(3), {'Aircraft_Carrier': 5})
+    with pytest.raises(ValueError):
+        random_placement(initialise_board(3), {'a': 3, 'b': 3, 'c': 3, 'd': 1})
+
+
+def test_create_battleships_reloads_only_changed_file(tmp_path):
+    """
+    Test if the battleships file is only parsed again once it has changed on disk.
+    """
+    ships_file = tmp_path / "ships.txt"
+    ships_file.write_text("Destroyer:2\n", encoding="utf-8")
+    loads = cache.loads
+    first = create_battleships(str(ships_file))
+    first['Destroyer'] = 0
+    # Changing a game's copy must not change the cached ships
+    assert create_battleships(str(ships_file)) == {'Destroyer': 2}
+    assert cache.loads == loads + 1, "an unchanged file was parsed again"
+    ships_file.write_text("Destroyer:2\nCruiser:3\n", encoding="utf-8")
+    assert create_battleships(str(ships_file)) == {'Destroyer': 2, 'Cruiser': 3}
+
+
+def test_root_uses_chosen_board_size():
+    """
+    Test if a session can choose the size of its boards with the 'size' argument.
+    """
+    import main
+    client = main.app.test_client()
+    client.get('/?size=15')
+    with client.session_transaction() as session:
+        game = main.games.get(session['game_id'])
+    assert len(game.player_board) == 15 and len(game.ai_board) == 15
+    response = client.get('/attack?x=14&y=14')
+    assert response.status_code == 200
+
+
+def test_salvo_rejects_malformed_and_oversized_bodies():
+    """
+    Test if the salvo route answers a body that is not an object, or too many shots, with a 400.
+    """
+    import main
+    client = main.app.test_client()
+    client.get('/?size=5')
+    assert client.post('/attack/salvo', json=[[0, 0]]).status_code == 400
+    assert client.post('/attack/salvo', json={'shots': {'x': 0}}).status_code == 400
+    too_many = [[0, 0]] * 26
+    assert client.post('/attack/salvo', json={'shots': too_many}).status_code == 400
+    response = client.post('/attack/salvo', json={'shots': [[0, 0], [0, 0]]})
+    assert response.status_code == 200
+    assert 'error' in response.get_json()['results'][1], "the repeated shot was not reported"
+
+
+def test_attack_rejects_off_board_shots_and_finished_games():
+    """
+    Test if the attack route answers shots off the board with a 400 and refuses turns once the game is over.
+    """
+    import main
+    client = main.app.test_client()
+    client.get('/?size=5')
+    assert client.get('/attack?x=-1&y=-1').status_code == 400
+    assert client.get('/attack?x=5&y=0').status_code == 400
+    assert client.get('/attack?x=a&y=0').status_code == 400
+    shots = [[x, y] for x in range(5) for y in range(5)]
+    assert client.post('/attack/salvo', json={'shots': shots}).get_json().get('finished')
+    assert client.get('/attack?x=0&y=0').status_code == 409, "a turn was played after the game ended"
+    assert client.post('/attack/salvo', json={'shots': [[0, 0]]}).status_code == 409
@@ -0,0 +1,40 @@
+from game_events import EventChannel, stream
+
+
+def test_subscribers_share_encoded_events():
+    """
+    Test if every subscriber receives the same encoded bytes, serialised only once.
+    """
+    channel = EventChannel()
+    channel.publish('shot', {'shot': [1, 2], 'hit': True})
+    first, last_id = channel.events_after(0)
+    second, _ = channel.events_after(0)
+    assert last_id == 1
+    assert first[0] is second[0], "the event was serialised once per subscriber"
+    assert b'event: shot' in first[0]
+    assert channel.events_after(last_id) == ([], 1)
+
+
+def test_slow_subscriber_resumes_from_oldest_kept_event():
+    """
+    Test if a subscriber that falls behind the buffer carries on from the oldest event kept.
+    """
+    channel = EventChannel(size=3)
+    for turn in range(5):
+        channel.publish('shot', {'turn': turn})
+    chunks, last_id = channel.events_after(0)
+    assert len(chunks) == 3 and last_id == 5
+    assert chunks[0].startswith(b'id: 3\n')
+
+
+def test_stream_ends_once_channel_closes():
+    """
+    Test if the event stream sends the remaining events and ends once the game is over.
+    """
+    channel = EventChannel()
+    channel.publish('finished', {'finished': 'Game Over, Player Wins!'})
+    channel.close()
+    chunks = list(stream(channel, timeout=0.1))
+    assert chunks[0].startswith(b'retry:')
+    assert b'event: finished' in chunks[1]
+    assert len(chunks) == 2
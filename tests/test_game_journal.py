@@ -0,0 +1,82 @@
+import os
+
+from game_journal import Journal, load_secret_key
+
+
+def test_load_replays_only_records_after_the_snapshot(tmp_path):
+    """
+    Test if a restart replays the journal records written after each game's snapshot.
+    """
+    journal = Journal(str(tmp_path))
+    journal.record('create', 'a', {'turns': []})
+    journal.record('create', 'b', {'turns': []})
+    journal.snapshot(lambda: [('a', {'seq': 1, 'time': 0})])
+    journal.record('turn', 'a', {'player': [0, 0]})
+    journal.close()
+
+    games, records = Journal(str(tmp_path)).load()
+    assert list(games) == ['a']
+    assert [(record['type'], record['game']) for record in records] == [('turn', 'a')], \
+        "records already folded into the snapshot were replayed"
+
+
+def test_torn_record_is_ignored(tmp_path):
+    """
+    Test if a record cut short by a crash is dropped instead of failing the restore.
+    """
+    journal = Journal(str(tmp_path))
+    journal.record('create', 'a')
+    journal.close()
+    with open(journal.journal_path, 'a', encoding='utf-8') as file:
+        file.write('{"seq": 2, "type": "tu')
+    restarted = Journal(str(tmp_path))
+    _, records = restarted.load()
+    assert len(records) == 1
+    assert restarted.seq == 1
+
+
+def test_rebuilt_game_matches_the_journaled_game():
+    """
+    Test if a game rebuilt from its journal form has the same boards and Ai state.
+    """
+    import main
+    client = main.app.test_client()
+    client.get('/')
+    with client.session_transaction() as session:
+        game = main.games.get(session['game_id'])
+    for x in range(5):
+        client.get(f'/attack?x={x}&y=0')
+    with game.lock:
+        rebuilt = main.rebuild_game(main.encode_game(game))
+    assert rebuilt.player_board == game.player_board
+    assert rebuilt.ai_ships == game.ai_ships
+    assert rebuilt.ai_hitlog == game.ai_hitlog
+    assert rebuilt.ship_detection() == game.ship_detection()
+
+
+def test_replayed_turns_are_not_counted_or_published():
+    """
+    Test if rebuilding a game leaves the attack counts alone and publishes no events.
+    """
+    import main
+    client = main.app.test_client()
+    client.get('/')
+    with client.session_transaction() as session:
+        game = main.games.get(session['game_id'])
+    for x in range(3):
+        client.get(f'/attack?x={x}&y=0')
+    attacks = main.ATTACKS.value(('player',))
+    with game.lock:
+        rebuilt = main.rebuild_game(main.encode_game(game))
+    assert main.ATTACKS.value(('player',)) == attacks, "the replayed turns were counted again"
+    assert rebuilt.events.events_after(0)[0] == [], "the replayed turns were published"
+
+
+def test_secret_key_is_kept_in_the_journal_directory(tmp_path):
+    """
+    Test if the session key is generated once and read back, so cookies outlive a restart.
+    """
+    key = load_secret_key(str(tmp_path))
+    assert len(key) == 24
+    assert load_secret_key(str(tmp_path)) == key, "a restart would invalidate every cookie"
+    assert os.stat(tmp_path / 'secret.key').st_mode & 0o077 == 0, "the key is readable by others"
@@ -0,0 +1,33 @@
+from game_store import GameState, GameStore
+
+
+def make_game():
+    """
+    Creates an empty game for the store tests.
+    """
+    return GameState([], {}, [], {})
+
+
+def test_game_store_evicts_least_recently_used():
+    """
+    Test if the game store evicts the least recently used game once it is full.
+    """
+    store = GameStore(max_games=2)
+    store.put('a', make_game())
+    store.put('b', make_game())
+    # Using 'a' makes 'b' the least recently used game
+    assert store.get('a') is not None
+    store.put('c', make_game())
+    assert 'b' not in store, "the least recently used game was not evicted"
+    assert 'a' in store and 'c' in store
+    assert store.evictions == 1
+
+
+def test_game_store_evicts_idle_games():
+    """
+    Test if the game store evicts games that have been idle for longer than the TTL.
+    """
+    store = GameStore(ttl=-1)
+    store.put('a', make_game())
+    assert store.get('a') is None, "an idle game was not evicted"
+    assert len(store) == 0
@@ -0,0 +1,24 @@
+import pytest
+
+from load_test import run_load_test
+
+
+def test_load_test_reports_each_route():
+    """
+    Test if an in-process load test plays its games and counts the repeated shots as errors.
+    """
+    report = run_load_test(players=2, games=1, repeat_rate=0.2, seed=1)
+    assert report['games'] == 2
+    routes = report['routes']
+    assert routes['/']['requests'] == 2 and routes['/placement']['requests'] == 2
+    assert routes['/attack']['errors'] > 0, "the repeated shots were not counted as errors"
+    assert set(routes['/attack']['statuses']) == {'200', '500'}
+    assert 0 < routes['/attack']['p50_ms'] <= routes['/attack']['p99_ms']
+
+
+def test_load_test_rejects_endless_repeat_rate():
+    """
+    Test if a repeat rate that would keep a player shooting the same cells forever is rejected.
+    """
+    with pytest.raises(ValueError):
+        run_load_test(players=1, games=1, repeat_rate=1.0)
@@ -0,0 +1,32 @@
+import logging
+
+from log_config import SamplingFilter, read_int, read_level
+
+
+def make_record(level):
+    """
+    Creates a log record of the given level for the filter tests.
+    """
+    return logging.LogRecord('test', level, __file__, 1, 'message', None, None)
+
+
+def test_sampling_filter_keeps_one_in_n_debug_records():
+    """
+    Test if the sampling filter keeps one in every N debug records and every other record.
+    """
+    sampler = SamplingFilter(4)
+    kept = [sampler.filter(make_record(logging.DEBUG)) for _ in range(20)]
+    assert sum(kept) == 5, "the filter did not keep one in four debug records"
+    assert all(sampler.filter(make_record(logging.ERROR)) for _ in range(5))
+
+
+def test_unreadable_settings_fall_back_to_defaults(monkeypatch):
+    """
+    Test if an unknown level or a sample rate that is not a number is replaced, with a warning.
+    """
+    monkeypatch.setenv('BATTLESHIPS_LOG_SAMPLE', 'often')
+    problems = []
+    assert read_level('LOUD', problems) == logging.DEBUG
+    assert read_level('warning', problems) == logging.WARNING
+    assert read_int('BATTLESHIPS_LOG_SAMPLE', 1, problems) == 1
+    assert len(problems) == 2, "each unreadable setting was not reported"
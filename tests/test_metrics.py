@@ -0,0 +1,63 @@
+import pytest
+
+from metrics import Counter, Histogram, Registry
+
+
+def test_histogram_buckets_are_cumulative():
+    """
+    Test if the rendered buckets of a histogram count every value up to their bound.
+    """
+    histogram = Histogram('decision_seconds', 'Decision time', ('algorithm',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, ('parity',))
+    lines = histogram.samples()
+    assert 'decision_seconds_bucket{algorithm="parity",le="0.1"} 1' in lines
+    assert 'decision_seconds_bucket{algorithm="parity",le="1.0"} 3' in lines
+    assert 'decision_seconds_bucket{algorithm="parity",le="+Inf"} 4' in lines
+    assert 'decision_seconds_count{algorithm="parity"} 4' in lines
+
+
+def test_registry_renders_help_and_type():
+    """
+    Test if the registry renders each metric in the Prometheus text format.
+    """
+    registry = Registry()
+    counter = registry.register(Counter('attacks_total', 'Attacks made', ('by',)))
+    counter.inc(('ai',))
+    counter.inc(('ai',))
+    text = registry.render()
+    assert '# TYPE attacks_total counter\n' in text
+    assert 'attacks_total{by="ai"} 2\n' in text
+
+
+def test_metrics_route_reports_attacks():
+    """
+    Test if the '/metrics' route reports the attacks and the Ai decision time of a turn.
+    """
+    import main
+    client = main.app.test_client()
+    client.get('/')
+    before = main.ATTACKS.value(('player',))
+    client.get('/attack?x=0&y=0')
+    assert main.ATTACKS.value(('player',)) == before + 1, "the player's attack was not counted"
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'battleships_ai_decision_seconds_count{algorithm="parity"}' in text
+    assert 'battleships_request_seconds_bucket{route="/attack",method="GET",le="+Inf"}' in text
+    assert 'battleships_active_games ' in text
+
+
+def test_failed_requests_are_timed(monkeypatch):
+    """
+    Test if a request whose view raises an error is still counted in the latency histogram.
+    """
+    import main
+    monkeypatch.setitem(main.app.config, 'PROPAGATE_EXCEPTIONS', True)
+    # The error then reaches the caller without a response being made for it
+    client = main.app.test_client()
+    client.get('/')
+    client.get('/attack?x=0&y=0')
+    before = main.REQUEST_LATENCY.count(('/attack', 'GET'))
+    with pytest.raises(TypeError):
+        client.get('/attack?x=0&y=0')
+    assert main.REQUEST_LATENCY.count(('/attack', 'GET')) == before + 1, \
+        "the failed request was not timed"
@@ -0,0 +1,38 @@
+from components import seeded_fleet
+from components import create_battleships
+from mp_game_engine import headless_ai_game
+from opening_book import OpeningBook, build_book, load_book, write_book
+
+
+def test_book_lookup_finds_every_record(tmp_path):
+    """
+    Test if a written book finds the move of each of its positions, and no others.
+    """
+    filename = str(tmp_path / 'book.bin')
+    moves = {key * 7919: (key % 10, key // 10) for key in range(50)}
+    write_book(filename, moves)
+    book = OpeningBook(filename)
+    assert len(book) == 50
+    assert all(book.lookup(key) == move for key, move in moves.items())
+    assert book.lookup(1) is None
+    book.close()
+
+
+def test_book_moves_match_computed_moves(tmp_path):
+    """
+    Test if a game played from the book takes the same shots as one computed in full.
+    """
+    filename = str(tmp_path / 'book.bin')
+    moves = build_book('probability', 6, depth=5)
+    assert moves, "the first move on an empty board was not kept"
+    write_book(filename, moves)
+    ships = create_battleships('battleships.txt')
+    played = []
+    for book in (None, filename):
+        load_book(book)
+        board, fleet = seeded_fleet(3, ships, 10)
+        shot_log = []
+        headless_ai_game('probability', board, fleet, 10, shot_log=shot_log)
+        played.append(shot_log)
+    load_book(None)
+    assert played[0] == played[1]
@@ -0,0 +1,45 @@
+import io
+import pytest
+from replay import MOVE_LOG_MAGIC, check_game, read_games, replay_game, resimulate, write_game
+
+
+def test_move_log_round_trip():
+    """
+    Test if a game written to a move log is read back with the same fleet and shots.
+    """
+    file = io.BytesIO()
+    file.write(MOVE_LOG_MAGIC)
+    ships = [('Destroyer', 1, 2, True, 2)]
+    shots = [((0, 0), False), ((1, 2), True), ((1, 3), True)]
+    write_game(file, 10, 'parity', 7, ships, shots)
+    file.seek(0)
+    records = list(read_games(file))
+    assert len(records) == 1
+    assert records[0].ships == ships and records[0].seed == 7
+    assert records[0].coordinates() == shots
+    assert replay_game(records[0]) == {'shots': 3, 'hits': 2, 'mismatches': 0, 'sunk': True}
+    assert check_game(records[0]) == 0
+
+
+def test_cut_short_log_is_rejected():
+    """
+    Test if a move log whose last record is cut short raises a ValueError.
+    """
+    file = io.BytesIO()
+    file.write(MOVE_LOG_MAGIC)
+    write_game(file, 10, 'simple', 1, [('Destroyer', 0, 0, False, 2)], [((0, 0), True)])
+    truncated = io.BytesIO(file.getvalue()[:-2])
+    with pytest.raises(ValueError):
+        list(read_games(truncated))
+
+
+def test_recorded_games_resimulate_identically(tmp_path):
+    """
+    Test if playing a recorded algorithm again from its seed takes exactly the same shots.
+    """
+    from replay import record_games
+    filename = str(tmp_path / 'games.log')
+    record_games(filename, 'hunt&target', 5, seed=3)
+    with open(filename, 'rb') as file:
+        for record in read_games(file):
+            assert resimulate(record) is None, "the Ai no longer takes the recorded shots"
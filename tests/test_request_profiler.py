@@ -0,0 +1,59 @@
+import main
+from request_profiler import PROFILE_HEADER, REQUEST_ID_HEADER, RequestProfiler, request_id
+
+
+def test_profiler_samples_one_in_rate(tmp_path):
+    """
+    Test if the profiler samples one in every 'rate' requests to its routes, and only those routes.
+    """
+    profiler = RequestProfiler(str(tmp_path), rate=3, routes=['/attack'], token='secret')
+    chosen = [profiler.should_profile('/attack', {}) for _ in range(9)]
+    assert chosen.count(True) == 3, "the profiler did not sample one in three requests"
+    assert not profiler.should_profile('/placement', {}), "a route that is not sampled was profiled"
+    assert profiler.should_profile('/placement', {PROFILE_HEADER: 'secret'}), \
+        "the trusted header did not force the request to be profiled"
+    assert not profiler.should_profile('/placement', {PROFILE_HEADER: 'wrong'})
+
+
+def test_request_id_is_safe_in_a_filename():
+    """
+    Test if the id of a request is safe in a filename and only chosen in part by a trusted client.
+    """
+    assert request_id({REQUEST_ID_HEADER: '../../etc/passwd'}, trusted=True).startswith('etcpasswd-')
+    assert len(request_id({}, trusted=True)) == 32, "no id was made up for a request without one"
+    assert 'abc' not in request_id({REQUEST_ID_HEADER: 'abc'}), "a sampled request chose its own id"
+    assert request_id({REQUEST_ID_HEADER: 'abc'}, trusted=True) != \
+        request_id({REQUEST_ID_HEADER: 'abc'}, trusted=True), "two requests shared a profile name"
+
+
+def test_profiled_request_writes_its_profiles(tmp_path, monkeypatch):
+    """
+    Test if a request with the trusted header writes a profile and a memory snapshot named by its id.
+    """
+    monkeypatch.setattr(main, 'profiler', RequestProfiler(str(tmp_path), token='secret'))
+    client = main.app.test_client()
+    response = client.get('/metrics', headers={PROFILE_HEADER: 'secret', REQUEST_ID_HEADER: 'abc-1'})
+    assert response.status_code == 200
+    name = response.headers[REQUEST_ID_HEADER]
+    assert name.startswith('abc-1-')
+    assert (tmp_path / f'{name}.prof').exists(), "the cProfile output was not written"
+    assert (tmp_path / f'{name}.tracemalloc').exists(), "the tracemalloc snapshot was not written"
+    assert REQUEST_ID_HEADER not in client.get('/metrics').headers, "an unchosen request was profiled"
+
+
+def test_profiling_route_needs_the_token(tmp_path, monkeypatch):
+    """
+    Test if only trusted clients can change the sampling rate at run time.
+    """
+    monkeypatch.setattr(main, 'profiler', RequestProfiler(str(tmp_path), token='secret'))
+    client = main.app.test_client()
+    assert client.post('/profiling', json={'rate': 5}).status_code == 403
+    assert client.post('/profiling', json={'rate': -1},
+                       headers={PROFILE_HEADER: 'secret'}).status_code == 400
+    assert client.post('/profiling', json={'rate': True},
+                       headers={PROFILE_HEADER: 'secret'}).status_code == 400, \
+        "a bool was taken as the rate"
+    response = client.post('/profiling', json={'rate': 5, 'routes': ['/attack', '/placement']},
+                           headers={PROFILE_HEADER: 'secret'})
+    assert response.status_code == 200
+    assert response.get_json()['rate'] == 5 and main.profiler.routes == {'/attack', '/placement'}
@@ -0,0 +1,45 @@
+from battleships_ai import CellPool
+from components import create_battleships, new_board, place_battleships
+from game_engine import attack
+from sparse_board import SparseBoard
+
+
+def test_large_board_is_sparse():
+    """
+    Test if a huge board only stores its ships and its shots.
+    """
+    battleships = create_battleships('battleships.txt')
+    board = place_battleships(new_board(100000), battleships, 'random')
+    assert isinstance(board, SparseBoard)
+    assert len(board.cells) == sum(battleships.values())
+    x, y = next(iter(board.cells))
+    assert attack((x, y), board, battleships) is True
+    assert attack((x, y), board, battleships) is False, "a cell was hit twice"
+    assert len(board.shots) == 1
+
+
+def test_sparse_board_tracks_sunk_ships():
+    """
+    Test if the sparse board knows when a ship and the whole fleet have sunk.
+    """
+    board = SparseBoard(1000)
+    assert board.place('Destroyer', 998, 5, 2, False)
+    assert not board.place('Cruiser', 999, 4, 3, True), "the ships overlap"
+    assert not board.place('Cruiser', 999, 0, 3, False), "the ship is off the board"
+    board.fire(998, 5)
+    assert not board.is_sunk('Destroyer')
+    board.fire(999, 5)
+    assert board.is_sunk('Destroyer') and board.all_sunk()
+
+
+def test_cell_pool_of_huge_board_grows_with_shots():
+    """
+    Test if the pool of a huge board only stores the cells that have been shot or moved.
+    """
+    pool = CellPool(100000)
+    assert len(pool) == 100000 * 100000
+    cell = pool.sample()
+    assert cell in pool and pool.remove(cell)
+    assert cell not in pool
+    assert (100000, 0) not in pool and None not in pool
+    assert len(pool._positions) <= 2
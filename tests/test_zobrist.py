@@ -0,0 +1,64 @@
+from battleships_ai import MonteCarloTargeting
+from zobrist import HIT, MISS, ShotHash, TranspositionCache
+
+
+def test_shot_hash_is_independent_of_order():
+    """
+    Test if the same shots give the same hash whatever order they were taken in.
+    """
+    first = ShotHash(10)
+    first.update(1, 2, 0, MISS)
+    first.update(3, 4, 0, HIT)
+    second = ShotHash(10)
+    second.update(3, 4, 0, HIT)
+    second.update(1, 2, 0, MISS)
+    assert first.value == second.value and first.value != 0
+    second.update(3, 4, HIT, 0)
+    second.update(1, 2, MISS, 0)
+    assert second.value == 0, "undoing the shots did not restore the hash"
+
+
+def test_transposition_cache_evicts_least_recently_used():
+    """
+    Test if the cache keeps within its bound and counts its hits and misses.
+    """
+    cache = TranspositionCache(2)
+    cache.put(('a',), (0, 0))
+    cache.put(('b',), (1, 1))
+    assert cache.get(('a',)) == (0, 0)
+    cache.put(('c',), (2, 2))
+    assert cache.get(('b',)) is None, "the least recently used entry was not evicted"
+    stats = cache.stats()
+    assert stats['entries'] == 2 and stats['evictions'] == 1
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['hit_rate'] == 0.5
+    assert stats['memory'] > 0
+
+
+def test_monte_carlo_reuses_cached_moves():
+    """
+    Test if a second game in the same position takes its move from the cache.
+    """
+    cache = TranspositionCache()
+    ships = {'Destroyer': 2, 'Submarine': 3}
+    first = MonteCarloTargeting(10, ships, max_samples=100, workers=1, cache=cache)
+    first.record_shot((0, 0), False)
+    move = first.best_shot()
+    second = MonteCarloTargeting(10, ships, max_samples=100, workers=1, cache=cache)
+    second.record_shot((0, 0), False)
+    assert second.best_shot() == move
+    assert second.samples == 0 and cache.hits == 1
+
+
+def test_monte_carlo_does_not_cache_rushed_moves():
+    """
+    Test if a move sampled from too few layouts is not stored, and a different budget misses the cache.
+    """
+    cache = TranspositionCache()
+    ships = {'Destroyer': 2, 'Submarine': 3}
+    rushed = MonteCarloTargeting(10, ships, deadline=0, max_samples=100, workers=1, cache=cache)
+    rushed.best_shot()
+    assert len(cache) == 0, "a move sampled from too few layouts was cached"
+    MonteCarloTargeting(10, ships, max_samples=100, workers=1, cache=cache).best_shot()
+    larger = MonteCarloTargeting(10, ships, max_samples=200, workers=1, cache=cache)
+    larger.best_shot()
+    assert larger.samples > 0, "a move sampled with a smaller budget was reused"
@@ -0,0 +1,196 @@
+"""Zobrist hashing of the Ai's shots and a shared cache of the moves it has computed
+
+This module gives every state that the Ai can see, the cells it has missed, the
+unresolved hits and the cells of the ships it has sunk, a 64 bit hash. Each cell has
+a fixed random key for each of those states, and the hash is the XOR of the keys of
+every cell that has been shot, so it is updated with one or two XORs per shot rather
+than recomputed. The keys are drawn from a fixed seed, so the same state has the
+same hash in every game and in every process.
+
+The hunt phase of a game repeats constantly across games, for example the first
+shots on an empty board, so the moves computed by the expensive Ai algorithms are
+kept in a bounded least recently used cache shared by every game in the process.
+
+Attributes
+----------
+ZOBRIST_SEED : int
+    The seed of the random keys of each cell
+TRANSPOSITION_ENTRIES : int
+    The default number of moves held by the shared cache
+ENTRY_OVERHEAD : int
+    The estimated bytes taken by the cache itself for each entry
+transpositions : TranspositionCache
+    The cache shared by every game in the process
+"""
+
+
+import functools
+import random
+import sys
+import threading
+from collections import OrderedDict
+
+ZOBRIST_SEED = 0x5B0A7
+TRANSPOSITION_ENTRIES = 100000
+ENTRY_OVERHEAD = 100
+MISS, HIT, SUNK = 1, 2, 3
+# The states of a cell that has been shot, matching those of 'battleships_ai'
+
+@functools.lru_cache(maxsize=None)
+def zobrist_keys(board_size):
+    """Gets the random keys of every cell of a board, drawing them the first time
+
+    Args:
+        board_size (int): The width and height of the board
+    Returns:
+        tuple(tuple(int)): The keys of each cell for a miss, a hit and a sunk ship,
+            indexed by the state and then by the cell number, row by row
+    """
+
+    rng = random.Random(ZOBRIST_SEED ^ board_size)
+    cells = board_size * board_size
+    return tuple(tuple(rng.getrandbits(64) for _ in range(cells)) if state else ()
+                 for state in range(SUNK + 1))
+
+class ShotHash:
+    """The Zobrist hash of the shots taken on a single board
+
+    Attributes:
+        board_size (int): The width and height of the board
+        value (int): The 64 bit hash of the shots so far
+    """
+
+    __slots__ = ('board_size', 'value', '_keys')
+
+    def __init__(self, board_size):
+        self.board_size = board_size
+        self.value = 0
+        self._keys = zobrist_keys(board_size)
+
+    def update(self, x, y, old_state, new_state):
+        """Updates the hash after a cell has changed state
+
+        Args:
+            x (int): The column of the cell
+            y (int): The row of the cell
+            old_state (int): The state of the cell before, 0 if it had not been shot
+            new_state (int): The state of the cell now
+        Returns:
+            int: The new hash
+        """
+
+        index = y * self.board_size + x
+        if old_state:
+            self.value ^= self._keys[old_state][index]
+        if new_state:
+            self.value ^= self._keys[new_state][index]
+        return self.value
+
+class TranspositionCache:
+    """A bounded, thread-safe, least recently used mapping of hashed states to moves
+
+    Attributes:
+        max_entries (int): The largest number of entries held; 0 turns the cache off
+        hits (int): The number of lookups that found an entry
+        misses (int): The number of lookups that did not find an entry
+        evictions (int): The number of entries evicted to stay within the bound
+        memory (int): The estimated bytes taken by the entries
+    """
+
+    def __init__(self, max_entries = TRANSPOSITION_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.memory = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key):
+        """Looks up the entry for a state and marks it as recently used
+
+        Args:
+            key (tuple): The key of the state, holding its hash
+        Returns:
+            The entry stored for the state, or None if there is none
+        """
+
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Stores the entry for a state, evicting the least recently used entries
+
+        Args:
+            key (tuple): The key of the state, holding its hash
+            value: The entry stored for the state, such as the Ai's move
+        Returns:
+            Returns nothing
+        """
+
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.memory -= entry_size(key, self._entries[key])
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self.memory += entry_size(key, value)
+            while len(self._entries) > self.max_entries:
+                old_key, old_value = self._entries.popitem(last=False)
+                self.memory -= entry_size(old_key, old_value)
+                self.evictions += 1
+
+    def hit_rate(self):
+        """Finds the share of the lookups that found an entry
+
+        Args:
+            No arguments
+        Returns:
+            float: The hit rate, 0 before the first lookup
+        """
+
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """Summarises how well the cache is working
+
+        Args:
+            No arguments
+        Returns:
+            dict: The entries, hits, misses, hit rate, evictions and estimated bytes
+        """
+
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hit_rate(), 'evictions': self.evictions,
+                    'memory': self.memory}
+
+def entry_size(key, value):
+    """Estimates the bytes taken by an entry of the cache
+
+    Args:
+        key (tuple): The key of the entry
+        value: The value of the entry
+    Returns:
+        int: The bytes of the key, the value and the cache's own bookkeeping
+    """
+
+    size = sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key)
+    size += sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        size += sum(sys.getsizeof(part) for part in value)
+    return size + ENTRY_OVERHEAD
+
+transpositions = TranspositionCache()